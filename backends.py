@@ -0,0 +1,254 @@
+"""
+Storage backends for the Library Management System.
+
+A backend knows how to open connections and cursors, start transactions and
+adapt the MySQL-flavoured SQL used throughout lib.py to its own dialect.
+
+Backends:
+ - MySQLBackend: a MySQL server through mysql-connector (the default)
+ - SQLiteBackend: an embedded SQLite file, no server required
+
+DatabaseConnection(backend='mysql' | 'sqlite') selects one by name.
+"""
+from contextlib import contextmanager
+from datetime import date, datetime
+import os
+import re
+import sqlite3
+
+try:
+    import mysql.connector
+    from mysql.connector import Error as MySQLError
+except ImportError:  # SQLite-only installs don't need the MySQL driver
+    mysql = None
+    MySQLError = sqlite3.Error
+
+
+class DatabaseError(Exception):
+    """Database failure detected by this application (pool exhausted, migration blocked, ...)"""
+
+
+# Every database failure the Library methods handle, whichever backend raised it
+Error = (MySQLError, sqlite3.Error, DatabaseError)
+
+
+class MySQLBackend:
+    """MySQL server accessed through mysql-connector"""
+    name = 'mysql'
+    label = 'MySQL'
+    supports_fulltext = True
+    supports_multi_table_update = True
+
+    def __init__(self, host='localhost', database='library_management', user='root', password=''):
+        if mysql is None:
+            raise DatabaseError("mysql-connector-python is not installed")
+        self.config = {
+            'host': host,
+            'database': database,
+            'user': user,
+            'password': password,
+            'autocommit': True,  # Enable autocommit by default
+            'use_pure': True,    # Use pure Python implementation
+            'buffered': True     # Use buffered cursors
+        }
+
+    def connect(self):
+        return mysql.connector.connect(**self.config)
+
+    def cursor(self, conn, buffered=True):
+        # Unbuffered cursors stream rows from the server as they are fetched
+        return conn.cursor(buffered=buffered)
+
+    def begin(self, conn):
+        conn.start_transaction()
+
+    def ping(self, conn):
+        conn.ping(reconnect=False)
+
+    @contextmanager
+    def migration_lock(self, cursor):
+        """Advisory lock so only one process migrates at a time"""
+        cursor.execute("SELECT GET_LOCK('library_schema_migration', 60)")
+        if cursor.fetchone()[0] != 1:
+            raise DatabaseError("Timed out waiting for another process to finish migrating")
+        try:
+            yield
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK('library_schema_migration')")
+            cursor.fetchone()
+
+    def explain(self, cursor, query, params):
+        """Access path per table: dicts with table, type, key and full_scan"""
+        cursor.execute("EXPLAIN " + query, params)
+        columns = [col[0] for col in cursor.description]
+        plans = []
+        for row in cursor.fetchall():
+            plan = dict(zip(columns, row))
+            plans.append({
+                'table': plan.get('table'),
+                'type': plan.get('type'),
+                'key': plan.get('key'),
+                'full_scan': plan.get('type') == 'ALL'
+            })
+        return plans
+
+    def upsert_sql(self, table, columns, update_columns):
+        columns_str = ','.join([f"`{c}`" for c in columns])
+        placeholders = ','.join(['%s'] * len(columns))
+        query = f"INSERT INTO `{table}` ({columns_str}) VALUES ({placeholders})"
+        if update_columns:
+            update_str = ','.join([f"`{c}`=VALUES(`{c}`)" for c in update_columns])
+            query += f" ON DUPLICATE KEY UPDATE {update_str}"
+        return query
+
+
+# SQLite stores dates as ISO text; convert both ways so Library code sees
+# the same date/datetime objects mysql-connector returns.
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(' '))
+sqlite3.register_converter('DATE', lambda raw: date.fromisoformat(raw.decode()[:10]))
+sqlite3.register_converter('TIMESTAMP', lambda raw: datetime.fromisoformat(raw.decode()))
+
+
+def _sqlite_datediff(end, start):
+    """MySQL DATEDIFF(end, start) in whole days"""
+    if end is None or start is None:
+        return None
+    return (date.fromisoformat(str(end)[:10]) - date.fromisoformat(str(start)[:10])).days
+
+
+class _SQLiteCursor:
+    """Cursor adapter accepting the MySQL-flavoured SQL used by Library"""
+
+    _translated = {}
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    @classmethod
+    def translate(cls, sql):
+        translated = cls._translated.get(sql)
+        if translated is None:
+            translated = sql.replace('%s', '?')
+            # BEGIN IMMEDIATE already holds the write lock, row locks are implicit
+            translated = re.sub(r'\bFOR UPDATE\b', '', translated)
+            translated = re.sub(r'\bINSERT IGNORE\b', 'INSERT OR IGNORE', translated)
+            cls._translated[sql] = translated
+        return translated
+
+    def execute(self, sql, params=()):
+        self._cursor.execute(self.translate(sql), tuple(params))
+
+    def executemany(self, sql, seq_of_params):
+        self._cursor.executemany(self.translate(sql), seq_of_params)
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size=1):
+        return self._cursor.fetchmany(size)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def column_names(self):
+        return tuple(col[0] for col in self._cursor.description or ())
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteBackend:
+    """Embedded SQLite database file"""
+    name = 'sqlite'
+    label = 'SQLite'
+    supports_fulltext = False
+    supports_multi_table_update = False
+
+    def __init__(self, host=None, database='library_management', user=None, password=None):
+        # host/user/password are accepted for a uniform connect() signature and ignored
+        if database != ':memory:' and not os.path.splitext(database)[1]:
+            database += '.db'
+        self.path = database
+
+    def connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=30,                           # wait for a concurrent writer instead of failing
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            isolation_level=None,                 # autocommit; transactions are explicit
+            check_same_thread=False               # the pool hands connections between threads
+        )
+        conn.execute("PRAGMA foreign_keys = ON")
+        if self.path != ':memory:':
+            conn.execute("PRAGMA journal_mode = WAL")  # readers don't block the writer
+        conn.create_function('CURDATE', 0, lambda: date.today().isoformat())
+        conn.create_function('DATEDIFF', 2, _sqlite_datediff, deterministic=True)
+        return conn
+
+    def cursor(self, conn, buffered=True):
+        # sqlite3 cursors always step through the result lazily
+        return _SQLiteCursor(conn.cursor())
+
+    def begin(self, conn):
+        conn.execute("BEGIN IMMEDIATE")
+
+    def ping(self, conn):
+        conn.execute("SELECT 1")
+
+    @contextmanager
+    def migration_lock(self, cursor):
+        # Migrations are rare and SQLite serializes writers itself
+        yield
+
+    def explain(self, cursor, query, params):
+        """Access path per table from EXPLAIN QUERY PLAN"""
+        # Map aliases back to table names ("FROM borrowed_books bb")
+        aliases = {}
+        for table, alias in re.findall(r'\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', query, re.I):
+            aliases[table] = table
+            if alias and alias.upper() not in ('WHERE', 'ON', 'JOIN', 'LEFT', 'ORDER', 'GROUP', 'LIMIT'):
+                aliases[alias] = table
+        cursor.execute("EXPLAIN QUERY PLAN " + query, params)
+        plans = []
+        for row in cursor.fetchall():
+            match = re.match(r'(SCAN|SEARCH) (?:TABLE )?(\w+)(?: AS (\w+))?'
+                             r'(?: USING (?:COVERING |INTEGER PRIMARY KEY)?(?:INDEX )?(\w+)?)?', row[-1])
+            if not match:
+                continue
+            access, name, alias, key = match.groups()
+            plans.append({
+                'table': aliases.get(alias or name, name),
+                'type': access,
+                'key': key,
+                'full_scan': access == 'SCAN' and key is None
+            })
+        return plans
+
+    def upsert_sql(self, table, columns, update_columns):
+        columns_str = ','.join([f'"{c}"' for c in columns])
+        placeholders = ','.join(['%s'] * len(columns))
+        query = f'INSERT INTO "{table}" ({columns_str}) VALUES ({placeholders})'
+        if update_columns:
+            update_str = ','.join([f'"{c}"=excluded."{c}"' for c in update_columns])
+            query += f" ON CONFLICT DO UPDATE SET {update_str}"
+        return query
+
+
+BACKENDS = {
+    'mysql': MySQLBackend,
+    'sqlite': SQLiteBackend,
+}
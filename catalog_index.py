@@ -0,0 +1,456 @@
+"""
+In-memory catalog index for the Library Management System.
+
+CatalogIndex keeps every book (title, author, category and copy counts) in
+process memory with a trigram inverted index, so Library.searchBooks can
+answer substring queries without a database round trip. It is built once
+from the books table and then patched by the Library write methods.
+
+Matching follows the SQL search: a book matches when the term is a
+case-insensitive substring of its title, author or category, and results
+are ordered by available copies (most first), then title. Case is folded
+with casefold(), so accented letters can match differently than in SQL:
+MySQL's _ai_ci collations ignore accents, SQLite folds ASCII letters only.
+
+A second trigram index over normalized titles and authors backs suggest(),
+which ranks typo-tolerant "did you mean" candidates by trigram similarity.
+
+PrefixIndex is a sorted array searched with bisect, used for as-you-type
+completion of titles (inside CatalogIndex) and usernames (in Library).
+
+CatalogCache is a read-through cache of the available-books listing,
+patched from Library change sets and reloaded after a TTL.
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+import heapq
+import re
+import string
+import sys
+import threading
+import time
+import unicodedata
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _normalize(text):
+    """Casefold, drop accents and punctuation: 'Les Misérables!' -> 'les miserables'"""
+    text = unicodedata.normalize('NFKD', text.casefold())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(re.findall(r'\w+', text))
+
+
+def _padded_trigrams(normalized):
+    # Padding gives word starts their own trigrams, so short words still match
+    return _trigrams(f"  {normalized} ") if normalized else set()
+
+
+def _match_score(grams, value, single_word):
+    """
+    How well a term (its trigram set) matches a normalized field value.
+
+    Averages the Jaccard similarity with the share of the term's trigrams
+    found in the value, so "harry poter" still ranks a long title that
+    starts with "Harry Potter". A one-word term is also compared with each
+    word of the value, so a mistyped surname finds the full author name.
+    """
+    values = [value] + value.split() if single_word and ' ' in value else [value]
+    score = 0.0
+    for value_grams in map(_padded_trigrams, values):
+        shared = len(grams & value_grams)
+        if shared:
+            jaccard = shared / (len(grams) + len(value_grams) - shared)
+            score = max(score, (jaccard + shared / len(grams)) / 2)
+    return score
+
+
+# Fields covered by suggest(); an entry in the fuzzy postings is book_id * 2 + field
+_TITLE, _AUTHOR = 0, 1
+
+
+class PrefixIndex:
+    """Case-insensitive prefix completion over a set of strings"""
+
+    def __init__(self, values=()):
+        pairs = sorted((value.casefold(), value) for value in values)
+        self._keys = [key for key, _ in pairs]      # casefolded, sorted
+        self._values = [value for _, value in pairs]
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, value):
+        key = value.casefold()
+        with self._lock:
+            position = bisect_left(self._keys, key)
+            if position < len(self._keys) and self._keys[position] == key:
+                self._values[position] = value
+            else:
+                self._keys.insert(position, key)
+                self._values.insert(position, value)
+
+    def remove(self, value):
+        key = value.casefold()
+        with self._lock:
+            position = bisect_left(self._keys, key)
+            if position < len(self._keys) and self._keys[position] == key:
+                del self._keys[position]
+                del self._values[position]
+
+    def complete(self, prefix, limit=10):
+        """Up to limit values starting with prefix, in alphabetical order"""
+        key = prefix.casefold()
+        with self._lock:
+            position = bisect_left(self._keys, key)
+            matches = []
+            while (position < len(self._keys) and len(matches) < limit
+                   and self._keys[position].startswith(key)):
+                matches.append(self._values[position])
+                position += 1
+            return matches
+
+    def memory_usage(self):
+        """Approximate bytes held by the sorted arrays"""
+        with self._lock:
+            return (sys.getsizeof(self._keys) + sys.getsizeof(self._values)
+                    + sum(map(sys.getsizeof, self._keys)) + sum(map(sys.getsizeof, self._values)))
+
+
+class CatalogIndex:
+    """Trigram inverted index over books, kept current by Library"""
+
+    def __init__(self):
+        self._books = {}                   # book id -> [title, author, category, available, total]
+        self._text = {}                    # book id -> casefolded "title\0author\0category"
+        self._postings = {}                # trigram -> array of ids of books containing it
+        self._normalized = {}              # book id -> (normalized title, normalized author)
+        self._fuzzy = {}                   # normalized title/author trigram -> array of entries
+        self.titles = PrefixIndex()        # title completion
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build an index from (id, title, author, category, available_copies, total_copies) rows"""
+        index = cls()
+        rows = list(rows)
+        for row in rows:
+            index._index_book(*row)
+        # One sort instead of an insertion per title
+        index.titles = PrefixIndex(row[1] for row in rows)
+        return index
+
+    def __len__(self):
+        return len(self._books)
+
+    def add(self, book_id, title, author, category, available, total):
+        """Insert a book, or replace it if the id is already indexed"""
+        with self._lock:
+            if book_id in self._books:
+                self.titles.remove(self._books[book_id][0])
+            self.titles.add(title)
+            self._index_book(book_id, title, author, category, available, total)
+
+    def _index_book(self, book_id, title, author, category, available, total):
+        text = '\0'.join((title or '', author or '', category or '')).casefold()
+        with self._lock:
+            if book_id in self._books:
+                self._unlink(book_id)
+            self._books[book_id] = [title, author, category, available, total]
+            self._text[book_id] = text
+            for gram in _trigrams(text):
+                ids = self._postings.get(gram)
+                if ids is None:
+                    self._postings[gram] = array('i', (book_id,))
+                else:
+                    ids.append(book_id)
+            normalized = (_normalize(title or ''), _normalize(author or ''))
+            self._normalized[book_id] = normalized
+            for field, value in enumerate(normalized):
+                entry = book_id * 2 + field
+                for gram in _padded_trigrams(value):
+                    entries = self._fuzzy.get(gram)
+                    if entries is None:
+                        self._fuzzy[gram] = array('q', (entry,))
+                    else:
+                        entries.append(entry)
+
+    def remove(self, book_id):
+        with self._lock:
+            if book_id in self._books:
+                self._unlink(book_id)
+                self.titles.remove(self._books[book_id][0])
+                del self._books[book_id]
+                del self._text[book_id]
+                del self._normalized[book_id]
+
+    def adjust_copies(self, book_id, available_delta, total_delta=0):
+        """Apply a change in copy counts (borrow, return, added copies)"""
+        with self._lock:
+            book = self._books.get(book_id)
+            if book is not None:
+                book[3] += available_delta
+                book[4] += total_delta
+
+    def _unlink(self, book_id):
+        for gram in _trigrams(self._text[book_id]):
+            ids = self._postings[gram]
+            ids.remove(book_id)
+            if not ids:
+                del self._postings[gram]
+        for field, value in enumerate(self._normalized[book_id]):
+            for gram in _padded_trigrams(value):
+                entries = self._fuzzy[gram]
+                entries.remove(book_id * 2 + field)
+                if not entries:
+                    del self._fuzzy[gram]
+
+    def search(self, term, limit=None, after=None):
+        """
+        Books whose title, author or category contains term, as searchBooks dicts
+
+        after is an (available, title) sort key; only books ordered after it
+        are returned (keyset pagination).
+        """
+        needle = term.casefold()
+        with self._lock:
+            grams = _trigrams(needle)
+            if grams:
+                # Every match contains the rarest trigram; the substring test below does the rest
+                candidates = min((self._postings.get(gram, ()) for gram in grams), key=len)
+            else:
+                # Shorter than a trigram: check every book (still no database trip)
+                candidates = self._books.keys()
+            matches = [self._books[book_id] for book_id in candidates
+                       if needle in self._text[book_id]]
+            order = lambda book: (-book[3], book[0].casefold())
+            if after is not None:
+                start = (-after[0], after[1].casefold())
+                matches = [book for book in matches if order(book) > start]
+            if limit:
+                matches = heapq.nsmallest(limit, matches, key=order)
+            else:
+                matches.sort(key=order)
+            return [{
+                'title': title,
+                'author': author or "Unknown",
+                'category': category,
+                'available': available,
+                'total': total
+            } for title, author, category, available, total in matches]
+
+    def suggest(self, term, limit=5, threshold=0.3, budget=2000, candidates=40):
+        """
+        Books whose title or author looks like term, best match first.
+
+        Returns [] when term exactly names a book (ignoring case, accents and
+        punctuation). Otherwise each suggestion is a searchBooks dict plus
+        'score' (trigram similarity, at least threshold) and 'matched'
+        ('title' or 'author').
+
+        Entries sharing the most of the term's rarest trigrams are scored,
+        reading at most budget postings, so a lookup stays fast however
+        common the other trigrams are.
+        """
+        wanted = _normalize(term)
+        grams = _padded_trigrams(wanted)
+        if not grams:
+            return []
+        single_word = ' ' not in wanted
+        with self._lock:
+            hits = Counter()
+            read = 0
+            for entries in sorted((self._fuzzy[gram] for gram in grams if gram in self._fuzzy), key=len):
+                if read >= budget:
+                    break
+                hits.update(entries[:budget - read])
+                read += len(entries)
+            
+            best = {}    # book id -> (score, field)
+            for entry, _ in hits.most_common(candidates):
+                book_id, field = divmod(entry, 2)
+                value = self._normalized[book_id][field]
+                if field == _TITLE and value == wanted:
+                    return []
+                score = _match_score(grams, value, single_word)
+                if score >= threshold and score > best.get(book_id, (0.0,))[0]:
+                    best[book_id] = (score, field)
+            
+            ranked = heapq.nlargest(limit, best.items(), key=lambda item: (item[1][0], -item[0]))
+            suggestions = []
+            for book_id, (score, field) in ranked:
+                title, author, category, available, total = self._books[book_id]
+                suggestions.append({
+                    'title': title,
+                    'author': author or "Unknown",
+                    'category': category,
+                    'available': available,
+                    'total': total,
+                    'score': round(score, 3),
+                    'matched': 'title' if field == _TITLE else 'author'
+                })
+            return suggestions
+
+    def snapshot(self):
+        """Copy of the indexed rows keyed by book id, for consistency checks"""
+        with self._lock:
+            return {book_id: tuple(book) for book_id, book in self._books.items()}
+
+    def memory_usage(self):
+        """Approximate memory held by the index (container and string sizes, in bytes)"""
+        with self._lock:
+            size = sys.getsizeof(self._books) + sys.getsizeof(self._text)
+            for book_id, book in self._books.items():
+                size += sys.getsizeof(book) + sum(sys.getsizeof(value) for value in book)
+                size += sys.getsizeof(self._text[book_id])
+                size += sum(sys.getsizeof(value) for value in self._normalized[book_id])
+            for postings in (self._postings, self._fuzzy):
+                size += sys.getsizeof(postings)
+                for gram, ids in postings.items():
+                    size += sys.getsizeof(gram) + sys.getsizeof(ids)
+            size += self.titles.memory_usage()
+            return {
+                'books': len(self._books),
+                'trigrams': len(self._postings) + len(self._fuzzy),
+                'postings': sum(len(ids) for postings in (self._postings, self._fuzzy)
+                                for ids in postings.values()),
+                'bytes': size
+            }
+
+
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def _listing_key(category, title):
+    # MySQL listing order: category, then title, both case-insensitive (_ci collations)
+    return ((category or '').casefold(), (title or '').casefold())
+
+
+def _sqlite_listing_key(category, title):
+    # SQLite listing order: category is BINARY (code point order), title is NOCASE,
+    # which folds ASCII letters only
+    return (category or '', (title or '').translate(_ASCII_LOWER))
+
+
+LISTING_KEYS = {'mysql': _listing_key, 'sqlite': _sqlite_listing_key}
+
+
+class CatalogCache:
+    """
+    Read-through cache of the available-books listing (displayAvailableBooks).
+
+    The listing is loaded on the first read and then kept current by
+    apply(), a Library change listener, so repeated listings cost no
+    database work. Other processes writing to the same database are not
+    seen until the listing is older than ttl seconds and reloaded
+    (ttl=None never expires). backend names the database the listing
+    comes from, so the cache orders and pages it by the same collation.
+    """
+
+    def __init__(self, ttl=60, backend='mysql'):
+        self.ttl = ttl
+        self._key = LISTING_KEYS[backend]
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._books = None          # book dicts, in listing order
+        self._keys = []             # listing key of each entry in _books
+        self._titles = {}           # title -> listing key
+        self._loaded_at = 0.0
+        self._generation = 0        # bumped on every change; a load that overlaps one is dropped
+        self._lock = threading.Lock()
+
+    def _fresh(self):
+        return self._books is not None and (
+            self.ttl is None or time.monotonic() - self._loaded_at < self.ttl)
+
+    def _ensure(self, load):
+        """Count a hit or a miss; on a miss call load() (outside the lock) and keep its result"""
+        with self._lock:
+            if self._fresh():
+                self.hits += 1
+                return
+            self.misses += 1
+            generation = self._generation
+        books = load()
+        with self._lock:
+            if generation != self._generation:
+                # A write landed while loading; serve this result once but don't keep it
+                return books
+            pairs = sorted((self._key(book['category'], book['title']), book) for book in books)
+            self._keys = [key for key, _ in pairs]
+            self._books = [book for _, book in pairs]
+            self._titles = {book['title']: key for key, book in pairs}
+            self._loaded_at = time.monotonic()
+
+    def books(self, load):
+        """The listing (copies of the book dicts); load() returns it from the database"""
+        uncached = self._ensure(load)
+        if uncached is not None:
+            return uncached
+        with self._lock:
+            return [dict(book) for book in self._books]
+
+    def page(self, load, page_size, after=None):
+        """
+        (books, next) for one page of the listing, like get_available_books_page
+
+        after and next are (category, title) keys.
+        """
+        uncached = self._ensure(load)
+        with self._lock:
+            books = self._books if uncached is None else uncached
+            keys = self._keys if uncached is None else [
+                self._key(book['category'], book['title']) for book in books]
+            start = 0 if after is None else bisect_right(keys, self._key(*after))
+            page = [dict(book) for book in books[start:start + page_size]]
+        if start + page_size < len(books):
+            return page, (page[-1]['category'], page[-1]['title'])
+        return page, None
+
+    def apply(self, changes):
+        """Patch the listing from a Library change set (see Library.add_change_listener)"""
+        with self._lock:
+            self._generation += 1
+            if self._books is None:
+                return
+            for change in changes:
+                if change['table'] != 'books':
+                    continue
+                key = self._titles.pop(change['key'], None)
+                if key is not None:
+                    position = bisect_left(self._keys, key)
+                    while self._books[position]['title'] != change['key']:
+                        position += 1  # titles equal apart from case share a key
+                    del self._keys[position]
+                    del self._books[position]
+                book = change['row']
+                if book is not None and book['available'] > 0:
+                    key = self._key(book['category'], book['title'])
+                    position = bisect_right(self._keys, key)
+                    self._keys.insert(position, key)
+                    self._books.insert(position, dict(book))
+                    self._titles[book['title']] = key
+
+    def invalidate(self):
+        """Drop the listing; the next read reloads it"""
+        with self._lock:
+            self._generation += 1
+            self._books = None
+            self._keys = []
+            self._titles = {}
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'books': len(self._books) if self._books is not None else 0,
+                'age': time.monotonic() - self._loaded_at if self._books is not None else None
+            }
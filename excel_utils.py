@@ -2,16 +2,18 @@
 Excel import/export utilities for the Library Management System.
 
 Functions:
- - export_database_to_excel(db_conn, filepath, tables=None)
- - import_database_from_excel(db_conn, filepath)
+ - export_database_to_excel(db_conn, filepath, tables=None, chunk_size=..., progress=None)
+ - import_database_from_excel(db_conn, filepath, batch_size=...)
 
-This module uses pandas + openpyxl to read/write .xlsx files and
-mysql-connector to interact with the database.
+This module uses openpyxl to write .xlsx files (streamed, in write-only
+mode), pandas to read them, and a DatabaseConnection to reach the database.
 """
-from typing import List
+from contextlib import closing
+from typing import Callable, List
 import pandas as pd
 import numpy as np
-from mysql.connector import Error
+from openpyxl import Workbook
+from lib import Error
 from datetime import datetime
 
 
@@ -23,69 +25,135 @@ DEFAULT_TABLES = [
     'book_reviews'
 ]
 
+# Rows fetched from the database per round trip while exporting
+EXPORT_CHUNK_SIZE = 1000
+# Rows sent per executemany() call while importing
+IMPORT_BATCH_SIZE = 500
+# Failing rows named in an import error message
+IMPORT_ERROR_ROWS = 5
+# MySQL lock wait timeout and deadlock: the failure is not in the rows (and a
+# deadlock has already rolled back the transaction), so they are not re-run
+LOCK_ERRNOS = (1205, 1213)
 
-def export_database_to_excel(db_conn, filepath: str, tables: List[str] = None):
+
+def export_database_to_excel(db_conn, filepath: str, tables: List[str] = None,
+                             chunk_size: int = EXPORT_CHUNK_SIZE,
+                             progress: Callable[[str, int], None] = None):
     """Export selected database tables into a single Excel workbook.
 
+    Rows are streamed from an unbuffered cursor chunk_size at a time and
+    appended to write-only worksheets, so memory use does not grow with
+    the number of rows.
+
     Args:
-        db_conn: DatabaseConnection instance (expected to have .cursor)
+        db_conn: DatabaseConnection instance (rows are read with db_conn.stream())
         filepath: path to .xlsx file to write
         tables: list of table names to export; defaults to DEFAULT_TABLES
+        chunk_size: rows fetched per round trip
+        progress: optional progress(table, rows_written), called after every
+            chunk and when a table is done; it may raise to abort the export
     """
     if tables is None:
         tables = DEFAULT_TABLES
 
-    cursor = db_conn.cursor
-    with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
-        for table in tables:
-            try:
-                cursor.execute(f"SELECT * FROM {table}")
-                rows = cursor.fetchall()
+    workbook = Workbook(write_only=True)
+    for table in tables:
+        try:
+            with db_conn.session() as cursor:
+                cursor.execute(f"SELECT * FROM {table} LIMIT 0")
                 cols = cursor.column_names
-                df = pd.DataFrame(rows, columns=cols)
-                # Ensure sheet name length and characters are acceptable
-                sheet_name = table[:31]
-                df.to_excel(writer, sheet_name=sheet_name, index=False)
-            except Error:
-                # skip tables that don't exist or on error
-                continue
-        # ExcelWriter context manager will save/close the file on exit.
+                cursor.fetchall()
+        except Error:
+            # skip tables that don't exist
+            continue
+
+        # Ensure sheet name length and characters are acceptable
+        sheet = workbook.create_sheet(title=table[:31])
+        sheet.append(cols)
+        written = 0
+        with closing(db_conn.stream(f"SELECT * FROM {table}", (), chunk_size)) as rows:
+            for row in rows:
+                sheet.append(row)
+                written += 1
+                if progress is not None and written % chunk_size == 0:
+                    progress(table, written)
+        if progress is not None and (written == 0 or written % chunk_size):
+            progress(table, written)
+
+    # Nothing reaches filepath until every table is written
+    workbook.save(filepath)
+
+
+def _normalize_value(v):
+    """Convert pandas / numpy types to Python native types acceptable by the database driver."""
+    # pandas NA handling
+    if pd.isna(v):
+        return None
+
+    # pandas Timestamp -> python datetime
+    if isinstance(v, pd.Timestamp):
+        try:
+            return v.to_pydatetime()
+        except Exception:
+            # Fallback: convert via Python datetime constructor
+            return datetime(v.year, v.month, v.day, v.hour, v.minute, v.second, v.microsecond)
+
+    # numpy scalar -> python native
+    if isinstance(v, np.generic):
+        return v.item()
+
+    # bool/int/float/str/datetime.date/datetime.datetime pass through
+    return v
+
+
+def _normalize_column(series: pd.Series) -> np.ndarray:
+    """Convert a whole column to Python native values (NaN / NaT -> None) at once."""
+    missing = series.isna().to_numpy()
+    if pd.api.types.is_datetime64_any_dtype(series):
+        values = np.array(series.dt.to_pydatetime(), dtype=object)
+    else:
+        # astype(object) turns numpy ints, floats and bools into Python ones
+        values = series.astype(object).to_numpy(copy=True)
+        # Mixed object columns may still hold Timestamps or numpy scalars
+        if series.dtype == object and any(isinstance(v, (pd.Timestamp, np.generic)) for v in values):
+            values = np.array([_normalize_value(v) for v in values], dtype=object)
+    values[missing] = None
+    return values
+
+
+def _failing_rows(db_conn, query, batch, first_row):
+    """Re-run the rows of a failed batch one by one; returns (excel_row, error) pairs."""
+    failures = []
+    with db_conn.transaction() as cursor:
+        for offset, values in enumerate(batch):
+            try:
+                # Savepoint per row; the caller aborts the whole sheet afterwards anyway
+                with db_conn.transaction():
+                    cursor.execute(query, values)
+            except Error as e:
+                failures.append((first_row + offset, e))
+                if len(failures) == IMPORT_ERROR_ROWS:
+                    break
+    return failures
 
 
-def import_database_from_excel(db_conn, filepath: str):
+def import_database_from_excel(db_conn, filepath: str, batch_size: int = IMPORT_BATCH_SIZE):
     """Import data from an Excel workbook into the database.
 
-    Each sheet name is treated as a target table. Rows are inserted using
-    INSERT ... ON DUPLICATE KEY UPDATE to avoid duplicate-key failures.
+    Each sheet name is treated as a target table. Rows are upserted (MySQL
+    ON DUPLICATE KEY UPDATE, SQLite ON CONFLICT DO UPDATE) to avoid
+    duplicate-key failures. Columns are normalized whole, and rows are sent
+    batch_size at a time with executemany().
+
+    A failing batch aborts its sheet. The error names the sheet rows (as
+    numbered in Excel) that fail on their own, except after a MySQL deadlock
+    or lock wait timeout, which is re-raised as is.
 
     Note: This is a best-effort importer. It assumes columns in sheets match
     the corresponding table columns. Primary key columns (e.g., id) are not
     updated.
     """
     xls = pd.read_excel(filepath, sheet_name=None)
-    cursor = db_conn.cursor
-    conn = db_conn.connection
-
-    def _normalize_value(v):
-        """Convert pandas / numpy types to Python native types acceptable by mysql-connector."""
-        # pandas NA handling
-        if pd.isna(v):
-            return None
-
-        # pandas Timestamp -> python datetime
-        if isinstance(v, pd.Timestamp):
-            try:
-                return v.to_pydatetime()
-            except Exception:
-                # Fallback: convert via Python datetime constructor
-                return datetime(v.year, v.month, v.day, v.hour, v.minute, v.second, v.microsecond)
-
-        # numpy scalar -> python native
-        if isinstance(v, np.generic):
-            return v.item()
-
-        # bool/int/float/str/datetime.date/datetime.datetime pass through
-        return v
 
     for sheet_name, df in xls.items():
         table = sheet_name
@@ -95,28 +163,31 @@ def import_database_from_excel(db_conn, filepath: str):
         # Normalize column names to strings
         cols = [str(c) for c in df.columns]
 
-        # Prepare insert parts
-        columns_str = ','.join([f"`{c}`" for c in cols])
-        placeholders = ','.join(['%s'] * len(cols))
-
-        # Build ON DUPLICATE KEY UPDATE (skip id if present)
+        # Upsert in the backend's dialect (skip id when updating)
         update_cols = [c for c in cols if c.lower() not in ('id',)]
-        if update_cols:
-            update_str = ','.join([f"`{c}`=VALUES(`{c}`)" for c in update_cols])
-            query = f"INSERT INTO `{table}` ({columns_str}) VALUES ({placeholders}) ON DUPLICATE KEY UPDATE {update_str}"
-        else:
-            query = f"INSERT INTO `{table}` ({columns_str}) VALUES ({placeholders})"
+        query = db_conn.backend.upsert_sql(table, cols, update_cols)
+
+        rows = list(zip(*(_normalize_column(df[c]) for c in df.columns)))
 
         try:
-            for _, row in df.iterrows():
-                values = []
-                for c in cols:
-                    v = row[c]
-                    values.append(_normalize_value(v))
-
-                cursor.execute(query, tuple(values))
-            conn.commit()
+            # Each sheet is imported as one unit of work: all rows or none
+            with db_conn.transaction() as cursor:
+                for start in range(0, len(rows), batch_size):
+                    batch = rows[start:start + batch_size]
+                    # Excel numbers the header row 1, so data row i is row i + 2
+                    first_row = start + 2
+                    try:
+                        with db_conn.transaction():
+                            cursor.executemany(query, batch)
+                    except Error as e:
+                        if getattr(e, 'errno', None) in LOCK_ERRNOS:
+                            raise
+                        failures = _failing_rows(db_conn, query, batch, first_row)
+                        detail = "; ".join(f"row {row}: {error}" for row, error in failures) or str(e)
+                        raise Exception(f"batch of rows {first_row}-{first_row + len(batch) - 1} "
+                                        f"failed ({detail})")
         except Exception as e:
-            conn.rollback()
+            if getattr(e, 'errno', None) in LOCK_ERRNOS:
+                raise  # as is, so the caller can tell it apart and retry the import
             # Re-raise with context to show which sheet failed
             raise Exception(f"Failed to import sheet '{sheet_name}': {e}")
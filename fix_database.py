@@ -1,112 +1,22 @@
 """
-Script to verify and rebuild database tables with proper constraints
+Script to verify and repair database tables with proper constraints
 """
-import mysql.connector
 from mysql.connector import Error
+from lib import DatabaseConnection, Library, LATEST_SCHEMA_VERSION
 
 def verify_and_fix_database():
+    db = DatabaseConnection()
     try:
-        # Connect to the database
-        connection = mysql.connector.connect(
-            host='localhost',
-            database='library_management',
-            user='root',
-            password=''
-        )
-        cursor = connection.cursor()
+        # Connecting applies any pending schema migrations. They only ALTER
+        # tables in place (InnoDB engine, id-based foreign keys, indexes),
+        # so existing books, users and loans are kept.
+        print("Applying pending schema migrations...")
+        if not db.connect(host='localhost', database='library_management',
+                          user='root', password=''):
+            return
         
-        # Drop all tables in correct order to avoid FK constraint issues
-        print("Dropping existing tables...")
-        tables = ['borrowed_books', 'book_reviews', 'books', 'users', 'book_categories']
-        for table in tables:
-            try:
-                cursor.execute(f"DROP TABLE IF EXISTS {table}")
-                print(f"- Dropped {table}")
-            except Error as e:
-                print(f"Error dropping {table}: {e}")
-        
-        # Create tables in correct order
-        print("\nCreating tables with proper constraints...")
-        
-        # Create books table
-        books_table = """
-        CREATE TABLE books (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            title VARCHAR(255) NOT NULL UNIQUE,
-            available BOOLEAN DEFAULT TRUE,
-            total_copies INT DEFAULT 1,
-            available_copies INT DEFAULT 1,
-            category VARCHAR(100) DEFAULT 'General',
-            author VARCHAR(255),
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        ) ENGINE=InnoDB;
-        """
-        cursor.execute(books_table)
-        print("- Created books table")
-        
-        # Create users table
-        users_table = """
-        CREATE TABLE users (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            username VARCHAR(255) NOT NULL UNIQUE,
-            full_name VARCHAR(255) NOT NULL,
-            class VARCHAR(50),
-            section CHAR(1),
-            registration_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            status ENUM('active', 'suspended', 'inactive') DEFAULT 'active'
-        ) ENGINE=InnoDB;
-        """
-        cursor.execute(users_table)
-        print("- Created users table")
-        
-        # Create book categories table
-        categories_table = """
-        CREATE TABLE book_categories (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            category_name VARCHAR(100) NOT NULL UNIQUE,
-            description TEXT
-        ) ENGINE=InnoDB;
-        """
-        cursor.execute(categories_table)
-        print("- Created book_categories table")
-        
-        # Create borrowed_books table with proper FK constraints
-        borrowed_table = """
-        CREATE TABLE borrowed_books (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            student_name VARCHAR(255) NOT NULL,
-            book_title VARCHAR(255) NOT NULL,
-            borrowed_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            due_date DATE NOT NULL,
-            returned BOOLEAN DEFAULT FALSE,
-            return_date TIMESTAMP NULL,
-            fine_amount DECIMAL(10,2) DEFAULT 0.00,
-            CONSTRAINT fk_borrowed_book FOREIGN KEY (book_title) 
-                REFERENCES books(title) ON DELETE CASCADE ON UPDATE CASCADE,
-            CONSTRAINT fk_borrowed_student FOREIGN KEY (student_name) 
-                REFERENCES users(username) ON DELETE RESTRICT ON UPDATE CASCADE
-        ) ENGINE=InnoDB;
-        """
-        cursor.execute(borrowed_table)
-        print("- Created borrowed_books table")
-        
-        # Create book reviews table with proper FK constraints
-        reviews_table = """
-        CREATE TABLE book_reviews (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            book_title VARCHAR(255) NOT NULL,
-            username VARCHAR(255) NOT NULL,
-            rating INT NOT NULL CHECK (rating BETWEEN 1 AND 5),
-            review_text TEXT,
-            review_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            CONSTRAINT fk_review_book FOREIGN KEY (book_title) 
-                REFERENCES books(title) ON DELETE CASCADE ON UPDATE CASCADE,
-            CONSTRAINT fk_review_user FOREIGN KEY (username) 
-                REFERENCES users(username) ON DELETE CASCADE ON UPDATE CASCADE
-        ) ENGINE=InnoDB;
-        """
-        cursor.execute(reviews_table)
-        print("- Created book_reviews table")
+        version = db.schema_version()
+        print(f"- Schema version {version} (latest {LATEST_SCHEMA_VERSION})")
         
         # Verify foreign keys
         print("\nVerifying foreign key constraints...")
@@ -114,24 +24,38 @@ def verify_and_fix_database():
         check_fk_query = """
         SELECT TABLE_NAME, CONSTRAINT_NAME, REFERENCED_TABLE_NAME
         FROM information_schema.KEY_COLUMN_USAGE
-        WHERE REFERENCED_TABLE_SCHEMA = 'library_management'
+        WHERE REFERENCED_TABLE_SCHEMA = DATABASE()
         AND REFERENCED_TABLE_NAME IS NOT NULL;
         """
-        cursor.execute(check_fk_query)
-        fks = cursor.fetchall()
+        with db.session() as cursor:
+            cursor.execute(check_fk_query)
+            fks = cursor.fetchall()
         
         for fk in fks:
             print(f"- {fk[0]} -> {fk[2]} ({fk[1]})")
         
-        connection.commit()
-        print("\n✅ Database structure rebuilt successfully!")
+        # Verify the hot queries are served by indexes
+        print("\nChecking query plans...")
+        for plan in db.explain_hot_queries():
+            marker = "❌ FULL SCAN" if plan['full_scan'] else f"✅ {plan['key']}"
+            print(f"- {plan['query']} [{plan['table']}]: {marker}")
+        
+        # Recompute the report counters in case data was edited by hand
+        print("\nRebuilding report counters...")
+        totals = Library(db).rebuild_report_counters()
+        print(f"- {totals['unique_books']} titles, {totals['total_copies']} copies, "
+              f"{totals['available_copies']} available")
+        for username in totals['corrected_users']:
+            print(f"- Fixed active loan count of {username}")
+        
+        print("\n✅ Database structure verified!")
         
     except Error as e:
         print(f"\n❌ Database error: {e}")
+    except Exception as e:
+        print(f"\n❌ {e}")
     finally:
-        if connection.is_connected():
-            cursor.close()
-            connection.close()
+        db.close_connection()
 
 if __name__ == "__main__":
-    verify_and_fix_database()
\ No newline at end of file
+    verify_and_fix_database()
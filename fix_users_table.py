@@ -1,46 +1,26 @@
 import mysql.connector
+from lib import DatabaseConnection
 
 def fix_users_table():
+    db = DatabaseConnection()
     try:
-        connection = mysql.connector.connect(
-            host='localhost',
-            database='library_management',
-            user='root',
-            password=''
-        )
-        
-        if connection.is_connected():
-            cursor = connection.cursor()
-            
-            # Drop foreign key constraints first
-            cursor.execute("""
-                ALTER TABLE book_reviews
-                DROP FOREIGN KEY IF EXISTS book_reviews_ibfk_2
-            """)
-            
-            # Now we can safely drop and recreate users table
-            cursor.execute("DROP TABLE IF EXISTS users")
-            
-            users_table = """
-            CREATE TABLE users (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                username VARCHAR(255) NOT NULL UNIQUE,
-                full_name VARCHAR(255) NOT NULL,
-                class VARCHAR(50),
-                section VARCHAR(10),
-                registration_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                status ENUM('active', 'suspended', 'inactive') DEFAULT 'active'
-            )
-            """
-            cursor.execute(users_table)
-            connection.commit()
-            print("✅ Users table recreated successfully!")
-            
-            cursor.close()
-            connection.close()
+        # Schema migration 3 widens users.section in place; connecting applies it
+        # without dropping the table, so registered users are kept.
+        if db.connect(host='localhost', database='library_management',
+                      user='root', password=''):
+            with db.session() as cursor:
+                cursor.execute("""
+                    SELECT COLUMN_TYPE FROM information_schema.COLUMNS
+                    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'users'
+                      AND COLUMN_NAME = 'section'
+                """)
+                column_type = cursor.fetchone()[0]
+            print(f"✅ Users table is up to date (section {column_type})")
             
     except mysql.connector.Error as e:
         print(f"❌ Error: {e}")
+    finally:
+        db.close_connection()
 
 if __name__ == "__main__":
-    fix_users_table()
\ No newline at end of file
+    fix_users_table()
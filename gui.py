@@ -1,27 +1,380 @@
 """
 Library Management System GUI
 """
+import os
+from datetime import date
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext, filedialog
 from lib import Library, DatabaseConnection
-import mysql.connector
+from gui_tasks import TaskRunner
 import excel_utils
 
+# Background worker threads; the pool gets one more connection for the dialogs that query inline
+GUI_WORKERS = 4
+
+# Realtime user search: wait this long after the last keystroke
+USER_SEARCH_DELAY_MS = 250
+
+# Rows fetched per page by the book and user lists
+LIST_PAGE_SIZE = 200
+
+# Borrow history rows shown per page in the Reports tab and the user history window
+HISTORY_PAGE_SIZE = 100
+
+class AutocompleteEntry(ttk.Entry):
+    """Entry that lists as-you-type suggestions from complete(prefix) below itself"""
+
+    def __init__(self, master, complete, max_items=6, **kwargs):
+        super().__init__(master, **kwargs)
+        self.complete = complete
+        self.max_items = max_items
+        self.listbox = tk.Listbox(self.winfo_toplevel(), exportselection=False)
+        self.bind('<KeyRelease>', self.show_suggestions)
+        self.bind('<Down>', self.focus_suggestions)
+        self.bind('<Escape>', lambda event: self.hide_suggestions())
+        self.bind('<FocusOut>', lambda event: self.after(150, self.hide_if_unfocused))
+        self.listbox.bind('<ButtonRelease-1>', self.accept)
+        self.listbox.bind('<Return>', self.accept)
+        self.listbox.bind('<Escape>', lambda event: self.accept(choose=False))
+
+    def show_suggestions(self, event=None):
+        if event is not None and event.keysym in ('Down', 'Up', 'Return', 'Escape', 'Tab'):
+            return
+        text = self.get().strip()
+        try:
+            suggestions = self.complete(text) if text else []
+        except Exception:
+            suggestions = []
+        if not suggestions or suggestions == [text]:
+            self.hide_suggestions()
+            return
+        self.listbox.delete(0, tk.END)
+        for suggestion in suggestions:
+            self.listbox.insert(tk.END, suggestion)
+        self.listbox.configure(height=min(len(suggestions), self.max_items))
+        self.listbox.place(in_=self, relx=0, rely=1.0, relwidth=1.0)
+        self.listbox.lift()
+
+    def focus_suggestions(self, event=None):
+        if self.listbox.winfo_ismapped():
+            self.listbox.focus_set()
+            self.listbox.selection_clear(0, tk.END)
+            self.listbox.selection_set(0)
+            self.listbox.activate(0)
+        return 'break'
+
+    def accept(self, event=None, choose=True):
+        selection = self.listbox.curselection()
+        if choose and selection:
+            self.delete(0, tk.END)
+            self.insert(0, self.listbox.get(selection[0]))
+        self.hide_suggestions()
+        self.focus_set()
+        self.icursor(tk.END)
+
+    def hide_if_unfocused(self):
+        if self.focus_get() is not self.listbox:
+            self.hide_suggestions()
+
+    def hide_suggestions(self):
+        self.listbox.place_forget()
+
+
+class VirtualTreeview:
+    """
+    Treeview for long lists that only materializes the rows on screen.
+
+    Rows (tuples of column values) stay in a Python list; the Treeview holds
+    just the visible window plus a small buffer, and scrolling rewrites
+    those items' values instead of inserting one item per row. Rows arrive
+    page by page from load(): the next page is fetched on the task runner
+    when the window nears the end of the loaded rows. Clicking a heading
+    sorts the loaded rows in memory, without querying again.
+
+    Rows are identified by their first column (title, username), so
+    update_rows() can patch single rows in place after a write.
+    """
+
+    def __init__(self, master, tasks, columns, headings, widths=None,
+                 key=None, name="Loading", buffer=10, prefetch=50, insert_first=False):
+        self.tasks = tasks
+        self.columns = columns
+        self.headings = dict(zip(columns, headings))
+        self.key = key              # task key: a new load cancels the pages still pending
+        self.name = name
+        self.buffer = buffer        # materialized rows below the visible ones
+        self.prefetch = prefetch    # fetch the next page when this close to the end
+        self.insert_first = insert_first  # new rows go on top (lists ordered newest first)
+        self.tree = ttk.Treeview(master, columns=columns, show='headings', selectmode='browse')
+        self.scrollbar = ttk.Scrollbar(master, orient='vertical', command=self.yview)
+        self.tree.configure(yscrollcommand=self._tree_scrolled)
+        for column in columns:
+            self.tree.heading(column, text=self.headings[column],
+                              command=lambda column=column: self.sort_by(column))
+            if widths:
+                self.tree.column(column, width=widths[column])
+        
+        self.rows = []
+        self.positions = {}         # row key (first column) -> index in rows
+        self.offset = 0             # index of the first visible row
+        self.selected = None        # index of the selected row
+        self.fetch_page = None
+        self.accepts = None         # accepts(row): does a new row belong in this list?
+        self.next_key = None
+        self.complete = True        # False while more pages can be fetched
+        self.loading = False
+        self.sort_column = None
+        self.sort_reverse = False
+        
+        self.tree.bind('<Configure>', lambda event: self.render())
+        self.tree.bind('<<TreeviewSelect>>', self._selection_changed)
+        self.tree.bind('<MouseWheel>', lambda event: self.scroll(-3 if event.delta > 0 else 3))
+        self.tree.bind('<Button-4>', lambda event: self.scroll(-3))
+        self.tree.bind('<Button-5>', lambda event: self.scroll(3))
+        self.tree.bind('<Up>', self._on_up)
+        self.tree.bind('<Prior>', lambda event: self.scroll(-self.visible_rows()))
+        self.tree.bind('<Next>', lambda event: self.scroll(self.visible_rows()))
+
+    def pack(self):
+        self.tree.pack(side='left', fill='both', expand=True)
+        self.scrollbar.pack(side='right', fill='y')
+
+    def load(self, fetch_page, on_loaded=None, on_error=None, accepts=None):
+        """
+        Replace the rows with the pages returned by fetch_page(after).
+
+        fetch_page runs on a worker thread and returns a dict with 'rows' and
+        'next' (the after key of the following page, None on the last one).
+        The first page is requested now and replaces the current rows when
+        it arrives; on_loaded(page) is then called with it. accepts(row)
+        tells update_rows() whether a newly created row belongs in the list.
+        """
+        self.fetch_page = fetch_page
+        self.accepts = accepts
+        self._request_page(True, on_loaded, on_error)
+
+    def _request_page(self, first=False, on_loaded=None, on_error=None):
+        fetch_page = self.fetch_page
+        after = None if first else self.next_key
+        self.loading = True
+        
+        def loaded(page):
+            if fetch_page is not self.fetch_page:
+                return  # a newer load() replaced this list
+            self.loading = False
+            if first:
+                self.rows = []
+                self.positions = {}
+                self.offset = 0
+                self.selected = None
+            for row in page['rows']:
+                if row[0] not in self.positions:  # may already be there via update_rows()
+                    self.positions[row[0]] = len(self.rows)
+                    self.rows.append(row)
+            if self.sort_column is not None:
+                self._sort()
+            self.next_key = page['next']
+            self.complete = page['next'] is None
+            self.render()
+            if on_loaded:
+                on_loaded(page)
+        
+        def failed(error):
+            self.loading = False
+            self.complete = True  # don't retry on every scroll
+            if on_error:
+                on_error(error)
+            else:
+                messagebox.showerror("Error", str(error))
+        
+        self.tasks.submit(lambda: fetch_page(after), loaded, failed, name=self.name, key=self.key)
+
+    def visible_rows(self):
+        rowheight = int(ttk.Style().lookup('Treeview', 'rowheight') or 20)
+        height = self.tree.winfo_height()
+        if height <= 1:  # not mapped yet
+            return int(self.tree.cget('height'))
+        return max(1, height // rowheight - 1)  # one row's worth for the headings
+
+    def render(self):
+        """Write the rows of the current window into the Treeview items"""
+        visible = self.visible_rows()
+        self.offset = max(0, min(self.offset, len(self.rows) - visible))
+        window = self.rows[self.offset:self.offset + visible + self.buffer]
+        items = self.tree.get_children()
+        if len(items) > len(window):
+            self.tree.delete(*items[len(window):])
+        for position, row in enumerate(window):
+            if position < len(items):
+                self.tree.item(items[position], values=row)
+            else:
+                self.tree.insert('', 'end', values=row)
+        items = self.tree.get_children()
+        position = -1 if self.selected is None else self.selected - self.offset
+        if 0 <= position < len(items):
+            self.tree.selection_set(items[position])
+        elif self.tree.selection():
+            self.tree.selection_remove(*self.tree.selection())
+        self.tree.yview_moveto(0)
+        
+        total = len(self.rows)
+        if total:
+            self.scrollbar.set(self.offset / total, min(1.0, (self.offset + visible) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+        if (not self.complete and not self.loading
+                and self.offset + visible + self.prefetch >= total):
+            self._request_page()
+
+    def scroll(self, rows):
+        self.offset += rows
+        self.render()
+        return 'break'
+
+    def yview(self, *args):
+        """Scrollbar command: position over all loaded rows, not just the materialized ones"""
+        if args[0] == 'moveto':
+            self.offset = int(float(args[1]) * len(self.rows))
+        elif args[0] == 'scroll':
+            step = self.visible_rows() if args[2] == 'pages' else 1
+            self.offset += int(args[1]) * step
+        self.render()
+
+    def _tree_scrolled(self, first, last):
+        # Keyboard navigation scrolled into the buffer rows: move the window instead
+        items = self.tree.get_children()
+        shift = round(float(first) * len(items))
+        if shift > 0:
+            focus = self.tree.focus()
+            position = items.index(focus) - shift if focus in items else -1
+            self.scroll(shift)
+            items = self.tree.get_children()
+            if 0 <= position < len(items):
+                self.tree.focus(items[position])
+
+    def _on_up(self, event):
+        items = self.tree.get_children()
+        if items and self.tree.focus() == items[0] and self.offset > 0:
+            self.scroll(-1)
+            self.selected = self.offset
+            self.render()
+            self.tree.focus(items[0])
+            return 'break'
+
+    def _selection_changed(self, event=None):
+        selection = self.tree.selection()
+        items = self.tree.get_children()
+        if selection:
+            self.selected = self.offset + items.index(selection[0])
+        elif self.selected is not None and 0 <= self.selected - self.offset < len(items):
+            self.selected = None
+
+    def selected_row(self):
+        """The selected row as loaded (not the Treeview's string values), or None"""
+        return self.rows[self.selected] if self.selected is not None else None
+
+    def update_rows(self, updates):
+        """
+        Patch loaded rows in place, keeping the scroll position and selection.
+
+        updates are (key, row) pairs: key is the row's first column before the
+        change, row the new row or None to remove it. A row that isn't loaded
+        is added only to a fully loaded list whose accepts(row) is true; a
+        partially loaded list gets it with a later page if it belongs there.
+        """
+        added = False
+        for key, row in updates:
+            position = self.positions.get(key)
+            if position is None:
+                if row is not None and self.complete and self.accepts and self.accepts(row):
+                    if self.insert_first:
+                        self.rows.insert(0, row)
+                        if self.offset > 0:
+                            self.offset += 1
+                        if self.selected is not None:
+                            self.selected += 1
+                    else:
+                        self.rows.append(row)
+                    added = True
+            elif row is None:
+                del self.rows[position]
+                if position < self.offset:
+                    self.offset -= 1
+                if self.selected == position:
+                    self.selected = None
+                elif self.selected is not None and self.selected > position:
+                    self.selected -= 1
+                self._reindex()
+            else:
+                self.rows[position] = row
+                if row[0] != key:
+                    del self.positions[key]
+                    self.positions[row[0]] = position
+        if added:
+            if self.sort_column is not None:
+                self._sort()
+            else:
+                self._reindex()
+        if updates:
+            self.render()
+
+    def sort_by(self, column):
+        """Sort the loaded rows by a column; clicking the same heading again reverses the order"""
+        if column == self.sort_column:
+            self.sort_reverse = not self.sort_reverse
+        else:
+            self.sort_column, self.sort_reverse = column, False
+        for name in self.columns:
+            arrow = (' ▼' if self.sort_reverse else ' ▲') if name == column else ''
+            self.tree.heading(name, text=self.headings[name] + arrow)
+        self._sort()
+        if self.selected is not None:
+            self.offset = self.selected  # keep the selected row in view
+        self.render()
+
+    def _sort(self):
+        index = self.columns.index(self.sort_column)
+        
+        def key(row):
+            value = row[index]
+            return (value is None, value.casefold() if isinstance(value, str) else value)
+        selected = self.selected_row()
+        self.rows.sort(key=key, reverse=self.sort_reverse)
+        self._reindex()
+        if selected is not None:
+            self.selected = self.positions[selected[0]]
+
+    def _reindex(self):
+        self.positions = {row[0]: position for position, row in enumerate(self.rows)}
+
+
 class LibraryGUI:
     def __init__(self, root):
         self.root = root
         self.root.title("Mary Matha Digital Library Management System")
         self.root.geometry("800x600")
         
-        # Setup database connection
-        self.db = DatabaseConnection()
+        # Setup database connection (LIBRARY_DB_BACKEND=sqlite runs without a MySQL server)
+        self.db = DatabaseConnection(pool_size=GUI_WORKERS + 1,
+                                     backend=os.environ.get('LIBRARY_DB_BACKEND', 'mysql'))
         if not self.db.connect():
             messagebox.showerror("Error", "Failed to connect to database!")
             self.root.destroy()
             return
         
-        # Initialize library
-        self.library = Library(self.db)
+        # Initialize library; the catalog index keeps book search in memory, the
+        # catalog cache serves the available-books list and the user cache
+        # answers the user checks of returns and renewals without a query
+        self.library = Library(self.db, catalog_index=True, catalog_cache=True, user_cache=True)
+        
+        # Slow work runs on worker threads; results come back to this thread via root.after
+        self.tasks = TaskRunner(root, workers=GUI_WORKERS,
+                                on_error=self.show_task_error, on_busy=self.show_busy)
+        self.user_search_job = None         # pending debounced search (after id)
+        self.user_search_term = None        # term of the latest search started
+        self.history = None                 # BorrowHistory being paged in the Reports tab
+        self.history_keys = [None]          # 'after' key of each history page visited so far
+        self.history_page = 0               # index of the history page on screen
         
         # Create main notebook for tabs
         self.notebook = ttk.Notebook(root)
@@ -32,6 +385,18 @@ class LibraryGUI:
         self.create_user_tab()
         self.create_reports_tab()
         
+        # Busy indicator for background tasks
+        status_frame = ttk.Frame(root)
+        status_frame.pack(fill='x', padx=5)
+        self.busy_label = ttk.Label(status_frame, text="")
+        self.busy_label.pack(side='left')
+        self.busy_bar = ttk.Progressbar(status_frame, mode='indeterminate', length=120)
+        self.cancel_btn = ttk.Button(status_frame, text="Cancel", command=self.tasks.cancel)
+        
+        # Patch the lists in place after each write instead of reloading them
+        self.library.add_change_listener(
+            lambda changes: self.tasks.call_soon(lambda: self.apply_changes(changes)))
+        
         # Add exit button
         exit_btn = ttk.Button(root, text="Exit", command=self.on_closing)
         exit_btn.pack(pady=5)
@@ -58,31 +423,15 @@ class LibraryGUI:
         list_frame = ttk.LabelFrame(books_frame, text="Books List")
         list_frame.pack(fill='both', expand=True, padx=5, pady=5)
         
-        # Treeview for books
+        # Virtual list for books: only the visible rows are materialized
         columns = ('title', 'author', 'category', 'available', 'total')
-        self.books_tree = ttk.Treeview(list_frame, columns=columns, show='headings')
-        
-        # Define headings
-        self.books_tree.heading('title', text='Title')
-        self.books_tree.heading('author', text='Author')
-        self.books_tree.heading('category', text='Category')
-        self.books_tree.heading('available', text='Available')
-        self.books_tree.heading('total', text='Total')
-        
-        # Define columns
-        self.books_tree.column('title', width=200)
-        self.books_tree.column('author', width=150)
-        self.books_tree.column('category', width=100)
-        self.books_tree.column('available', width=70)
-        self.books_tree.column('total', width=70)
-        
-        # Add scrollbar
-        scrollbar = ttk.Scrollbar(list_frame, orient='vertical', command=self.books_tree.yview)
-        self.books_tree.configure(yscroll=scrollbar.set)
-        
-        # Pack elements
-        self.books_tree.pack(side='left', fill='both', expand=True)
-        scrollbar.pack(side='right', fill='y')
+        self.books_list = VirtualTreeview(
+            list_frame, self.tasks, columns,
+            ('Title', 'Author', 'Category', 'Available', 'Total'),
+            widths={'title': 200, 'author': 150, 'category': 100, 'available': 70, 'total': 70},
+            key='books', name="Loading books")
+        self.books_tree = self.books_list.tree
+        self.books_list.pack()
         
         # Buttons frame
         buttons_frame = ttk.Frame(books_frame)
@@ -116,6 +465,8 @@ class LibraryGUI:
         # Search and Show All buttons
         ttk.Button(search_frame, text="Search", command=lambda: self.search_users(None, show_popup=True)).pack(side='left', padx=5)
         ttk.Button(search_frame, text="Show All", command=self.refresh_users).pack(side='left', padx=5)
+        self.user_search_status = ttk.Label(search_frame, text="")
+        self.user_search_status.pack(side='left', padx=5)
         
         # User registration section
         reg_frame = ttk.LabelFrame(user_frame, text="User Registration")
@@ -133,30 +484,21 @@ class LibraryGUI:
             self.reg_vars[label] = tk.StringVar()
             ttk.Entry(fields_frame, textvariable=self.reg_vars[label]).grid(row=i, column=1, padx=5, pady=2, sticky='ew')
         
-        ttk.Button(reg_frame, text="Register User", command=self.register_user).pack(pady=5)
+        self.register_btn = ttk.Button(reg_frame, text="Register User", command=self.register_user)
+        self.register_btn.pack(pady=5)
         
         # User list section
         list_frame = ttk.LabelFrame(user_frame, text="Registered Users")
         list_frame.pack(fill='both', expand=True, padx=5, pady=5)
         
-        # Treeview for users
+        # Virtual list for users: only the visible rows are materialized
         columns = ('username', 'full_name', 'class', 'section', 'status')
-        self.users_tree = ttk.Treeview(list_frame, columns=columns, show='headings')
-        
-        # Define headings
-        self.users_tree.heading('username', text='Username')
-        self.users_tree.heading('full_name', text='Full Name')
-        self.users_tree.heading('class', text='Class')
-        self.users_tree.heading('section', text='Section')
-        self.users_tree.heading('status', text='Status')
-        
-        # Add scrollbar
-        scrollbar = ttk.Scrollbar(list_frame, orient='vertical', command=self.users_tree.yview)
-        self.users_tree.configure(yscroll=scrollbar.set)
-        
-        # Pack elements
-        self.users_tree.pack(side='left', fill='both', expand=True)
-        scrollbar.pack(side='right', fill='y')
+        self.users_list = VirtualTreeview(
+            list_frame, self.tasks, columns,
+            ('Username', 'Full Name', 'Class', 'Section', 'Status'),
+            key='users', name="Loading users")
+        self.users_tree = self.users_list.tree
+        self.users_list.pack()
         
         # Button frame
         button_frame = ttk.Frame(user_frame)
@@ -166,6 +508,8 @@ class LibraryGUI:
                   command=self.refresh_users).pack(side='left', padx=5)
         ttk.Button(button_frame, text="Remove User", 
                   command=self.remove_user).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="Borrowing History", 
+                  command=self.show_user_logs).pack(side='left', padx=5)
 
     def create_reports_tab(self):
         reports_frame = ttk.Frame(self.notebook)
@@ -186,50 +530,157 @@ class LibraryGUI:
         ttk.Button(buttons_frame, text="Borrow History", command=self.show_borrow_logs).pack(side='left', padx=5)
         ttk.Button(buttons_frame, text="Export to Excel", command=self.export_to_excel).pack(side='left', padx=5)
         ttk.Button(buttons_frame, text="Import from Excel", command=self.import_from_excel).pack(side='left', padx=5)
+        
+        # Borrow history filters (empty = any) and paging
+        history_frame = ttk.Frame(reports_frame)
+        history_frame.pack(fill='x', padx=5, pady=5)
+        
+        self.history_filters = {}
+        for key, label, width in (('start', "From (YYYY-MM-DD):", 12), ('end', "To:", 12),
+                                  ('student', "Student:", 15), ('title', "Title:", 20)):
+            ttk.Label(history_frame, text=label).pack(side='left', padx=(5, 2))
+            entry = ttk.Entry(history_frame, width=width)
+            entry.pack(side='left')
+            self.history_filters[key] = entry
+        
+        self.history_older_btn = ttk.Button(history_frame, text="Older ▶", state='disabled',
+                                            command=lambda: self.load_history_page(self.history_page + 1))
+        self.history_older_btn.pack(side='right', padx=5)
+        self.history_newer_btn = ttk.Button(history_frame, text="◀ Newer", state='disabled',
+                                            command=lambda: self.load_history_page(self.history_page - 1))
+        self.history_newer_btn.pack(side='right', padx=5)
 
     # Functionality methods
+    def show_busy(self, tasks):
+        """Show which background tasks are running (called by the task runner)"""
+        if tasks:
+            self.busy_label.config(text="⏳ " + ", ".join(
+                f"{task.name} ({task.progress})" if task.progress else task.name
+                for task in tasks) + "...")
+            if not self.busy_bar.winfo_ismapped():
+                self.busy_bar.pack(side='left', padx=5)
+                self.cancel_btn.pack(side='left', padx=5)
+                self.busy_bar.start(15)
+        else:
+            self.busy_label.config(text="")
+            self.busy_bar.stop()
+            self.busy_bar.pack_forget()
+            self.cancel_btn.pack_forget()
+
+    def show_task_error(self, task, error):
+        messagebox.showerror("Error", str(error))
+
+    def run_write(self, work, on_done, on_error=None, name="Saving", button=None):
+        """
+        Run a Library write on a worker thread, like the reports and lists
+
+        on_done(result) or on_error(exception) runs on the Tk thread. button
+        (the dialog's submit button) is disabled until the write finishes so
+        it can't be sent twice. Writes are not cancellable: once sent, the
+        database applies them, so their outcome is always shown.
+        """
+        if button is not None and button.winfo_exists():
+            button.config(state='disabled')
+        
+        def finished(callback, value):
+            if button is not None and button.winfo_exists():
+                button.config(state='normal')
+            callback(value)
+        
+        on_error = on_error or (lambda error: messagebox.showerror("Error", str(error)))
+        return self.tasks.submit(work, lambda result: finished(on_done, result),
+                                 lambda error: finished(on_error, error), name=name, cancellable=False)
+
+    @staticmethod
+    def book_rows(books):
+        return [(book['title'], book['author'], book['category'], book['available'], book['total'])
+                for book in books]
+
+    def apply_changes(self, changes):
+        """Update the changed rows of the book and user lists (Library change listener)"""
+        books = [(change['key'], self.book_rows([change['row']])[0] if change['row'] else None)
+                 for change in changes if change['table'] == 'books']
+        users = [(change['key'], self.user_rows([change['row']])[0] if change['row'] else None)
+                 for change in changes if change['table'] == 'users']
+        if books:
+            self.books_list.update_rows(books)
+        if users:
+            self.users_list.update_rows(users)
+
     def search_books(self):
         search_term = self.search_var.get()
-        # Clear current items
-        for item in self.books_tree.get_children():
-            self.books_tree.delete(item)
         
-        try:
-            books = self.library.searchBooks(search_term)
-            for book in books:
-                self.books_tree.insert('', 'end', values=(
-                    book['title'],
-                    book['author'],
-                    book['category'],
-                    book['available'],
-                    book['total']
-                ))
-                
-            if not books:
+        def fetch_page(after):
+            page = self.library.search_books_page(search_term, page_size=LIST_PAGE_SIZE, after=after)
+            books = page['books']
+            if not books and after is None and search_term.strip():
+                books = self.library.suggest_books(search_term)
+            return {'rows': self.book_rows(books), 'next': page['next'],
+                    'suggested': bool(books) and 'score' in books[0]}
+        
+        def loaded(page):
+            if not page['rows']:
                 messagebox.showinfo("Search Results", "No books found matching your search.")
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
+            elif page['suggested']:
+                messagebox.showinfo("Search Results",
+                                    "No exact matches. Showing similar titles - did you mean one of these?")
+        
+        self.books_list.load(fetch_page, loaded)
+
+    def loan_title_entry(self, master, username_var, **kwargs):
+        """
+        Title entry completing over the titles the entered user has on loan
+
+        The loans are fetched on a worker thread once per username; until they
+        arrive there are no suggestions, so typing never waits on the database.
+        """
+        loans = {'username': None, 'titles': []}
+        
+        def complete(prefix):
+            username = username_var.get().strip()
+            if username != loans['username']:
+                loans['username'] = username
+                loans['titles'] = []
+                if username:
+                    # Same key: a fetch for a username typed earlier is cancelled
+                    self.tasks.submit(lambda: self.library.get_active_loan_titles(username),
+                                      lambda titles: loaded(username, titles),
+                                      lambda error: loans.update(username=None),
+                                      name="Loading loans", key='loan-titles')
+            key = prefix.casefold()
+            return [title for title in loans['titles'] if title.casefold().startswith(key)]
+        
+        def loaded(username, titles):
+            if username != loans['username'] or not entry.winfo_exists():
+                return
+            loans['titles'] = titles
+            if entry.focus_get() is entry:
+                entry.show_suggestions()
+        
+        entry = AutocompleteEntry(master, complete, **kwargs)
+        return entry
+
+    def offer_title_suggestion(self, error, book_title, book_var, retry):
+        """After a failed lookup, offer the closest known title; True if a suggestion was shown"""
+        suggestions = self.library.suggest_books(book_title, limit=1)
+        if not suggestions:
+            return False
+        best = suggestions[0]['title']
+        if messagebox.askyesno("Did you mean?", f"{error}\n\nDid you mean '{best}'?"):
+            book_var.set(best)
+            retry()
+        return True
 
     def show_all_books(self):
-        # Clear current items
-        for item in self.books_tree.get_children():
-            self.books_tree.delete(item)
-            
-        try:
-            books = self.library.displayAvailableBooks()
-            for book in books:
-                self.books_tree.insert('', 'end', values=(
-                    book['title'],
-                    book['author'],
-                    book['category'],
-                    book['available'],
-                    book['total']
-                ))
-                
-            if not books:
+        def fetch_page(after):
+            page = self.library.get_available_books_page(page_size=LIST_PAGE_SIZE, after=after)
+            return {'rows': self.book_rows(page['books']), 'next': page['next']}
+        
+        def loaded(page):
+            if not page['rows']:
                 messagebox.showinfo("Books", "No books available in the library.")
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
+        
+        self.books_list.load(fetch_page, loaded, accepts=lambda row: row[3] > 0)
 
     def borrow_book(self):
         # Create dialog for borrowing
@@ -259,7 +710,8 @@ class LibraryGUI:
         username_frame.pack(fill=tk.X, pady=5)
         ttk.Label(username_frame, text="Username:*", width=15).pack(side=tk.LEFT)
         username_var = tk.StringVar()
-        username_entry = ttk.Entry(username_frame, textvariable=username_var, width=30)
+        username_entry = AutocompleteEntry(username_frame, self.library.complete_usernames,
+                                           textvariable=username_var, width=30)
         username_entry.pack(side=tk.LEFT)
         
         # Book Title
@@ -267,7 +719,8 @@ class LibraryGUI:
         book_frame.pack(fill=tk.X, pady=5)
         ttk.Label(book_frame, text="Book Title:*", width=15).pack(side=tk.LEFT)
         book_var = tk.StringVar()
-        book_entry = ttk.Entry(book_frame, textvariable=book_var, width=30)
+        book_entry = AutocompleteEntry(book_frame, self.library.complete_titles,
+                                       textvariable=book_var, width=30)
         book_entry.pack(side=tk.LEFT)
         
         # Required fields note
@@ -282,8 +735,7 @@ class LibraryGUI:
                 messagebox.showerror("Error", "Both username and book title are required!")
                 return
             
-            try:
-                result = self.library.borrowBook(username, book_title)
+            def borrowed(result):
                 if result['success']:
                     message = (
                         f"✅ BOOK ISSUED SUCCESSFULLY!\n\n"
@@ -294,16 +746,20 @@ class LibraryGUI:
                     )
                     messagebox.showinfo("Success", message)
                     dialog.destroy()
-                    self.show_all_books()  # Refresh the books list
-            except Exception as e:
-                messagebox.showerror("Error", str(e))
+            
+            def failed(e):
+                if not self.offer_title_suggestion(str(e), book_title, book_var, submit):
+                    messagebox.showerror("Error", str(e))
+            
+            self.run_write(lambda: self.library.borrowBook(username, book_title), borrowed, failed,
+                           name="Borrowing", button=ok_button)
         
         # Buttons frame
         buttons_frame = ttk.Frame(main_frame)
         buttons_frame.pack(pady=20)
         
-        ttk.Button(buttons_frame, text="OK", command=submit, 
-                  width=10).pack(side=tk.LEFT, padx=5)
+        ok_button = ttk.Button(buttons_frame, text="OK", command=submit, width=10)
+        ok_button.pack(side=tk.LEFT, padx=5)
         ttk.Button(buttons_frame, text="Cancel", 
                   command=dialog.destroy, width=10).pack(side=tk.LEFT, padx=5)
         
@@ -343,14 +799,16 @@ class LibraryGUI:
         username_frame.pack(fill=tk.X, pady=5)
         ttk.Label(username_frame, text="Username:*", width=15).pack(side=tk.LEFT)
         username_var = tk.StringVar()
-        ttk.Entry(username_frame, textvariable=username_var, width=30).pack(side=tk.LEFT)
+        AutocompleteEntry(username_frame, self.library.complete_usernames,
+                          textvariable=username_var, width=30).pack(side=tk.LEFT)
         
-        # Book Title
+        # Book Title (suggestions come from the user's current loans)
         book_frame = ttk.Frame(fields_frame)
         book_frame.pack(fill=tk.X, pady=5)
         ttk.Label(book_frame, text="Book Title:*", width=15).pack(side=tk.LEFT)
         book_var = tk.StringVar()
-        ttk.Entry(book_frame, textvariable=book_var, width=30).pack(side=tk.LEFT)
+        self.loan_title_entry(book_frame, username_var,
+                              textvariable=book_var, width=30).pack(side=tk.LEFT)
         
         # Required fields note
         ttk.Label(main_frame, text="* Required fields", 
@@ -364,8 +822,7 @@ class LibraryGUI:
                 messagebox.showerror("Error", "Both username and book title are required!")
                 return
             
-            try:
-                result = self.library.returnBook(username, book_title)
+            def returned(result):
                 if result['success']:
                     message = f"✅ BOOK RETURNED SUCCESSFULLY!\n\n"
                     message += f"📚 Book: {result['book']}\n"
@@ -380,21 +837,25 @@ class LibraryGUI:
                     
                     messagebox.showinfo("Success", message)
                     dialog.destroy()
-                    self.show_all_books()  # Refresh the books list
                     
                     # Ask for review
                     if messagebox.askyesno("Book Review", 
                                          "Would you like to rate and review this book?"):
                         self.submit_review(username, book_title)
-            except Exception as e:
-                messagebox.showerror("Error", str(e))
+            
+            def failed(e):
+                if not self.offer_title_suggestion(str(e), book_title, book_var, submit):
+                    messagebox.showerror("Error", str(e))
+            
+            self.run_write(lambda: self.library.returnBook(username, book_title), returned, failed,
+                           name="Returning", button=ok_button)
         
         # Buttons frame
         buttons_frame = ttk.Frame(main_frame)
         buttons_frame.pack(pady=20)
         
-        ttk.Button(buttons_frame, text="OK", command=submit, 
-                  width=10).pack(side=tk.LEFT, padx=5)
+        ok_button = ttk.Button(buttons_frame, text="OK", command=submit, width=10)
+        ok_button.pack(side=tk.LEFT, padx=5)
         ttk.Button(buttons_frame, text="Cancel", 
                   command=dialog.destroy, width=10).pack(side=tk.LEFT, padx=5)
         
@@ -434,14 +895,16 @@ class LibraryGUI:
         username_frame.pack(fill=tk.X, pady=5)
         ttk.Label(username_frame, text="Username:*", width=15).pack(side=tk.LEFT)
         username_var = tk.StringVar()
-        ttk.Entry(username_frame, textvariable=username_var, width=30).pack(side=tk.LEFT)
+        AutocompleteEntry(username_frame, self.library.complete_usernames,
+                          textvariable=username_var, width=30).pack(side=tk.LEFT)
         
-        # Book Title
+        # Book Title (suggestions come from the user's current loans)
         book_frame = ttk.Frame(fields_frame)
         book_frame.pack(fill=tk.X, pady=5)
         ttk.Label(book_frame, text="Book Title:*", width=15).pack(side=tk.LEFT)
         book_var = tk.StringVar()
-        ttk.Entry(book_frame, textvariable=book_var, width=30).pack(side=tk.LEFT)
+        self.loan_title_entry(book_frame, username_var,
+                              textvariable=book_var, width=30).pack(side=tk.LEFT)
         
         # Required fields note
         ttk.Label(main_frame, text="* Required fields", 
@@ -455,20 +918,19 @@ class LibraryGUI:
                 messagebox.showerror("Error", "Both username and book title are required!")
                 return
             
-            try:
-                self.library.renewBook(username, book_title)
+            def renewed(result):
                 messagebox.showinfo("Success", f"Book '{book_title}' has been successfully renewed for 7 more days!")
                 dialog.destroy()
-                self.show_all_books()  # Refresh the books list
-            except Exception as e:
-                messagebox.showerror("Error", str(e))
+            
+            self.run_write(lambda: self.library.renewBook(username, book_title), renewed,
+                           name="Renewing", button=ok_button)
         
         # Buttons frame
         buttons_frame = ttk.Frame(main_frame)
         buttons_frame.pack(pady=20)
         
-        ttk.Button(buttons_frame, text="OK", command=submit, 
-                  width=10).pack(side=tk.LEFT, padx=5)
+        ok_button = ttk.Button(buttons_frame, text="OK", command=submit, width=10)
+        ok_button.pack(side=tk.LEFT, padx=5)
         ttk.Button(buttons_frame, text="Cancel", 
                   command=dialog.destroy, width=10).pack(side=tk.LEFT, padx=5)
         
@@ -557,20 +1019,19 @@ class LibraryGUI:
                 messagebox.showerror("Error", "Book title and author are required!")
                 return
             
-            try:
-                self.library.addNewBook(title, author, category, copies)
+            def added(result):
                 messagebox.showinfo("Success", f"Successfully added {copies} copies of '{title}' to the library!")
                 dialog.destroy()
-                self.show_all_books()  # Refresh the books list
-            except Exception as e:
-                messagebox.showerror("Error", str(e))
+            
+            self.run_write(lambda: self.library.addNewBook(title, author, category, copies), added,
+                           name="Adding book", button=add_button)
         
         # Buttons frame
         buttons_frame = ttk.Frame(main_frame)
         buttons_frame.pack(pady=20)
         
-        ttk.Button(buttons_frame, text="Add Book", command=submit, 
-                  width=10).pack(side=tk.LEFT, padx=5)
+        add_button = ttk.Button(buttons_frame, text="Add Book", command=submit, width=10)
+        add_button.pack(side=tk.LEFT, padx=5)
         ttk.Button(buttons_frame, text="Cancel", 
                   command=dialog.destroy, width=10).pack(side=tk.LEFT, padx=5)
         
@@ -642,19 +1103,19 @@ class LibraryGUI:
                 messagebox.showerror("Error", "Book title is required!")
                 return
             
-            try:
-                self.library.addNewBook(title, author or "Unknown", category)
+            def donated(result):
                 messagebox.showinfo("Success", f"Book '{title}' has been successfully donated!, thank you for your contribution.")
                 dialog.destroy()
-                self.show_all_books()  # Refresh the books list
-            except Exception as e:
-                messagebox.showerror("Error", str(e))
+            
+            self.run_write(lambda: self.library.addNewBook(title, author or "Unknown", category), donated,
+                           name="Adding book", button=ok_button)
         
         # Buttons frame
         buttons_frame = ttk.Frame(main_frame)
         buttons_frame.pack(pady=20)
         
-        ttk.Button(buttons_frame, text="OK", command=submit, width=10).pack(side=tk.LEFT, padx=5)
+        ok_button = ttk.Button(buttons_frame, text="OK", command=submit, width=10)
+        ok_button.pack(side=tk.LEFT, padx=5)
         ttk.Button(buttons_frame, text="Cancel", 
                   command=dialog.destroy, width=10).pack(side=tk.LEFT, padx=5)
         
@@ -668,14 +1129,9 @@ class LibraryGUI:
 
     def remove_user(self):
         # Get selected user
-        selected = self.users_tree.selection()
-        if not selected:
-            messagebox.showwarning("Warning", "Please select a user to remove")
-            return
-            
-        # Get user details
-        user_values = self.users_tree.item(selected[0])['values']
+        user_values = self.users_list.selected_row()
         if not user_values:
+            messagebox.showwarning("Warning", "Please select a user to remove")
             return
             
         username = user_values[0]
@@ -715,23 +1171,23 @@ class LibraryGUI:
                                      "This action cannot be undone!"):
                 return
             
-            try:
-                success, message = self.library.removeUser(username)
+            def removed(outcome):
+                success, message = outcome
                 if success:
                     messagebox.showinfo("Success", message)
                     dialog.destroy()
-                    self.refresh_users()  # Refresh the users list
                 else:
                     messagebox.showerror("Error", message)
-            except Exception as e:
-                messagebox.showerror("Error", str(e))
+            
+            self.run_write(lambda: self.library.removeUser(username), removed,
+                           name="Removing user", button=remove_button)
         
         # Buttons frame
         buttons_frame = ttk.Frame(main_frame)
         buttons_frame.pack(pady=20)
         
-        ttk.Button(buttons_frame, text="Remove", command=submit, 
-                  width=10).pack(side=tk.LEFT, padx=5)
+        remove_button = ttk.Button(buttons_frame, text="Remove", command=submit, width=10)
+        remove_button.pack(side=tk.LEFT, padx=5)
         ttk.Button(buttons_frame, text="Cancel", 
                   command=dialog.destroy, width=10).pack(side=tk.LEFT, padx=5)
         
@@ -743,17 +1199,80 @@ class LibraryGUI:
         y = (dialog.winfo_screenheight() // 2) - (height // 2)
         dialog.geometry(f'{width}x{height}+{x}+{y}')
 
+    def show_user_logs(self):
+        """Open the selected user's loans (open ones first) with their lifetime totals"""
+        user_values = self.users_list.selected_row()
+        if not user_values:
+            messagebox.showwarning("Warning", "Please select a user to view")
+            return
+        username = user_values[0]
+        
+        dialog = tk.Toplevel(self.root)
+        dialog.title(f"Borrowing History - {username}")
+        dialog.geometry("760x420")
+        dialog.transient(self.root)
+        
+        main_frame = ttk.Frame(dialog, padding="10 10 10 10")
+        main_frame.pack(fill=tk.BOTH, expand=True)
+        
+        summary_label = ttk.Label(main_frame, text="Loading...", justify='left')
+        summary_label.pack(anchor='w', pady=(0, 10))
+        
+        tree_frame = ttk.Frame(main_frame)
+        tree_frame.pack(fill=tk.BOTH, expand=True)
+        columns = ('book', 'borrowed', 'due', 'status', 'returned', 'fine')
+        tree = ttk.Treeview(tree_frame, columns=columns, show='headings')
+        for column, heading, width in zip(columns,
+                                          ('Book Title', 'Borrowed', 'Due', 'Status', 'Returned', 'Fine'),
+                                          (200, 120, 90, 110, 120, 70)):
+            tree.heading(column, text=heading)
+            tree.column(column, width=width)
+        scrollbar = ttk.Scrollbar(tree_frame, orient='vertical', command=tree.yview)
+        tree.configure(yscrollcommand=scrollbar.set)
+        tree.pack(side='left', fill=tk.BOTH, expand=True)
+        scrollbar.pack(side='right', fill='y')
+        
+        buttons_frame = ttk.Frame(main_frame)
+        buttons_frame.pack(pady=(10, 0))
+        more_btn = ttk.Button(buttons_frame, text="Load More", state='disabled', width=10)
+        more_btn.pack(side=tk.LEFT, padx=5)
+        ttk.Button(buttons_frame, text="Close", command=dialog.destroy, width=10).pack(side=tk.LEFT, padx=5)
+        
+        def show_page(result):
+            if not dialog.winfo_exists():
+                return
+            user = result['user']
+            rate = f"{user['on_time_rate']:.0%}" if user['on_time_rate'] is not None else "N/A"
+            summary_label.config(text=(
+                f"👤 {user['full_name']} ({user['username']}) - {user['status']}\n"
+                f"📚 Borrowed: {user['total_borrowed']}   📖 Currently: {user['active_books']}   "
+                f"⏰ On time: {rate}   💰 Fines: ₹{user['total_fines']:.2f}"))
+            for log in result['logs']:
+                returned = f"{log['return_date']:%Y-%m-%d %H:%M}" if log['return_date'] else "N/A"
+                tree.insert('', 'end', values=(
+                    log['book'], f"{log['borrowed_date']:%Y-%m-%d %H:%M}", f"{log['due_date']:%Y-%m-%d}",
+                    log['status'], returned, f"₹{log['fine']:.2f}"))
+            if result['next'] is None:
+                more_btn.config(state='disabled')
+            else:
+                more_btn.config(state='normal', command=lambda: load(result['next']))
+        
+        def load(after=None):
+            more_btn.config(state='disabled')
+            self.tasks.submit(lambda: self.library.getUserLogs(username, HISTORY_PAGE_SIZE, after),
+                              show_page, name="User history", key=('user-logs', username))
+        
+        load()
+
     def register_user(self):
-        try:
-            username = self.reg_vars['Username:'].get().strip()
-            full_name = self.reg_vars['Full Name:'].get().strip()
-            class_name = self.reg_vars['Class:'].get().strip()
-            section = self.reg_vars['Section:'].get().strip()
-            
-            success, result = self.library.registerUser(username, full_name, class_name, section)
-            
+        username = self.reg_vars['Username:'].get().strip()
+        full_name = self.reg_vars['Full Name:'].get().strip()
+        class_name = self.reg_vars['Class:'].get().strip()
+        section = self.reg_vars['Section:'].get().strip()
+        
+        def registered(outcome):
+            success, result = outcome
             if success:
-                self.refresh_users()
                 messagebox.showinfo("Success", 
                     f"✅ User '{result['username']}' registered successfully!\n\n"
                     f"👤 Full Name: {result['full_name']}\n"
@@ -766,88 +1285,73 @@ class LibraryGUI:
                     var.set('')
             else:
                 messagebox.showerror("Error", result)
-                
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
+        
+        self.run_write(lambda: self.library.registerUser(username, full_name, class_name, section),
+                       registered, name="Registering user", button=self.register_btn)
 
     def search_users_realtime(self, event=None):
-        """Real-time search for users without popup messages"""
+        """Real-time search for users without popup messages, debounced and run off the Tk thread"""
         search_term = self.user_search_var.get().strip()
-        
-        # Clear current items
-        for item in self.users_tree.get_children():
-            self.users_tree.delete(item)
-        
-        try:
+        if search_term == self.user_search_term and self.user_search_job is None:
+            return  # e.g. arrow keys: nothing to search again
+        if self.user_search_job is not None:
+            self.root.after_cancel(self.user_search_job)
+        self.user_search_job = self.root.after(USER_SEARCH_DELAY_MS, self.start_user_search)
+
+    def start_user_search(self):
+        self.user_search_job = None
+        search_term = self.user_search_var.get().strip()
+        self.user_search_term = search_term
+        self.user_search_status.config(text="Searching...")
+        
+        # Same task key as the other user listings: a newer keystroke cancels this search
+        self.users_list.load(self.user_pages(search_term),
+                             lambda page: self.user_search_status.config(text=""),
+                             self.show_user_search_error,
+                             accepts=None if search_term else lambda row: True)
+
+    @staticmethod
+    def user_rows(users):
+        return [(user['username'], user['full_name'], user['class'], user['section'], user['status'])
+                for user in users]
+
+    def user_pages(self, search_term):
+        """fetch_page for users_list: matching users, or all users for an empty term"""
+        def fetch_page(after):
             if search_term:
-                users = self.library.searchUsers(search_term)
+                page = self.library.search_users_page(search_term, page_size=LIST_PAGE_SIZE, after=after)
             else:
-                users = self.library.listAllUsers()
-                
-            for user in users:
-                self.users_tree.insert('', 'end', values=(
-                    user['username'],
-                    user['full_name'],
-                    user['class'],
-                    user['section'],
-                    user['status']
-                ))
-                
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
+                page = self.library.list_users_page(page_size=LIST_PAGE_SIZE, after=after)
+            return {'rows': self.user_rows(page['users']), 'next': page['next']}
+        return fetch_page
+
+    def show_user_search_error(self, error):
+        self.user_search_status.config(text="")
+        messagebox.showerror("Error", str(error))
 
     def search_users(self, event=None, show_popup=False):
         """Search for users based on search bar input with optional popup"""
         search_term = self.user_search_var.get().strip()
         
-        # Clear current items
-        for item in self.users_tree.get_children():
-            self.users_tree.delete(item)
-        
-        try:
-            if search_term:
-                users = self.library.searchUsers(search_term)
-            else:
-                users = self.library.listAllUsers()
-                
-            for user in users:
-                self.users_tree.insert('', 'end', values=(
-                    user['username'],
-                    user['full_name'],
-                    user['class'],
-                    user['section'],
-                    user['status']
-                ))
-                
+        def loaded(page):
+            self.user_search_status.config(text="")
             # Only show popup when explicitly requested (via Search button)
-            if show_popup and not users:
+            if show_popup and not page['rows']:
                 if search_term:
                     messagebox.showinfo("Search Results", "No users found matching your search.")
                 else:
                     messagebox.showinfo("Users", "No users registered in the system.")
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
+        
+        self.users_list.load(self.user_pages(search_term), loaded,
+                             accepts=None if search_term else lambda row: True)
 
     def refresh_users(self):
-        # Clear current items
-        for item in self.users_tree.get_children():
-            self.users_tree.delete(item)
-        
-        try:
-            users = self.library.listAllUsers()
-            for user in users:
-                self.users_tree.insert('', 'end', values=(
-                    user['username'],
-                    user['full_name'],
-                    user['class'],
-                    user['section'],
-                    user['status']
-                ))
-                
-            if not users:
+        def loaded(page):
+            self.user_search_status.config(text="")
+            if not page['rows']:
                 messagebox.showinfo("Users", "No users registered in the system.")
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
+        
+        self.users_list.load(self.user_pages(''), loaded, accepts=lambda row: True)
 
     def submit_review(self, username, book_title):
         """Open dialog for submitting book review"""
@@ -886,154 +1390,149 @@ class LibraryGUI:
         def submit():
             try:
                 rating = int(rating_var.get())
-                review = review_text.get("1.0", tk.END).strip()
-                if not review:
-                    review = None
-                    
-                result = self.library.add_book_review(username, book_title, rating, review)
+            except ValueError:
+                messagebox.showerror("Error", "Please select a valid rating (1-5)")
+                return
+            review = review_text.get("1.0", tk.END).strip()
+            if not review:
+                review = None
+            
+            def saved(result):
                 if result is True:
                     messagebox.showinfo("Success", "Thank you for your review!")
                     review_dialog.destroy()
                 else:
                     messagebox.showerror("Error", str(result))
-            except ValueError:
-                messagebox.showerror("Error", "Please select a valid rating (1-5)")
+            
+            self.run_write(lambda: self.library.add_book_review(username, book_title, rating, review),
+                           saved, name="Saving review", button=submit_button)
         
         # Buttons
         buttons_frame = ttk.Frame(main_frame)
         buttons_frame.pack(pady=20)
-        ttk.Button(buttons_frame, text="Submit Review", command=submit).pack(side=tk.LEFT, padx=5)
+        submit_button = ttk.Button(buttons_frame, text="Submit Review", command=submit)
+        submit_button.pack(side=tk.LEFT, padx=5)
         ttk.Button(buttons_frame, text="Cancel", 
                   command=review_dialog.destroy).pack(side=tk.LEFT, padx=5)
 
     def show_top_rated(self):
         """Display top rated books in the reports area"""
-        try:
-            self.reports_text.delete(1.0, tk.END)
+        def work():
             top_books = self.library.get_top_rated_books(5)
-            
-            self.reports_text.insert(tk.END, "⭐ TOP RATED BOOKS ⭐\n")
-            self.reports_text.insert(tk.END, "=" * 60 + "\n\n")
-            
-            if top_books:
-                for book in top_books:
-                    title, author, category, avg_rating, num_reviews = book
-                    rating_str = f"{avg_rating:.1f}/5.0" if avg_rating else "No rating"
-                    self.reports_text.insert(tk.END, f"📚 Book:{title}\n")
-                    self.reports_text.insert(tk.END, f"   Author: {author}\n")
-                    self.reports_text.insert(tk.END, f"   Category: {category}\n")
-                    self.reports_text.insert(tk.END, f"   Rating: {rating_str} ({num_reviews} reviews)\n")
-                    
-                    # Get detailed reviews
-                    reviews = self.library.get_book_reviews(title)
-                    if reviews:
-                        self.reports_text.insert(tk.END, "\n   Recent Reviews:\n")
-                        for review in reviews[:3]:  # Show only 3 most recent reviews
-                            username, rating, review_text, review_date = review
-                            self.reports_text.insert(tk.END, f"   • {username} - {rating}⭐\n")
-                            if review_text:
-                                self.reports_text.insert(tk.END, f"     \"{review_text}\"\n")
-                    self.reports_text.insert(tk.END, "\n" + "-"*50 + "\n\n")
-            else:
-                self.reports_text.insert(tk.END, "No book ratings yet.\n")
+            return [(book, self.library.get_book_reviews(book[0])) for book in top_books]
+        
+        self.tasks.submit(work, self.display_top_rated, name="Top rated books", key='reports')
+
+    def display_top_rated(self, top_books):
+        self.reports_text.delete(1.0, tk.END)
+        self.reports_text.insert(tk.END, "⭐ TOP RATED BOOKS ⭐\n")
+        self.reports_text.insert(tk.END, "=" * 60 + "\n\n")
+        
+        if top_books:
+            for book, reviews in top_books:
+                title, author, category, avg_rating, num_reviews = book
+                rating_str = f"{avg_rating:.1f}/5.0" if avg_rating else "No rating"
+                self.reports_text.insert(tk.END, f"📚 Book:{title}\n")
+                self.reports_text.insert(tk.END, f"   Author: {author}\n")
+                self.reports_text.insert(tk.END, f"   Category: {category}\n")
+                self.reports_text.insert(tk.END, f"   Rating: {rating_str} ({num_reviews} reviews)\n")
                 
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
+                # Detailed reviews
+                if reviews:
+                    self.reports_text.insert(tk.END, "\n   Recent Reviews:\n")
+                    for review in reviews[:3]:  # Show only 3 most recent reviews
+                        username, rating, review_text, review_date = review
+                        self.reports_text.insert(tk.END, f"   • {username} - {rating}⭐\n")
+                        if review_text:
+                            self.reports_text.insert(tk.END, f"     \"{review_text}\"\n")
+                self.reports_text.insert(tk.END, "\n" + "-"*50 + "\n\n")
+        else:
+            self.reports_text.insert(tk.END, "No book ratings yet.\n")
 
     def show_statistics(self):
-        try:
-            self.reports_text.delete(1.0, tk.END)
-            report_data = self.library.generateReports()
-            
-            # Format and display the report
-            self.reports_text.insert(tk.END, "📊 LIBRARY STATISTICS REPORT\n")
-            self.reports_text.insert(tk.END, "=" * 60 + "\n\n")
-            
-            # Summary
-            summary = report_data['summary']
-            self.reports_text.insert(tk.END, f"📚 Total Unique Books: {summary['unique_books']}\n")
-            self.reports_text.insert(tk.END, f"📖 Total Book Copies: {summary['total_copies']}\n")
-            self.reports_text.insert(tk.END, f"✅ Available Copies: {summary['available_copies']}\n")
-            self.reports_text.insert(tk.END, f"📋 Borrowed Copies: {summary['borrowed_copies']}\n\n")
-            
-            # Popular books
-            if report_data['popular_books']:
-                self.reports_text.insert(tk.END, "🏆 TOP 5 MOST BORROWED BOOKS:\n")
-                for i, book in enumerate(report_data['popular_books'], 1):
-                    self.reports_text.insert(tk.END, f"{i}. {book['title']} ({book['count']} times)\n")
-                self.reports_text.insert(tk.END, "\n")
-            
-            # Active borrowers
-            if report_data['active_borrowers']:
-                self.reports_text.insert(tk.END, "👥 ACTIVE BORROWERS:\n")
-                for borrower in report_data['active_borrowers']:
-                    self.reports_text.insert(tk.END, f"• {borrower['name']}: {borrower['books']} book(s)\n")
-            
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
+        self.tasks.submit(self.library.generateReports, self.display_statistics,
+                          name="Library statistics", key='reports')
+
+    def display_statistics(self, report_data):
+        self.reports_text.delete(1.0, tk.END)
+        
+        # Format and display the report
+        self.reports_text.insert(tk.END, "📊 LIBRARY STATISTICS REPORT\n")
+        self.reports_text.insert(tk.END, "=" * 60 + "\n\n")
+        
+        # Summary
+        summary = report_data['summary']
+        self.reports_text.insert(tk.END, f"📚 Total Unique Books: {summary['unique_books']}\n")
+        self.reports_text.insert(tk.END, f"📖 Total Book Copies: {summary['total_copies']}\n")
+        self.reports_text.insert(tk.END, f"✅ Available Copies: {summary['available_copies']}\n")
+        self.reports_text.insert(tk.END, f"📋 Borrowed Copies: {summary['borrowed_copies']}\n\n")
+        
+        # Popular books
+        if report_data['popular_books']:
+            self.reports_text.insert(tk.END, "🏆 TOP 5 MOST BORROWED BOOKS:\n")
+            for i, book in enumerate(report_data['popular_books'], 1):
+                self.reports_text.insert(tk.END, f"{i}. {book['title']} ({book['count']} times)\n")
+            self.reports_text.insert(tk.END, "\n")
+        
+        # Active borrowers
+        if report_data['active_borrowers']:
+            self.reports_text.insert(tk.END, "👥 ACTIVE BORROWERS:\n")
+            for borrower in report_data['active_borrowers']:
+                self.reports_text.insert(tk.END, f"• {borrower['name']}: {borrower['books']} book(s)\n")
 
     def show_overdue(self):
-        try:
-            self.reports_text.delete(1.0, tk.END)
-            data = self.library.getOverdueBooks()
-            
-            if not data['books']:
-                self.reports_text.insert(tk.END, "✅ NO OVERDUE BOOKS!\n")
-                return
-            
-            self.reports_text.insert(tk.END, f"⚠️  {len(data['books'])} OVERDUE BOOKS:\n")
-            self.reports_text.insert(tk.END, "-" * 100 + "\n")
-            self.reports_text.insert(tk.END, f"{'Student':<20} {'Book Title':<25} {'Due Date':<12} {'Days Late':<10} {'Fine':<10}\n")
-            self.reports_text.insert(tk.END, "-" * 100 + "\n")
-            
-            for book in data['books']:
-                fine_str = f"₹{book['fine']:.2f}"
-                self.reports_text.insert(tk.END, 
-                    f"{book['student']:<20} {book['book']:<25} {book['due_date']:<12} "
-                    f"{book['days_overdue']:<10} {fine_str:<10}\n"
-                )
-            
-            self.reports_text.insert(tk.END, "-" * 100 + "\n")
-            self.reports_text.insert(tk.END, f"Total Outstanding Fines: ₹{data['total_fine']:.2f}\n")
-            
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
+        self.tasks.submit(self.library.getOverdueBooks, self.display_overdue,
+                          name="Overdue books", key='reports')
+
+    def display_overdue(self, data):
+        self.reports_text.delete(1.0, tk.END)
+        if not data['books']:
+            self.reports_text.insert(tk.END, "✅ NO OVERDUE BOOKS!\n")
+            return
+        
+        self.reports_text.insert(tk.END, f"⚠️  {len(data['books'])} OVERDUE BOOKS:\n")
+        self.reports_text.insert(tk.END, "-" * 100 + "\n")
+        self.reports_text.insert(tk.END, f"{'Student':<20} {'Book Title':<25} {'Due Date':<12} {'Days Late':<10} {'Fine':<10}\n")
+        self.reports_text.insert(tk.END, "-" * 100 + "\n")
+        
+        for book in data['books']:
+            fine_str = f"₹{book['fine']:.2f}"
+            self.reports_text.insert(tk.END, 
+                f"{book['student']:<20} {book['book']:<25} {book['due_date']:<12} "
+                f"{book['days_overdue']:<10} {fine_str:<10}\n"
+            )
+        
+        self.reports_text.insert(tk.END, "-" * 100 + "\n")
+        self.reports_text.insert(tk.END, f"Total Outstanding Fines: ₹{data['total_fine']:.2f}\n")
 
     def show_borrowed(self):
-        try:
-            self.reports_text.delete(1.0, tk.END)
-            books = self.library.trackBooks()
-            
-            if not books:
-                self.reports_text.insert(tk.END, "✅ NO BOOKS ARE CURRENTLY ISSUED!\n")
-                return
-            
-            self.reports_text.insert(tk.END, f"📊 {len(books)} BOOKS ARE CURRENTLY BORROWED:\n")
-            self.reports_text.insert(tk.END, "-" * 90 + "\n")
-            self.reports_text.insert(tk.END, f"{'Student':<20} {'Book Title':<25} {'Borrowed Date':<15} {'Due Date':<12} {'Status':<15}\n")
-            self.reports_text.insert(tk.END, "-" * 90 + "\n")
-            
-            for book in books:
-                self.reports_text.insert(tk.END,
-                    f"{book['student']:<20} {book['book']:<25} {book['borrowed_date']:<15} "
-                    f"{book['due_date']:<12} {book['status']:<15}\n"
-                )
-            
-            self.reports_text.insert(tk.END, "-" * 90 + "\n")
-            
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
+        self.tasks.submit(self.library.trackBooks, self.display_borrowed,
+                          name="Current borrows", key='reports')
+
+    def display_borrowed(self, books):
+        self.reports_text.delete(1.0, tk.END)
+        if not books:
+            self.reports_text.insert(tk.END, "✅ NO BOOKS ARE CURRENTLY ISSUED!\n")
+            return
+        
+        self.reports_text.insert(tk.END, f"📊 {len(books)} BOOKS ARE CURRENTLY BORROWED:\n")
+        self.reports_text.insert(tk.END, "-" * 90 + "\n")
+        self.reports_text.insert(tk.END, f"{'Student':<20} {'Book Title':<25} {'Borrowed Date':<15} {'Due Date':<12} {'Status':<15}\n")
+        self.reports_text.insert(tk.END, "-" * 90 + "\n")
+        
+        for book in books:
+            self.reports_text.insert(tk.END,
+                f"{book['student']:<20} {book['book']:<25} {book['borrowed_date']:<15} "
+                f"{book['due_date']:<12} {book['status']:<15}\n"
+            )
+        
+        self.reports_text.insert(tk.END, "-" * 90 + "\n")
     
     def edit_book(self):
         # Get selected book
-        selected = self.books_tree.selection()
-        if not selected:
-            messagebox.showwarning("Warning", "Please select a book to edit")
-            return
-        
-        # Get book details
-        book_values = self.books_tree.item(selected[0])['values']
+        book_values = self.books_list.selected_row()
         if not book_values:
+            messagebox.showwarning("Warning", "Please select a book to edit")
             return
         
         # Create dialog for editing
@@ -1076,43 +1575,43 @@ class LibraryGUI:
             ttk.Entry(frame, textvariable=var, width=30).pack(side=tk.LEFT)
         
         def submit():
+            # Validate input
+            new_title = variables['Title'].get().strip()
+            new_author = variables['Author'].get().strip()
+            new_category = variables['Category'].get().strip()
             try:
-                # Validate input
-                new_title = variables['Title'].get().strip()
-                new_author = variables['Author'].get().strip()
-                new_category = variables['Category'].get().strip()
-                try:
-                    new_total = int(variables['Total Copies'].get())
-                    if new_total < 1:
-                        raise ValueError
-                except ValueError:
-                    messagebox.showerror("Error", "Total copies must be a positive number")
-                    return
-                
-                if not all([new_title, new_author, new_category]):
-                    messagebox.showerror("Error", "All fields are required")
-                    return
-                
-                # Update book
-                success, message = self.library.editBook(
-                    book_values[0], new_title, new_author, 
-                    new_category, new_total
-                )
-                
+                new_total = int(variables['Total Copies'].get())
+                if new_total < 1:
+                    raise ValueError
+            except ValueError:
+                messagebox.showerror("Error", "Total copies must be a positive number")
+                return
+            
+            if not all([new_title, new_author, new_category]):
+                messagebox.showerror("Error", "All fields are required")
+                return
+            
+            def updated(outcome):
+                success, message = outcome
                 if success:
                     messagebox.showinfo("Success", message)
                     dialog.destroy()
-                    self.show_all_books()  # Refresh book list
                 else:
                     messagebox.showerror("Error", message)
-                
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to update book: {str(e)}")
+            
+            # Update book
+            self.run_write(
+                lambda: self.library.editBook(book_values[0], new_title, new_author,
+                                              new_category, new_total),
+                updated,
+                lambda e: messagebox.showerror("Error", f"Failed to update book: {str(e)}"),
+                name="Updating book", button=update_button)
         
         # Buttons
         buttons_frame = ttk.Frame(main_frame)
         buttons_frame.pack(fill=tk.X, pady=20)
-        ttk.Button(buttons_frame, text="Update", command=submit).pack(side=tk.LEFT, padx=5)
+        update_button = ttk.Button(buttons_frame, text="Update", command=submit)
+        update_button.pack(side=tk.LEFT, padx=5)
         ttk.Button(buttons_frame, text="Cancel", command=dialog.destroy).pack(side=tk.LEFT, padx=5)
 
         # Center the dialog
@@ -1125,14 +1624,9 @@ class LibraryGUI:
 
     def remove_book(self):
         # Get selected book
-        selected = self.books_tree.selection()
-        if not selected:
-            messagebox.showwarning("Warning", "Please select a book to remove")
-            return
-        
-        # Get book details
-        book_values = self.books_tree.item(selected[0])['values']
+        book_values = self.books_list.selected_row()
         if not book_values:
+            messagebox.showwarning("Warning", "Please select a book to remove")
             return
         
         # Confirm deletion
@@ -1140,47 +1634,77 @@ class LibraryGUI:
             f"Are you sure you want to remove '{book_values[0]}' from the library?"):
             return
         
-        try:
-            success, message = self.library.removeBook(book_values[0])
+        def removed(outcome):
+            success, message = outcome
             if success:
                 messagebox.showinfo("Success", message)
-                self.show_all_books()  # Refresh book list
             else:
                 messagebox.showerror("Error", message)
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to remove book: {str(e)}")
+        
+        self.run_write(lambda: self.library.removeBook(book_values[0]), removed,
+                       lambda e: messagebox.showerror("Error", f"Failed to remove book: {str(e)}"),
+                       name="Removing book")
 
     def show_borrow_logs(self):
+        """Start paging the borrow history that matches the filter fields"""
+        filters = {key: entry.get().strip() or None for key, entry in self.history_filters.items()}
         try:
-            self.reports_text.delete(1.0, tk.END)
-            result = self.library.getBorrowLogs()
-            logs = result['logs']
-            total_fines = result['total_fines']
-            
-            if not logs:
-                self.reports_text.insert(tk.END, "✅ NO BORROWING HISTORY FOUND!\n")
-                return
-            
-            self.reports_text.insert(tk.END, "📚 COMPLETE BORROWING HISTORY:\n")
-            self.reports_text.insert(tk.END, "-" * 110 + "\n")
+            for key in ('start', 'end'):
+                if filters[key]:
+                    filters[key] = date.fromisoformat(filters[key])
+        except ValueError:
+            messagebox.showerror("Error", "Dates must be in YYYY-MM-DD format")
+            return
+        
+        self.history = self.library.borrow_history(**filters)
+        self.history_keys = [None]
+        self.load_history_page(0)
+
+    def load_history_page(self, index):
+        history = self.history
+        after = self.history_keys[index]
+        
+        def work():
+            # total_fines is queried once per history, with its first page
+            return history.page(HISTORY_PAGE_SIZE, after), history.total_fines
+        
+        self.tasks.submit(work, lambda result: self.display_borrow_logs(index, *result),
+                          name="Borrow history", key='reports')
+
+    def display_borrow_logs(self, index, page, total_fines):
+        self.history_page = index
+        del self.history_keys[index + 1:]
+        self.history_keys.append(page['next'])
+        self.history_newer_btn.config(state='normal' if index > 0 else 'disabled')
+        self.history_older_btn.config(state='normal' if page['next'] is not None else 'disabled')
+        
+        self.reports_text.delete(1.0, tk.END)
+        logs = page['logs']
+        
+        if not logs:
+            self.reports_text.insert(tk.END, "✅ NO BORROWING HISTORY FOUND!\n")
+            return
+        
+        first = index * HISTORY_PAGE_SIZE + 1
+        self.reports_text.insert(tk.END,
+            f"📚 BORROWING HISTORY (records {first}-{first + len(logs) - 1}, newest first):\n")
+        self.reports_text.insert(tk.END, "-" * 110 + "\n")
+        self.reports_text.insert(tk.END,
+            f"{'Student':<20} {'Book Title':<25} {'Borrowed':<20} {'Due':<12} "
+            f"{'Status':<12} {'Returned':<20} {'Fine':<8}\n"
+        )
+        self.reports_text.insert(tk.END, "-" * 110 + "\n")
+        
+        for log in logs:
+            returned = f"{log['return_date']:%Y-%m-%d %H:%M}" if log['return_date'] else "N/A"
             self.reports_text.insert(tk.END,
-                f"{'Student':<20} {'Book Title':<25} {'Borrowed':<20} {'Due':<12} "
-                f"{'Status':<12} {'Returned':<20} {'Fine':<8}\n"
+                f"{log['student']:<20} {log['book']:<25} {log['borrowed_date']:%Y-%m-%d %H:%M}{'':<4} "
+                f"{log['due_date']:%Y-%m-%d}{'':<2} {log['status']:<12} {returned:<20} "
+                f"₹{log['fine']:<7.2f}\n"
             )
-            self.reports_text.insert(tk.END, "-" * 110 + "\n")
-            
-            for log in logs:
-                self.reports_text.insert(tk.END,
-                    f"{log['student']:<20} {log['book']:<25} {log['borrowed_date']:<20} "
-                    f"{log['due_date']:<12} {log['status']:<12} {log['return_date']:<20} "
-                    f"₹{log['fine']:<7.2f}\n"
-                )
-            
-            self.reports_text.insert(tk.END, "-" * 110 + "\n")
-            self.reports_text.insert(tk.END, f"\n💰 Total Fines Accrued: ₹{total_fines:.2f}\n")
-            
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
+        
+        self.reports_text.insert(tk.END, "-" * 110 + "\n")
+        self.reports_text.insert(tk.END, f"\n💰 Total Fines Accrued: ₹{total_fines:.2f}\n")
 
     def export_to_excel(self):
         """Export selected database tables to an Excel file (xlsx)."""
@@ -1189,11 +1713,14 @@ class LibraryGUI:
                                                 title="Save Exported Data As")
         if not filepath:
             return
-        try:
-            excel_utils.export_database_to_excel(self.db, filepath)
-            messagebox.showinfo("Export Successful", f"Data exported to {filepath}")
-        except Exception as e:
-            messagebox.showerror("Export Failed", str(e))
+        def progress(table, rows):
+            self.tasks.report_progress(f"{table}: {rows} rows")
+        
+        self.tasks.submit(
+            lambda: excel_utils.export_database_to_excel(self.db, filepath, progress=progress),
+            lambda result: messagebox.showinfo("Export Successful", f"Data exported to {filepath}"),
+            lambda error: messagebox.showerror("Export Failed", str(error)),
+            name="Exporting to Excel")
 
     def import_from_excel(self):
         """Import data from an Excel file (.xlsx)."""
@@ -1204,23 +1731,25 @@ class LibraryGUI:
         if not messagebox.askyesno("Confirm Import",
                                    "Importing data may add or update records in the database. Continue?"):
             return
-        try:
+        
+        def work():
             excel_utils.import_database_from_excel(self.db, filepath)
+            self.library.rebuild_report_counters()
+            self.library.rebuild_rating_stats()
+            self.library.rebuild_catalog_index()
+        
+        def done(result):
             messagebox.showinfo("Import Successful", f"Data imported from {filepath}")
             # Refresh UI lists after import
-            try:
-                self.show_all_books()
-            except Exception:
-                pass
-            try:
-                self.refresh_users()
-            except Exception:
-                pass
-        except Exception as e:
-            messagebox.showerror("Import Failed", str(e))
+            self.show_all_books()
+            self.refresh_users()
+        
+        self.tasks.submit(work, done, lambda error: messagebox.showerror("Import Failed", str(error)),
+                          name="Importing from Excel")
 
     def on_closing(self):
         if messagebox.askokcancel("Quit", "Do you want to quit?"):
+            self.tasks.shutdown()
             self.db.close_connection()
             self.root.destroy()
 
@@ -0,0 +1,179 @@
+"""
+Background task runner for the Library Management System GUI.
+
+Tk widgets may only be touched from the thread running mainloop, so slow
+work (queries, reports, Excel files) runs on a small thread pool and its
+result is handed back through a queue that the Tk thread polls with
+root.after. Callbacks therefore always run on the Tk thread.
+
+Tasks can be cancelled. A task that has not started yet never runs; one
+that is already running finishes (or checks current_task().cancelled at
+safe points and stops early) and its result is discarded. Submitting a
+task with the same key as a running one cancels the older task, so only
+the latest search or report reaches the screen. Tasks submitted with
+cancellable=False (database writes) are left alone by cancel(), so their
+outcome is always reported.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import queue
+import threading
+
+
+class TaskCancelled(Exception):
+    """Raised by Task.raise_if_cancelled() inside work that was cancelled"""
+
+
+class Task:
+    """Handle for one submitted piece of work"""
+
+    def __init__(self, name, key=None, cancellable=True):
+        self.name = name
+        self.key = key
+        self.cancellable = cancellable
+        self.progress = None    # short status text set by TaskRunner.report_progress()
+        self.future = None
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+        if self.future is not None:
+            self.future.cancel()  # only succeeds if it hasn't started
+
+    def raise_if_cancelled(self):
+        if self.cancelled:
+            raise TaskCancelled(f"{self.name} was cancelled")
+
+
+_local = threading.local()
+
+
+def current_task():
+    """The Task being run by this worker thread (None outside the runner)"""
+    return getattr(_local, 'task', None)
+
+
+class TaskRunner:
+    """Runs blocking work on worker threads and delivers results on the Tk thread"""
+
+    def __init__(self, root, workers=4, poll_ms=50, on_error=None, on_busy=None):
+        """
+        on_error(task, exception) is the default error callback;
+        on_busy(tasks) is called with the running tasks whenever they change.
+        """
+        self.root = root
+        self.workers = workers
+        self.poll_ms = poll_ms
+        self.on_error = on_error
+        self.on_busy = on_busy
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='library-task')
+        self._results = queue.Queue()
+        self._active = []       # submitted tasks whose callbacks haven't run yet (Tk thread only)
+        self._closed = False
+        self._poll_job = root.after(poll_ms, self._poll)
+
+    @property
+    def active(self):
+        return list(self._active)
+
+    def submit(self, work, on_done=None, on_error=None, name='Working', key=None, cancellable=True):
+        """
+        Run work() on a worker thread; returns its Task.
+
+        on_done(result) or on_error(exception) is then called on the Tk
+        thread, unless the task was cancelled. Must be called from the Tk
+        thread.
+        """
+        if self._closed:
+            raise RuntimeError("Task runner is shut down")
+        if key is not None:
+            self.cancel(key)
+        task = Task(name, key, cancellable)
+        self._active.append(task)
+        task.future = self._executor.submit(self._run, task, work, on_done, on_error)
+        self._notify_busy()
+        return task
+
+    def _run(self, task, work, on_done, on_error):
+        # Worker thread: never touch Tk here, only queue the outcome
+        _local.task = task
+        try:
+            task.raise_if_cancelled()
+            result = work()
+        except TaskCancelled:
+            self._results.put((task, None))
+        except Exception as e:
+            self._results.put((task, partial(self._report, task, e, on_error)))
+        else:
+            self._results.put((task, partial(on_done, result) if on_done else None))
+        finally:
+            _local.task = None
+
+    def report_progress(self, progress):
+        """
+        Set the current task's progress text and redisplay the busy tasks.
+
+        Called from inside work(); also raises TaskCancelled if the task was
+        cancelled, so long jobs that report progress stop early.
+        """
+        task = current_task()
+        if task is None:
+            return
+        task.raise_if_cancelled()
+        task.progress = progress
+        self.call_soon(self._notify_busy)
+
+    def call_soon(self, callback):
+        """Run callback() on the Tk thread at the next poll; safe to call from any thread"""
+        self._results.put((None, callback))
+
+    def _report(self, task, error, on_error):
+        if on_error is not None:
+            on_error(error)
+        elif self.on_error is not None:
+            self.on_error(task, error)
+
+    def cancel(self, key=None):
+        """Cancel the running tasks with this key (all cancellable ones when key is None)"""
+        for task in list(self._active):
+            if task.cancellable and (key is None or task.key == key):
+                task.cancel()
+                if task.future.cancelled():
+                    # Never started, so no result will arrive for it
+                    self._active.remove(task)
+        self._notify_busy()
+
+    def _poll(self):
+        """Run queued callbacks on the Tk thread"""
+        try:
+            while True:
+                try:
+                    task, callback = self._results.get_nowait()
+                except queue.Empty:
+                    break
+                if task in self._active:
+                    self._active.remove(task)
+                    self._notify_busy()
+                if callback is not None and (task is None or not task.cancelled):
+                    callback()
+        finally:
+            # A failing callback must not stop the polling
+            if not self._closed:
+                self._poll_job = self.root.after(self.poll_ms, self._poll)
+
+    def _notify_busy(self):
+        if self.on_busy is not None:
+            self.on_busy([task for task in self._active if not task.cancelled])
+
+    def shutdown(self):
+        """Cancel everything and stop the workers without waiting for running queries"""
+        if self._closed:
+            return
+        self.cancel()
+        self._closed = True
+        self.root.after_cancel(self._poll_job)
+        self._executor.shutdown(wait=False, cancel_futures=True)
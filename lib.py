@@ -2,40 +2,971 @@
 Project: Student library management system
 """
 
-import mysql.connector
-from mysql.connector import Error
-from datetime import datetime, timedelta
+from backends import BACKENDS, DatabaseError, Error
+from catalog_index import CatalogCache, CatalogIndex, PrefixIndex
+from user_cache import UserStatusCache
+from contextlib import contextmanager
+from collections import deque
+from datetime import date, datetime, timedelta
+from functools import cached_property
+import threading
+import time
+import re
 import sys
 
 
+class ConnectionPool:
+    """Thread-safe pool of database connections with health checks and idle reaping"""
+
+    def __init__(self, backend, size=5, min_idle=1, idle_timeout=300,
+                 health_check_interval=30, acquire_timeout=10):
+        if size < 1:
+            raise ValueError("Pool size must be at least 1")
+        self.backend = backend
+        self.size = size
+        self.min_idle = min(min_idle, size)
+        self.idle_timeout = idle_timeout                    # seconds before an idle connection is closed
+        self.health_check_interval = health_check_interval  # ping connections idle longer than this
+        self.acquire_timeout = acquire_timeout              # seconds to wait when every connection is busy
+        self._idle = deque()    # (connection, last_used) pairs, most recently used on the right
+        self._in_use = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def _new_connection(self):
+        return self.backend.connect()
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Error:
+            pass
+
+    def _is_healthy(self, conn):
+        """Ping a connection that has been idle for a while"""
+        try:
+            self.backend.ping(conn)
+            return True
+        except Error:
+            return False
+
+    def _reap_locked(self, now):
+        """Detach connections idle past idle_timeout, keeping min_idle warm (caller holds the lock)"""
+        expired = []
+        while (self._idle and len(self._idle) > self.min_idle
+               and now - self._idle[0][1] > self.idle_timeout):
+            expired.append(self._idle.popleft()[0])
+        return expired
+
+    def warm_up(self):
+        """Open min_idle connections up front so connection errors surface immediately"""
+        conns = [self.acquire() for _ in range(max(self.min_idle, 1))]
+        for conn in conns:
+            self.release(conn)
+
+    def acquire(self):
+        """Check a connection out of the pool, opening a new one if there is room"""
+        deadline = time.monotonic() + self.acquire_timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise DatabaseError("Connection pool is closed")
+                now = time.monotonic()
+                expired = self._reap_locked(now)
+                if self._idle:
+                    # LIFO: reuse the warmest connection, let the rest age out
+                    conn, last_used = self._idle.pop()
+                    self._in_use += 1
+                    break
+                if self._in_use < self.size:
+                    conn, last_used = None, now
+                    self._in_use += 1
+                    break
+                remaining = deadline - now
+                if remaining <= 0:
+                    raise DatabaseError(f"No free database connection after {self.acquire_timeout}s "
+                                        f"(pool size {self.size})")
+                self._cond.wait(remaining)
+
+        for stale in expired:
+            self._close_quietly(stale)
+
+        # Open or health-check outside the lock so slow sockets don't block other threads
+        try:
+            if conn is None:
+                conn = self._new_connection()
+            elif now - last_used > self.health_check_interval and not self._is_healthy(conn):
+                self._close_quietly(conn)
+                conn = self._new_connection()
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        return conn
+
+    def release(self, conn, broken=False):
+        """Return a connection to the pool; broken connections are discarded"""
+        with self._cond:
+            self._in_use -= 1
+            keep = not broken and not self._closed
+            if keep:
+                self._idle.append((conn, time.monotonic()))
+            expired = self._reap_locked(time.monotonic())
+            self._cond.notify()
+        if not keep:
+            self._close_quietly(conn)
+        for stale in expired:
+            self._close_quietly(stale)
+
+    def reap_idle(self):
+        """Close connections that have been idle longer than idle_timeout"""
+        with self._cond:
+            expired = self._reap_locked(time.monotonic())
+        for stale in expired:
+            self._close_quietly(stale)
+        return len(expired)
+
+    def stats(self):
+        """Current pool occupancy"""
+        with self._cond:
+            return {'size': self.size, 'in_use': self._in_use, 'idle': len(self._idle)}
+
+    def close(self):
+        """Close every idle connection and refuse further checkouts"""
+        with self._cond:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+            self._cond.notify_all()
+        for conn in idle:
+            self._close_quietly(conn)
+
+
+def _index_exists(cursor, table, index_name):
+    """Check information_schema for an index on a table in the current database"""
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+    """, (table, index_name))
+    return cursor.fetchone()[0] > 0
+
+
+def _column_exists(cursor, table, column):
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+    """, (table, column))
+    return cursor.fetchone()[0] > 0
+
+
+def _foreign_keys_on(cursor, table, column):
+    """Names of the foreign key constraints declared on table.column"""
+    cursor.execute("""
+        SELECT CONSTRAINT_NAME FROM information_schema.KEY_COLUMN_USAGE
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+          AND REFERENCED_TABLE_NAME IS NOT NULL
+    """, (table, column))
+    return [row[0] for row in cursor.fetchall()]
+
+
+def _add_indexes(cursor, indexes):
+    """Add missing indexes with online DDL so reads and writes continue during the build"""
+    for table, index_name, columns in indexes:
+        if _index_exists(cursor, table, index_name):
+            continue
+        cursor.execute(f"ALTER TABLE {table} ADD INDEX {index_name} {columns}, "
+                       "ALGORITHM=INPLACE, LOCK=NONE")
+        print(f"   Added index {index_name} on {table}{columns}")
+
+
+# Composite indexes for the circulation queries in Library
+CIRCULATION_INDEXES = [
+    ('borrowed_books', 'idx_borrowed_student_returned', '(student_name, returned)'),
+    ('borrowed_books', 'idx_borrowed_title_returned', '(book_title, returned)'),
+    ('borrowed_books', 'idx_borrowed_returned_due', '(returned, due_date)'),
+    ('book_reviews', 'idx_reviews_title_date', '(book_title, review_date)'),
+]
+
+
+def _migration_circulation_indexes(cursor):
+    _add_indexes(cursor, CIRCULATION_INDEXES)
+
+
+# Loans and reviews reference books/users by integer id instead of title/username:
+# (table, id column, legacy column, parent table, parent natural key, ON DELETE)
+SURROGATE_KEYS = [
+    ('borrowed_books', 'book_id', 'book_title', 'books', 'title', 'CASCADE'),
+    ('borrowed_books', 'user_id', 'student_name', 'users', 'username', 'RESTRICT'),
+    ('book_reviews', 'book_id', 'book_title', 'books', 'title', 'CASCADE'),
+    ('book_reviews', 'user_id', 'username', 'users', 'username', 'RESTRICT'),
+]
+
+SURROGATE_KEY_INDEXES = [
+    ('borrowed_books', 'idx_borrowed_user_returned', '(user_id, returned)'),
+    ('borrowed_books', 'idx_borrowed_book_returned', '(book_id, returned)'),
+    ('book_reviews', 'idx_reviews_book_date', '(book_id, review_date)'),
+    ('book_reviews', 'idx_reviews_user', '(user_id)'),
+]
+
+BACKFILL_BATCH_SIZE = 10000
+
+
+def _backfill_surrogate_key(cursor, table, column, legacy, parent, parent_key):
+    """Fill table.column from the parent's id in id-range batches (each batch commits)"""
+    cursor.execute(f"SELECT COALESCE(MIN(id), 0), COALESCE(MAX(id), 0) FROM {table}")
+    low, high = cursor.fetchone()
+    for start in range(low, high + 1, BACKFILL_BATCH_SIZE):
+        cursor.execute(f"""
+            UPDATE {table} t JOIN {parent} p ON p.{parent_key} = t.{legacy}
+            SET t.{column} = p.id
+            WHERE t.id BETWEEN %s AND %s AND t.{column} IS NULL
+        """, (start, start + BACKFILL_BATCH_SIZE - 1))
+
+
+def _migration_surrogate_keys(cursor):
+    pending = [key for key in SURROGATE_KEYS if _column_exists(cursor, key[0], key[2])]
+    
+    # 1. Add and backfill the integer key columns
+    for table, column, legacy, parent, parent_key, on_delete in pending:
+        if not _column_exists(cursor, table, column):
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} INT NULL")
+        _backfill_surrogate_key(cursor, table, column, legacy, parent, parent_key)
+        cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE {column} IS NULL")
+        orphans = cursor.fetchone()[0]
+        if orphans:
+            raise DatabaseError(f"{orphans} row(s) in {table} reference a missing {parent} "
+                                f"{parent_key}; fix them and restart to resume the migration")
+        cursor.execute(f"ALTER TABLE {table} MODIFY {column} INT NOT NULL")
+    
+    # 2. Index the new columns before the foreign keys need them
+    _add_indexes(cursor, SURROGATE_KEY_INDEXES)
+    
+    # 3. Swap the foreign keys over to the id columns
+    for table, column, legacy, parent, parent_key, on_delete in pending:
+        for constraint in _foreign_keys_on(cursor, table, legacy):
+            cursor.execute(f"ALTER TABLE {table} DROP FOREIGN KEY {constraint}")
+        if not _foreign_keys_on(cursor, table, column):
+            cursor.execute(f"ALTER TABLE {table} ADD CONSTRAINT fk_{table}_{column} "
+                           f"FOREIGN KEY ({column}) REFERENCES {parent}(id) ON DELETE {on_delete}")
+    
+    # 4. Drop the title/username indexes and columns
+    for table, index_name in (('borrowed_books', 'idx_borrowed_student_returned'),
+                              ('borrowed_books', 'idx_borrowed_title_returned'),
+                              ('book_reviews', 'idx_reviews_title_date')):
+        if _index_exists(cursor, table, index_name):
+            cursor.execute(f"ALTER TABLE {table} DROP INDEX {index_name}")
+    for table, column, legacy, parent, parent_key, on_delete in pending:
+        cursor.execute(f"ALTER TABLE {table} DROP COLUMN {legacy}")
+
+
+def _migration_widen_section(cursor):
+    # Previously done by fix_users_table.py, which dropped and recreated users
+    cursor.execute("ALTER TABLE users MODIFY section VARCHAR(10)")
+
+
+def _migration_innodb_tables(cursor):
+    # Previously done by fix_database.py, which dropped and recreated every table.
+    # Foreign keys are silently ignored on MyISAM, so convert and then re-assert them.
+    cursor.execute("""
+        SELECT TABLE_NAME FROM information_schema.TABLES
+        WHERE TABLE_SCHEMA = DATABASE() AND ENGINE <> 'InnoDB'
+          AND TABLE_NAME IN ('books', 'users', 'book_categories', 'borrowed_books', 'book_reviews')
+    """)
+    for (table,) in cursor.fetchall():
+        cursor.execute(f"ALTER TABLE {table} ENGINE=InnoDB")
+    for table, column, legacy, parent, parent_key, on_delete in SURROGATE_KEYS:
+        if not _foreign_keys_on(cursor, table, column):
+            cursor.execute(f"ALTER TABLE {table} ADD CONSTRAINT fk_{table}_{column} "
+                           f"FOREIGN KEY ({column}) REFERENCES {parent}(id) ON DELETE {on_delete}")
+
+
+DEFAULT_CATEGORIES = [
+    ('Fiction', 'Novels, short stories, and fictional works'),
+    ('Non-Fiction', 'Biographies, history, science, etc.'),
+    ('Science', 'Scientific books and research'),
+    ('Technology', 'Computer science, engineering, etc.'),
+    ('Literature', 'Classic literature and poetry'),
+    ('Economics', 'Economic theories and business'),
+    ('Education', 'Educational and academic books'),
+    ('General', 'General purpose books')
+]
+
+
+def _seed_default_categories(cursor):
+    """Insert any missing default category in a single statement"""
+    placeholders = ', '.join(['(%s, %s)'] * len(DEFAULT_CATEGORIES))
+    params = [value for category in DEFAULT_CATEGORIES for value in category]
+    cursor.execute(f"INSERT IGNORE INTO book_categories (category_name, description) "
+                   f"VALUES {placeholders}", tuple(params))
+
+
+# Keyset pagination indexes: each matches the ORDER BY of a *_page listing
+PAGINATION_INDEXES = [
+    ('books', 'idx_books_category_title', '(category, title)'),
+    ('users', 'idx_users_registered', '(registration_date, id)'),
+]
+
+# Borrow history is read newest first; the primary key breaks ties in both backends
+HISTORY_INDEXES = [
+    ('borrowed_books', 'idx_borrowed_date', '(borrowed_date)'),
+]
+
+# getUserLogs pages one user's open loans, then the returned ones, newest first
+USER_HISTORY_INDEXES = [
+    ('borrowed_books', 'idx_borrowed_user_history', '(user_id, returned, borrowed_date)'),
+]
+
+# Lifetime loan totals kept on users by borrowBook/returnBook (see getUserLogs)
+USER_LOAN_STATS_COLUMNS = {
+    'total_borrowed': 'INT NOT NULL DEFAULT 0',
+    'returned_on_time': 'INT NOT NULL DEFAULT 0',
+    'total_fines': 'DECIMAL(10,2) NOT NULL DEFAULT 0.00',
+}
+
+
+def _migration_pagination_indexes(cursor):
+    _add_indexes(cursor, PAGINATION_INDEXES)
+
+
+def _migration_pagination_indexes_sqlite(cursor):
+    for table, index_name, columns in PAGINATION_INDEXES:
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} {columns}")
+
+
+def _migration_history_indexes(cursor):
+    _add_indexes(cursor, HISTORY_INDEXES)
+
+
+def _migration_history_indexes_sqlite(cursor):
+    for table, index_name, columns in HISTORY_INDEXES:
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} {columns}")
+
+
+def _rebuild_user_loan_stats(cursor):
+    """Recompute the USER_LOAN_STATS_COLUMNS of every user from borrowed_books"""
+    cursor.execute("""
+        UPDATE users SET
+            total_borrowed = (SELECT COUNT(*) FROM borrowed_books WHERE user_id = users.id),
+            returned_on_time = (SELECT COUNT(*) FROM borrowed_books
+                                WHERE user_id = users.id AND returned = TRUE
+                                  AND DATE(return_date) <= due_date),
+            total_fines = (SELECT COALESCE(SUM(fine_amount), 0) FROM borrowed_books
+                           WHERE user_id = users.id)
+    """)
+
+
+def _migration_user_loan_stats(cursor):
+    for column, definition in USER_LOAN_STATS_COLUMNS.items():
+        if not _column_exists(cursor, 'users', column):
+            cursor.execute(f"ALTER TABLE users ADD COLUMN {column} {definition}")
+    _add_indexes(cursor, USER_HISTORY_INDEXES)
+    _rebuild_user_loan_stats(cursor)
+
+
+def _migration_user_loan_stats_sqlite(cursor):
+    cursor.execute("PRAGMA table_info(users)")
+    existing = [column[1] for column in cursor.fetchall()]
+    for column, definition in USER_LOAN_STATS_COLUMNS.items():
+        if column not in existing:
+            cursor.execute(f"ALTER TABLE users ADD COLUMN {column} {definition}")
+    for table, index_name, columns in USER_HISTORY_INDEXES:
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} {columns}")
+    _rebuild_user_loan_stats(cursor)
+
+
+def _migration_books_fulltext(cursor):
+    if not _index_exists(cursor, 'books', 'ft_books_title_author'):
+        # The first FULLTEXT index can't be built with LOCK=NONE; reads continue, writes wait
+        cursor.execute("ALTER TABLE books ADD FULLTEXT INDEX ft_books_title_author (title, author), "
+                       "ALGORITHM=INPLACE, LOCK=SHARED")
+        print("   Added index ft_books_title_author on books(title, author)")
+
+
+def _reconcile_active_loans(cursor):
+    """Recount users.active_loans from the open loans; returns the usernames that had drifted"""
+    cursor.execute("""
+        SELECT u.id, u.username FROM users u
+        WHERE u.active_loans <> (SELECT COUNT(*) FROM borrowed_books b
+                                 WHERE b.user_id = u.id AND b.returned = FALSE)
+        FOR UPDATE
+    """)
+    drifted = cursor.fetchall()
+    for user_id, username in drifted:
+        cursor.execute("""
+            UPDATE users SET active_loans = (SELECT COUNT(*) FROM borrowed_books
+                                             WHERE user_id = %s AND returned = FALSE)
+            WHERE id = %s
+        """, (user_id, user_id))
+    return [username for user_id, username in drifted]
+
+
+def _migration_active_loans(cursor):
+    if not _column_exists(cursor, 'users', 'active_loans'):
+        cursor.execute("ALTER TABLE users ADD COLUMN active_loans INT NOT NULL DEFAULT 0")
+    _reconcile_active_loans(cursor)
+
+
+def _migration_active_loans_sqlite(cursor):
+    cursor.execute("PRAGMA table_info(users)")
+    if 'active_loans' not in [column[1] for column in cursor.fetchall()]:
+        cursor.execute("ALTER TABLE users ADD COLUMN active_loans INTEGER NOT NULL DEFAULT 0")
+    _reconcile_active_loans(cursor)
+
+
+# Per-book review statistics kept by add_book_review: count, sum, histogram and
+# the average as an indexed score column, so top-rated lists never aggregate reviews
+RATING_STATS_TABLE = {
+    'mysql': """
+    CREATE TABLE IF NOT EXISTS book_rating_stats (
+        book_id INT PRIMARY KEY,
+        review_count INT NOT NULL DEFAULT 0,
+        rating_sum INT NOT NULL DEFAULT 0,
+        rating_1 INT NOT NULL DEFAULT 0,
+        rating_2 INT NOT NULL DEFAULT 0,
+        rating_3 INT NOT NULL DEFAULT 0,
+        rating_4 INT NOT NULL DEFAULT 0,
+        rating_5 INT NOT NULL DEFAULT 0,
+        avg_rating DECIMAL(6,4) NOT NULL DEFAULT 0,
+        INDEX idx_rating_stats_score (avg_rating, review_count),
+        CONSTRAINT fk_book_rating_stats_book_id
+            FOREIGN KEY (book_id) REFERENCES books(id) ON DELETE CASCADE
+    ) ENGINE=InnoDB
+    """,
+    'sqlite': """
+    CREATE TABLE IF NOT EXISTS book_rating_stats (
+        book_id INTEGER PRIMARY KEY REFERENCES books(id) ON DELETE CASCADE,
+        review_count INT NOT NULL DEFAULT 0,
+        rating_sum INT NOT NULL DEFAULT 0,
+        rating_1 INT NOT NULL DEFAULT 0,
+        rating_2 INT NOT NULL DEFAULT 0,
+        rating_3 INT NOT NULL DEFAULT 0,
+        rating_4 INT NOT NULL DEFAULT 0,
+        rating_5 INT NOT NULL DEFAULT 0,
+        avg_rating REAL NOT NULL DEFAULT 0
+    )
+    """,
+}
+
+
+def _rebuild_rating_stats(cursor):
+    """Recompute book_rating_stats from book_reviews; returns the number of books with reviews"""
+    histogram = ', '.join(f"SUM(CASE WHEN rating = {stars} THEN 1 ELSE 0 END)" for stars in range(1, 6))
+    cursor.execute("DELETE FROM book_rating_stats")
+    cursor.execute(f"""
+        INSERT INTO book_rating_stats (book_id, review_count, rating_sum,
+                                       rating_1, rating_2, rating_3, rating_4, rating_5, avg_rating)
+        SELECT book_id, COUNT(*), SUM(rating), {histogram}, SUM(rating) * 1.0 / COUNT(*)
+        FROM book_reviews GROUP BY book_id
+    """)
+    return cursor.rowcount
+
+
+def _migration_rating_stats(cursor):
+    cursor.execute(RATING_STATS_TABLE['mysql'])
+    _rebuild_rating_stats(cursor)
+
+
+def _migration_rating_stats_sqlite(cursor):
+    cursor.execute(RATING_STATS_TABLE['sqlite'])
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_rating_stats_score "
+                   "ON book_rating_stats (avg_rating, review_count)")
+    _rebuild_rating_stats(cursor)
+
+
+# Library-wide totals read by generateReports. Each counter is split over
+# COUNTER_SLOTS rows (a book always bumps slot book_id % COUNTER_SLOTS), so
+# concurrent checkouts of different books rarely wait on the same row; a
+# report sums the slots.
+REPORT_COUNTERS = ('unique_books', 'total_copies', 'available_copies')
+COUNTER_SLOTS = 8
+
+LIBRARY_COUNTERS_TABLE = {
+    'mysql': """
+    CREATE TABLE IF NOT EXISTS library_counters (
+        name VARCHAR(64) NOT NULL,
+        slot INT NOT NULL,
+        value BIGINT NOT NULL DEFAULT 0,
+        PRIMARY KEY (name, slot)
+    ) ENGINE=InnoDB
+    """,
+    'sqlite': """
+    CREATE TABLE IF NOT EXISTS library_counters (
+        name VARCHAR(64) NOT NULL,
+        slot INTEGER NOT NULL,
+        value INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (name, slot)
+    )
+    """,
+}
+
+# books.borrow_count (lifetime loans) ranks the popular books, users.active_loans the borrowers
+REPORT_COUNTER_INDEXES = [
+    ('books', 'idx_books_borrow_count', '(borrow_count)'),
+    ('users', 'idx_users_active_loans', '(active_loans)'),
+]
+
+
+def _bump_counters(cursor, book_id, **deltas):
+    """Add deltas to the library_counters slot of book_id, in the caller's transaction"""
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    cases = ' '.join('WHEN %s THEN %s' for _ in deltas)
+    names = ', '.join(['%s'] * len(deltas))
+    params = [value for item in deltas.items() for value in item]
+    cursor.execute(f"UPDATE library_counters SET value = value + CASE name {cases} END "
+                   f"WHERE slot = %s AND name IN ({names})",
+                   tuple(params) + (book_id % COUNTER_SLOTS,) + tuple(deltas))
+
+
+def _rebuild_report_counters(cursor):
+    """Recompute library_counters and books.borrow_count from scratch; returns the totals"""
+    cursor.execute("SELECT COUNT(*), COALESCE(SUM(total_copies), 0), "
+                   "COALESCE(SUM(available_copies), 0) FROM books")
+    totals = {name: int(value) for name, value in zip(REPORT_COUNTERS, cursor.fetchone())}
+    cursor.execute("DELETE FROM library_counters")
+    # Every slot row must exist: _bump_counters only UPDATEs
+    cursor.executemany("INSERT INTO library_counters (name, slot, value) VALUES (%s, %s, %s)",
+                       [(name, slot, totals[name] if slot == 0 else 0)
+                        for name in REPORT_COUNTERS for slot in range(COUNTER_SLOTS)])
+    cursor.execute("UPDATE books SET borrow_count = (SELECT COUNT(*) FROM borrowed_books "
+                   "WHERE borrowed_books.book_id = books.id)")
+    return totals
+
+
+def _migration_report_counters(cursor):
+    if not _column_exists(cursor, 'books', 'borrow_count'):
+        cursor.execute("ALTER TABLE books ADD COLUMN borrow_count INT NOT NULL DEFAULT 0")
+    _add_indexes(cursor, REPORT_COUNTER_INDEXES)
+    cursor.execute(LIBRARY_COUNTERS_TABLE['mysql'])
+    _rebuild_report_counters(cursor)
+
+
+def _migration_report_counters_sqlite(cursor):
+    cursor.execute("PRAGMA table_info(books)")
+    if 'borrow_count' not in [column[1] for column in cursor.fetchall()]:
+        cursor.execute("ALTER TABLE books ADD COLUMN borrow_count INTEGER NOT NULL DEFAULT 0")
+    for table, index_name, columns in REPORT_COUNTER_INDEXES:
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} {columns}")
+    cursor.execute(LIBRARY_COUNTERS_TABLE['sqlite'])
+    _rebuild_report_counters(cursor)
+
+
+# Versioned schema migrations, applied in order and recorded in schema_version.
+# Each maps a backend name to its migration function; a backend without an
+# entry already has the change in its baseline tables and only records the
+# version. MySQL DDL commits implicitly, so every migration must be safe to re-run.
+SCHEMA_MIGRATIONS = [
+    (1, "Composite indexes for loan and review lookups", {'mysql': _migration_circulation_indexes}),
+    (2, "Integer book_id/user_id keys on loans and reviews", {'mysql': _migration_surrogate_keys}),
+    (3, "Widen users.section to VARCHAR(10)", {'mysql': _migration_widen_section}),
+    (4, "InnoDB engine and foreign keys on every table", {'mysql': _migration_innodb_tables}),
+    (5, "Seed default book categories", {'mysql': _seed_default_categories,
+                                          'sqlite': _seed_default_categories}),
+    (6, "FULLTEXT index on book title and author", {'mysql': _migration_books_fulltext}),
+    (7, "Indexes for keyset pagination of books and users", {'mysql': _migration_pagination_indexes,
+                                                              'sqlite': _migration_pagination_indexes_sqlite}),
+    (8, "Active loan counter on users", {'mysql': _migration_active_loans,
+                                         'sqlite': _migration_active_loans_sqlite}),
+    (9, "Per-book rating statistics", {'mysql': _migration_rating_stats,
+                                       'sqlite': _migration_rating_stats_sqlite}),
+    (10, "Circulation counters for reports", {'mysql': _migration_report_counters,
+                                              'sqlite': _migration_report_counters_sqlite}),
+    (11, "Index for the borrow history", {'mysql': _migration_history_indexes,
+                                          'sqlite': _migration_history_indexes_sqlite}),
+    (12, "Per-user loan statistics", {'mysql': _migration_user_loan_stats,
+                                      'sqlite': _migration_user_loan_stats_sqlite}),
+]
+
+LATEST_SCHEMA_VERSION = SCHEMA_MIGRATIONS[-1][0]
+
+
+# Hot Library queries whose plans must use an index on the large tables.
+# (name, sql, sample params) - checked by DatabaseConnection.explain_hot_queries()
+HOT_QUERIES = [
+    ('borrowBook snapshot', """
+        SELECT u.id, u.status, b.id, b.available_copies,
+               (SELECT COUNT(*) FROM borrowed_books
+                WHERE user_id = u.id AND book_id = b.id AND returned = FALSE),
+               u.active_loans, b.title, b.author, b.category, b.total_copies
+        FROM users u LEFT JOIN books b ON b.title = %s
+        WHERE u.username = %s
+     """, ('sample', 'sample')),
+    ('returnBook/renewBook loan lookup', """
+        SELECT bb.id, bb.due_date FROM borrowed_books bb
+        JOIN users u ON u.id = bb.user_id
+        JOIN books b ON b.id = bb.book_id
+        WHERE u.username = %s AND b.title = %s AND bb.returned = FALSE
+     """, ('sample', 'sample')),
+    ('removeBook open loans', """
+        SELECT COUNT(*) FROM borrowed_books WHERE book_id = %s AND returned = FALSE
+     """, (1,)),
+    ('trackBooks', """
+        SELECT u.username, b.title, bb.borrowed_date, bb.due_date
+        FROM borrowed_books bb
+        JOIN users u ON u.id = bb.user_id
+        JOIN books b ON b.id = bb.book_id
+        WHERE bb.returned = FALSE ORDER BY bb.due_date
+     """, ()),
+    ('getOverdueBooks', """
+        SELECT u.username, b.title, bb.due_date
+        FROM borrowed_books bb
+        JOIN users u ON u.id = bb.user_id
+        JOIN books b ON b.id = bb.book_id
+        WHERE bb.returned = FALSE AND bb.due_date < CURDATE()
+     """, ()),
+    ('get_book_reviews', """
+        SELECT u.username, r.rating, r.review_text, r.review_date
+        FROM book_reviews r
+        JOIN books b ON b.id = r.book_id
+        JOIN users u ON u.id = r.user_id
+        WHERE b.title = %s ORDER BY r.review_date DESC
+     """, ('sample',)),
+    ('borrow history page', """
+        SELECT u.username, b.title, bb.borrowed_date
+        FROM borrowed_books bb
+        JOIN users u ON u.id = bb.user_id
+        JOIN books b ON b.id = bb.book_id
+        WHERE (bb.borrowed_date < %s OR (bb.borrowed_date = %s AND bb.id < %s))
+        ORDER BY bb.borrowed_date DESC, bb.id DESC
+        LIMIT 51
+     """, ('2000-01-01', '2000-01-01', 1)),
+    ('getUserLogs page', """
+        SELECT b.title, bb.borrowed_date FROM borrowed_books bb
+        JOIN books b ON b.id = bb.book_id
+        WHERE bb.user_id = %s AND bb.returned = %s
+          AND (bb.borrowed_date < %s OR (bb.borrowed_date = %s AND bb.id < %s))
+        ORDER BY bb.borrowed_date DESC, bb.id DESC
+        LIMIT 51
+     """, (1, True, '2100-01-01', '2100-01-01', 1)),
+    ('get_top_rated_books', """
+        SELECT b.title, b.author, b.category, s.avg_rating, s.review_count
+        FROM book_rating_stats s
+        JOIN books b ON b.id = s.book_id
+        WHERE s.review_count > 0
+        ORDER BY s.avg_rating DESC, s.review_count DESC
+        LIMIT %s
+     """, (5,)),
+]
+
+def _substring_pattern(term):
+    """LIKE pattern matching term as a literal substring; use with ESCAPE '!'"""
+    escaped = term.replace('!', '!!').replace('%', '!%').replace('_', '!_')
+    return f"%{escaped}%"
+
+
+# Tables that grow without bound; a full scan on them is a regression
+LARGE_TABLES = ('borrowed_books', 'book_reviews')
+
+# Words shorter than innodb_ft_min_token_size are not in the FULLTEXT index
+FULLTEXT_MIN_WORD = 3
+# Default row cap for relevance-ranked searches
+SEARCH_LIMIT = 100
+# Default rows per page for the *_page listings
+PAGE_SIZE = 50
+# Rows fetched per round trip by DatabaseConnection.stream()
+STREAM_BATCH_SIZE = 500
+
+# Seconds a cached available-books listing is trusted before it is reloaded
+CATALOG_CACHE_TTL = 60
+
+# User status cache: entries kept, and seconds a known / unknown username is trusted
+USER_CACHE_SIZE = 1024
+USER_CACHE_TTL = 300
+USER_NEGATIVE_CACHE_TTL = 30
+
+USER_STATUSES = ('active', 'suspended', 'inactive')
+
+
+# SQLite starts from the current schema (everything up to migration 4), so the
+# MySQL-only migrations above are just recorded. NOCASE matches MySQL's
+# case-insensitive default collation for lookups by title and username.
+SQLITE_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS books (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title VARCHAR(255) NOT NULL UNIQUE COLLATE NOCASE,
+        available BOOLEAN DEFAULT TRUE,
+        total_copies INT DEFAULT 1,
+        available_copies INT DEFAULT 1,
+        category VARCHAR(100) DEFAULT 'General',
+        author VARCHAR(255),
+        created_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS book_categories (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        category_name VARCHAR(100) NOT NULL UNIQUE COLLATE NOCASE,
+        description TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username VARCHAR(255) NOT NULL UNIQUE COLLATE NOCASE,
+        full_name VARCHAR(255) NOT NULL,
+        class VARCHAR(50),
+        section VARCHAR(10),
+        registration_date TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+        status VARCHAR(10) DEFAULT 'active' CHECK (status IN ('active', 'suspended', 'inactive'))
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS borrowed_books (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE RESTRICT,
+        book_id INTEGER NOT NULL REFERENCES books(id) ON DELETE CASCADE,
+        borrowed_date TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+        due_date DATE NOT NULL,
+        returned BOOLEAN DEFAULT FALSE,
+        return_date TIMESTAMP NULL,
+        fine_amount DECIMAL(10,2) DEFAULT 0.00
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS book_reviews (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        book_id INTEGER NOT NULL REFERENCES books(id) ON DELETE CASCADE,
+        user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE RESTRICT,
+        rating INT NOT NULL CHECK (rating BETWEEN 1 AND 5),
+        review_text TEXT,
+        review_date TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_borrowed_returned_due ON borrowed_books (returned, due_date)",
+] + [f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} {columns}"
+     for table, index_name, columns in SURROGATE_KEY_INDEXES]
+
+
 class DatabaseConnection:
-    def __init__(self):
+    def __init__(self, pool_size=None, backend='mysql', **pool_options):
+        """
+        pool_size: None keeps the classic single shared connection; an integer
+        enables pooled mode where each session() checks out its own connection.
+        backend: 'mysql' (default) or 'sqlite' for an embedded database file
+        named after the database argument of connect().
+        pool_options are passed through to ConnectionPool (min_idle,
+        idle_timeout, health_check_interval, acquire_timeout).
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown database backend '{backend}' "
+                             f"(choose from {', '.join(BACKENDS)})")
+        self.backend_class = BACKENDS[backend]
+        self.backend = None
         self.connection = None
         self.cursor = None
+        self.pool = None
+        self.pool_size = pool_size
+        self.pool_options = pool_options
+        self._lock = threading.RLock()      # serializes sessions on the shared connection
+        self._local = threading.local()     # per-thread active session, for nesting
     
     def connect(self, host='localhost', database='library_management', user='root', password=''):
-        """Connect to MySQL database"""
+        """Connect to the database (for SQLite, database is the file path)"""
+        label = self.backend_class.label
         try:
-            self.connection = mysql.connector.connect(
-                host=host,
-                database=database,
-                user=user,
-                password=password,
-                autocommit=True,  # Enable autocommit by default
-                use_pure=True,    # Use pure Python implementation
-                buffered=True     # Use buffered cursors
-            )
-            if self.connection.is_connected():
-                self.cursor = self.connection.cursor(buffered=True)
-                print("Successfully connected to MySQL database")
-                self.create_tables()
+            self.backend = self.backend_class(host, database, user, password)
+            if self.pool_size:
+                if database == ':memory:':
+                    raise DatabaseError("An in-memory SQLite database can't be shared by a pool")
+                self.pool = ConnectionPool(self.backend, size=self.pool_size, **self.pool_options)
+                self.pool.warm_up()
+                print(f"Successfully connected to {label} database (pool of {self.pool_size})")
+                self.ensure_schema()
                 return True
+
+            self.connection = self.backend.connect()
+            self.cursor = self.backend.cursor(self.connection)
+            print(f"Successfully connected to {label} database")
+            self.ensure_schema()
+            return True
         except Error as e:
-            print(f"Error while connecting to MySQL: {e}")
+            # Don't leave a connection to a half-migrated schema behind
+            print(f"Error while connecting to {label}: {e}")
+            self.close_connection()
             return False
+
+    @contextmanager
+    def session(self, buffered=True):
+        """
+        Yield a cursor for one operation.
+
+        In pooled mode the cursor's connection is checked out for the duration
+        of the block and returned afterwards; otherwise the shared connection
+        is used under a lock. Sessions nest: an inner session on the same
+        thread reuses the outer connection. An open transaction is committed
+        when the outermost session exits cleanly and rolled back on error.
+        buffered=False yields a streaming cursor (see stream()).
+        """
+        active = getattr(self._local, 'connection', None)
+        if active is not None:
+            cursor = self.backend.cursor(active, buffered)
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+            return
+
+        if self.pool is not None:
+            conn = self.pool.acquire()
+        else:
+            if self.connection is None:
+                raise DatabaseError("Not connected to the database")
+            self._lock.acquire()
+            conn = self.connection
+
+        broken = False
+        cursor = None
+        self._local.connection = conn
+        try:
+            cursor = self.backend.cursor(conn, buffered)
+            yield cursor
+            if conn.in_transaction:
+                conn.commit()
+        except BaseException:
+            try:
+                if conn.in_transaction:
+                    conn.rollback()
+            except Error:
+                broken = True
+            raise
+        finally:
+            self._local.connection = None
+            if cursor is not None:
+                try:
+                    cursor.close()
+                except Error:
+                    broken = True
+            if self.pool is not None:
+                self.pool.release(conn, broken)
+            else:
+                self._lock.release()
+    
+    @contextmanager
+    def transaction(self):
+        """
+        Unit of work: yield a cursor whose statements commit or roll back together.
+
+        The outermost transaction on a thread commits once when its block exits
+        cleanly and rolls back if it raises. A transaction opened inside another
+        one becomes a savepoint, so a failing inner step can be undone without
+        discarding the work done before it.
+        """
+        with self.session() as cursor:
+            conn = self._local.connection
+            depth = getattr(self._local, 'tx_depth', 0)
+            if depth == 0:
+                self.backend.begin(conn)
+                self._local.tx_depth = 1
+                try:
+                    yield cursor
+                    conn.commit()
+                except BaseException:
+                    conn.rollback()
+                    raise
+                finally:
+                    self._local.tx_depth = 0
+            else:
+                savepoint = f"sp_{depth}"
+                cursor.execute(f"SAVEPOINT {savepoint}")
+                self._local.tx_depth = depth + 1
+                try:
+                    yield cursor
+                    cursor.execute(f"RELEASE SAVEPOINT {savepoint}")
+                except BaseException:
+                    try:
+                        cursor.execute(f"ROLLBACK TO SAVEPOINT {savepoint}")
+                    except Error:
+                        # The database already rolled back the whole transaction (a MySQL
+                        # deadlock does), so the savepoint is gone; report the original error
+                        pass
+                    raise
+                finally:
+                    self._local.tx_depth = depth
+    
+    def stream(self, query, params=(), batch_size=STREAM_BATCH_SIZE):
+        """
+        Yield the rows of a SELECT, fetching batch_size rows at a time.
+
+        The result is read through an unbuffered cursor, so only one batch is
+        in memory however many rows match. In pooled mode the generator owns
+        a connection of its own until it is exhausted or closed, and the loop
+        body may run other queries. On the shared connection (or inside a
+        session) it holds that connection, and on MySQL the loop body must not
+        query the database before the stream ends.
+        """
+        if self.pool is None or getattr(self._local, 'connection', None) is not None:
+            with self.session(buffered=False) as cursor:
+                cursor.execute(query, params)
+                try:
+                    while True:
+                        rows = cursor.fetchmany(batch_size)
+                        if not rows:
+                            return
+                        yield from rows
+                except GeneratorExit:
+                    # Stopped early: read off the rest so the connection stays usable
+                    while cursor.fetchmany(batch_size):
+                        pass
+                    raise
+        
+        conn = self.pool.acquire()
+        broken = False
+        cursor = None
+        try:
+            cursor = self.backend.cursor(conn, buffered=False)
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+        except GeneratorExit:
+            # Stopped early: dropping the connection is cheaper than reading the rest
+            broken = True
+            raise
+        except Error:
+            broken = True
+            raise
+        finally:
+            if cursor is not None and not broken:
+                try:
+                    cursor.close()
+                except Error:
+                    broken = True
+            self.pool.release(conn, broken)
+
+    def schema_version(self):
+        """Latest applied migration, or None before schema_version exists"""
+        try:
+            with self.session() as cursor:
+                cursor.execute("SELECT MAX(version) FROM schema_version")
+                return cursor.fetchone()[0] or 0
+        except Error:
+            return None
+
+    def ensure_schema(self):
+        """
+        Make sure the schema is current.
+
+        On an up-to-date database this is a single version query. Otherwise
+        the baseline tables are created and pending migrations are applied.
+        Raises DatabaseError if the schema can't be brought up to date.
+        """
+        if self.schema_version() == LATEST_SCHEMA_VERSION:
+            return LATEST_SCHEMA_VERSION
+        self.create_tables()
+        version = self.run_migrations()
+        if version < LATEST_SCHEMA_VERSION:
+            raise DatabaseError(f"Schema is at version {version}, "
+                                f"this code needs {LATEST_SCHEMA_VERSION}")
+        return version
     
     def create_tables(self):
-        """Create necessary tables if they don't exist"""
+        """Create the baseline tables if they don't exist (later changes are migrations)"""
         try:
             # Create books table
             books_table = """
@@ -103,58 +1034,132 @@ class DatabaseConnection:
             )
             """
             
+            if self.backend.name == 'sqlite':
+                tables = SQLITE_TABLES
+            else:
+                tables = [books_table, categories_table, users_table, borrowed_table, reviews_table]
+            
             # Create tables in the correct order to avoid foreign key issues
-            self.cursor.execute(books_table)
-            self.cursor.execute(categories_table)
-            self.cursor.execute(users_table)
-            self.cursor.execute(borrowed_table)
-            self.cursor.execute(reviews_table)
-            self.connection.commit()
+            with self.session() as cursor:
+                for table in tables:
+                    cursor.execute(table)
             print("Database tables created successfully")
             
-            # Insert default categories
-            self.insert_default_categories()
-            
         except Error as e:
-            print(f"Error creating tables: {e}")
+            raise DatabaseError(f"Error creating tables: {e}")
     
-    def insert_default_categories(self):
-        """Insert default book categories"""
+    def run_migrations(self):
+        """Apply pending SCHEMA_MIGRATIONS and record each one in schema_version"""
         try:
-            categories = [
-                ('Fiction', 'Novels, short stories, and fictional works'),
-                ('Non-Fiction', 'Biographies, history, science, etc.'),
-                ('Science', 'Scientific books and research'),
-                ('Technology', 'Computer science, engineering, etc.'),
-                ('Literature', 'Classic literature and poetry'),
-                ('Economics', 'Economic theories and business'),
-                ('Education', 'Educational and academic books'),
-                ('General', 'General purpose books')
-            ]
-            
-            for category, description in categories:
-                check_query = "SELECT COUNT(*) FROM book_categories WHERE category_name = %s"
-                self.cursor.execute(check_query, (category,))
-                if self.cursor.fetchone()[0] == 0:
-                    insert_query = "INSERT INTO book_categories (category_name, description) VALUES (%s, %s)"
-                    self.cursor.execute(insert_query, (category, description))
-            
-            self.connection.commit()
+            with self.session() as cursor:
+                cursor.execute("""
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INT PRIMARY KEY,
+                    description VARCHAR(255) NOT NULL,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+                """)
+                # Only one process migrates at a time; the others wait, then find nothing to do
+                with self.backend.migration_lock(cursor):
+                    cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+                    current = cursor.fetchone()[0]
+                    
+                    for version, description, migrations in SCHEMA_MIGRATIONS:
+                        if version <= current:
+                            continue
+                        print(f"Applying schema migration {version}: {description}")
+                        migrate = migrations.get(self.backend.name)
+                        if migrate is not None:
+                            migrate(cursor)
+                        cursor.execute("INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+                                       (version, description))
+                        current = version
+            return current
             
         except Error as e:
-            print(f"Error inserting categories: {e}")
-    
+            # Migrations applied before the failure stay recorded; connect() reports this one
+            raise DatabaseError(f"Error applying schema migrations: {e}")
+
+    def explain_hot_queries(self):
+        """
+        EXPLAIN every query in HOT_QUERIES and report how the large tables are read.
+
+        Returns one dict per (query, table) with the access type and chosen key;
+        'full_scan' is True when the plan reads borrowed_books or book_reviews
+        without an index (type ALL on MySQL, a plain SCAN on SQLite). On a
+        nearly empty database the optimizer may still pick a scan, so run
+        this against realistic data.
+        """
+        report = []
+        with self.session() as cursor:
+            for name, query, params in HOT_QUERIES:
+                for plan in self.backend.explain(cursor, query, params):
+                    if plan['table'] not in LARGE_TABLES:
+                        continue
+                    report.append(dict(plan, query=name))
+        return report
+
     def close_connection(self):
         """Close database connection"""
-        if self.connection and self.connection.is_connected():
+        if self.pool is not None:
+            self.pool.close()
+            print(f"{self.backend.label} connection pool is closed")
+        elif self.connection is not None:
             self.cursor.close()
             self.connection.close()
-            print("MySQL connection is closed")
+            self.connection = None
+            print(f"{self.backend.label} connection is closed")
+
+
+class BorrowHistory:
+    """
+    Filtered borrow history returned by Library.borrow_history.
+
+    Iterating streams the records newest first; page() reads one keyset page;
+    total_fines is queried the first time it is read.
+    """
+
+    def __init__(self, library, **filters):
+        self.library = library
+        self.filters = filters
+
+    def __iter__(self):
+        return self.library.iter_borrow_history(**self.filters)
+
+    def page(self, page_size=PAGE_SIZE, after=None):
+        return self.library.get_borrow_history_page(page_size, after, **self.filters)
+
+    @cached_property
+    def total_fines(self):
+        return self.library.get_borrow_fines_total(**self.filters)
 
 
 class Library:
-    def __init__(self, db_connection):
+    def __init__(self, db_connection, catalog_index=False, catalog_cache=False,
+                 cache_ttl=CATALOG_CACHE_TTL, user_cache=False):
+        """
+        catalog_index=True keeps the catalog and usernames in memory, for
+        substring search, "did you mean" suggestions and autocomplete.
+        catalog_cache=True caches the available-books listing, patched by
+        this Library's writes and reloaded after cache_ttl seconds (None:
+        never) to pick up other processes' writes.
+        user_cache=True caches checkUserExists lookups, unknown usernames
+        included (see USER_CACHE_SIZE and the TTLs above).
+        """
         self.db = db_connection
+        self.catalog = None
+        self.usernames = None
+        self.change_listeners = []
+        self.catalog_cache = None
+        self.user_cache = None
+        if catalog_cache:
+            self.catalog_cache = CatalogCache(cache_ttl, db_connection.backend_class.name)
+            self.add_change_listener(self.catalog_cache.apply)
+        if user_cache:
+            self.user_cache = UserStatusCache(USER_CACHE_SIZE, USER_CACHE_TTL, USER_NEGATIVE_CACHE_TTL)
+            self.add_change_listener(self._forget_changed_users)
+        if catalog_index:
+            self.rebuild_catalog_index()
         # self.initialize_books()
 
     # def initialize_books(self):
@@ -190,15 +1195,21 @@ class Library:
     #         print(f"Error initializing books: {e}")
 
     def displayAvailableBooks(self):
-        """Display all available books from database"""
+        """Display all available books from database (or the catalog cache)"""
+        if self.catalog_cache is not None:
+            return self.catalog_cache.books(self._query_available_books)
+        return self._query_available_books()
+
+    def _query_available_books(self):
         try:
             query = """
             SELECT title, author, category, available_copies, total_copies 
             FROM books WHERE available_copies > 0
             ORDER BY category, title
             """
-            self.db.cursor.execute(query)
-            books = self.db.cursor.fetchall()
+            with self.db.session() as cursor:
+                cursor.execute(query)
+                books = cursor.fetchall()
             
             if len(books) == 0:
                 return []
@@ -219,18 +1230,83 @@ class Library:
         except Error as e:
             raise Exception(f"Error displaying books: {e}")
 
-    def searchBooks(self, search_term):
-        """Search books by title, author, or category"""
+    def searchBooks(self, search_term, mode='like', limit=None, fuzzy=False):
+        """
+        Search books by title, author, or category
+
+        mode 'like' matches substrings of title, author or category; % and _
+        in the term are literal characters, not wildcards.
+        'natural' and 'boolean' search the FULLTEXT index on title and author
+        in MySQL's natural language or boolean mode, best matches first, and
+        return at most limit rows (SEARCH_LIMIT by default). They fall back to
+        'like' when no word in the term is long enough to be indexed or the
+        backend has no FULLTEXT support (SQLite). With the catalog index
+        loaded, 'like' searches are answered from memory.
+        
+        fuzzy=True returns suggest_books() results (with their 'score' and
+        'matched' keys) when nothing matches, to cover mistyped terms.
+        """
+        mode = self._search_mode(search_term, mode)
+        if mode != 'like':
+            limit = limit or SEARCH_LIMIT
+        if mode == 'like' and self.catalog is not None:
+            books = self.catalog.search(search_term, limit)
+        else:
+            books = self._query_books(search_term, mode, limit)
+        if not books and fuzzy:
+            return self.suggest_books(search_term, limit or SEARCH_LIMIT)
+        return books
+
+    def suggest_books(self, term, limit=5):
+        """
+        Ranked "did you mean" books for a mistyped title or author.
+
+        Answered by the catalog index in memory; returns [] when the index is
+        not loaded or term already names a book exactly.
+        """
+        if self.catalog is None:
+            return []
+        return self.catalog.suggest(term, limit)
+
+    def _search_mode(self, search_term, mode):
+        """Mode a book search actually runs in, after the FULLTEXT fallbacks"""
+        if mode not in ('like', 'natural', 'boolean'):
+            raise ValueError(f"Unknown search mode '{mode}'")
+        if mode != 'like':
+            words = re.findall(r'\w+', search_term)
+            if (not self.db.backend.supports_fulltext
+                    or not any(len(word) >= FULLTEXT_MIN_WORD for word in words)):
+                return 'like'
+        return mode
+
+    def _query_books(self, search_term, mode, limit):
+        """SQL side of searchBooks"""
         try:
-            query = """
-            SELECT title, author, category, available_copies, total_copies 
-            FROM books 
-            WHERE title LIKE %s OR author LIKE %s OR category LIKE %s
-            ORDER BY available_copies DESC, title
-            """
-            search_pattern = f"%{search_term}%"
-            self.db.cursor.execute(query, (search_pattern, search_pattern, search_pattern))
-            books = self.db.cursor.fetchall()
+            if mode == 'like':
+                query = """
+                SELECT title, author, category, available_copies, total_copies 
+                FROM books 
+                WHERE title LIKE %s ESCAPE '!' OR author LIKE %s ESCAPE '!'
+                   OR category LIKE %s ESCAPE '!'
+                ORDER BY available_copies DESC, title
+                """
+                search_pattern = _substring_pattern(search_term)
+                params = (search_pattern, search_pattern, search_pattern)
+            else:
+                against = "IN BOOLEAN MODE" if mode == 'boolean' else "IN NATURAL LANGUAGE MODE"
+                query = f"""
+                SELECT title, author, category, available_copies, total_copies
+                FROM books
+                WHERE MATCH(title, author) AGAINST (%s {against})
+                ORDER BY MATCH(title, author) AGAINST (%s {against}) DESC, available_copies DESC, title
+                """
+                params = (search_term, search_term)
+            if limit:
+                query += " LIMIT %s"
+                params += (limit,)
+            with self.db.session() as cursor:
+                cursor.execute(query, params)
+                books = cursor.fetchall()
             
             result = []
             for book in books:
@@ -248,26 +1324,278 @@ class Library:
         except Error as e:
             raise Exception(f"Error searching books: {e}")
 
+    def invalidate_caches(self):
+        """Drop the cached book listing and user statuses, after changes made outside this Library"""
+        if self.catalog_cache is not None:
+            self.catalog_cache.invalidate()
+        if self.user_cache is not None:
+            self.user_cache.invalidate()
+
+    def _forget_changed_users(self, changes):
+        for change in changes:
+            if change['table'] == 'users':
+                self.user_cache.invalidate(change['key'])
+
+    def rebuild_catalog_index(self):
+        """Load the in-memory catalog index and usernames (and drop the caches); returns their memory usage"""
+        try:
+            with self.db.session() as cursor:
+                cursor.execute("""
+                SELECT id, title, author, category, available_copies, total_copies FROM books
+                """)
+                self.catalog = CatalogIndex.from_rows(cursor.fetchall())
+                cursor.execute("SELECT username FROM users")
+                self.usernames = PrefixIndex(row[0] for row in cursor.fetchall())
+            self.invalidate_caches()
+            usage = self.catalog.memory_usage()
+            usage['usernames'] = len(self.usernames)
+            usage['bytes'] += self.usernames.memory_usage()
+            return usage
+            
+        except Error as e:
+            raise Exception(f"Error building catalog index: {e}")
+
+    def verify_catalog_index(self, terms=None):
+        """
+        Compare the catalog index with the database.
+
+        Every indexed row is checked against the books table, and each search
+        term is run through both the index and SQL. terms defaults to the
+        first word of a few titles plus the empty term (every book).
+        Terms with accented letters may legitimately differ: the index folds
+        case with casefold(), MySQL's _ai_ci collations also ignore accents in
+        LIKE, and SQLite's LIKE folds ASCII letters only.
+        """
+        if self.catalog is None:
+            return {'consistent': False, 'error': "Catalog index is not enabled"}
+        try:
+            with self.db.session() as cursor:
+                cursor.execute("""
+                SELECT id, title, author, category, available_copies, total_copies FROM books
+                """)
+                rows = {row[0]: tuple(row[1:]) for row in cursor.fetchall()}
+        except Error as e:
+            raise Exception(f"Error verifying catalog index: {e}")
+        
+        indexed = self.catalog.snapshot()
+        if terms is None:
+            titles = [book[0] for book in list(indexed.values())[:10]]
+            terms = [''] + [title.split()[0] for title in titles if title.split()]
+        mismatched_terms = [term for term in terms
+                            if self.catalog.search(term) != self._query_books(term, 'like', None)]
+        report = {
+            'missing': sorted(rows.keys() - indexed.keys()),
+            'extra': sorted(indexed.keys() - rows.keys()),
+            'stale': sorted(book_id for book_id in rows.keys() & indexed.keys()
+                            if rows[book_id] != indexed[book_id]),
+            'terms': mismatched_terms
+        }
+        report['consistent'] = not any(report.values())
+        return report
+
+    def complete_titles(self, prefix, limit=10):
+        """Book titles starting with prefix, from memory ([] without the catalog index)"""
+        if self.catalog is None or not prefix:
+            return []
+        return self.catalog.titles.complete(prefix, limit)
+
+    def complete_usernames(self, prefix, limit=10):
+        """Usernames starting with prefix, from memory ([] without the catalog index)"""
+        if self.usernames is None or not prefix:
+            return []
+        return self.usernames.complete(prefix, limit)
+
+    def get_active_loan_titles(self, username):
+        """Titles the user currently has on loan, alphabetically"""
+        try:
+            query = """
+            SELECT b.title FROM borrowed_books bb
+            JOIN users u ON u.id = bb.user_id
+            JOIN books b ON b.id = bb.book_id
+            WHERE u.username = %s AND bb.returned = FALSE
+            ORDER BY b.title
+            """
+            with self.db.session() as cursor:
+                cursor.execute(query, (username,))
+                return [row[0] for row in cursor.fetchall()]
+            
+        except Error as e:
+            raise Exception(f"Error fetching loans: {e}")
+
+    @staticmethod
+    def _book_dict(row):
+        title, author, category, available_copies, total_copies = row[:5]
+        return {
+            'title': title,
+            'author': author or "Unknown",
+            'category': category,
+            'available': available_copies,
+            'total': total_copies
+        }
+
+    def add_change_listener(self, listener):
+        """
+        Call listener(changes) after every committed book or user write.
+
+        changes is a list of dicts with 'table' ('books' or 'users'),
+        'action' ('insert', 'update' or 'delete'), 'key' (the title or
+        username the row had before the change) and 'row' (the row after it,
+        shaped like a displayAvailableBooks / listAllUsers entry; None for
+        deletes). Listeners run on the thread that made the change.
+        """
+        self.change_listeners.append(listener)
+
+    def remove_change_listener(self, listener):
+        self.change_listeners.remove(listener)
+
+    def _book_change(self, cursor, book_id, key=None, action='update'):
+        """Change entry for a book, read inside the transaction that changed it (key defaults to its title)"""
+        cursor.execute("""
+        SELECT title, author, category, available_copies, total_copies FROM books WHERE id = %s
+        """, (book_id,))
+        row = self._book_dict(cursor.fetchone())
+        return {'table': 'books', 'action': action, 'key': key or row['title'], 'row': row}
+
+    def _publish_changes(self, changes):
+        for listener in list(self.change_listeners):
+            try:
+                listener(changes)
+            except Exception as e:
+                # The write is committed; a broken listener must not turn it into an error
+                print(f"⚠️ Change listener failed: {e}")
+
+    def _page(self, query, params, page_size, sort_key):
+        """
+        Run a keyset-paginated query (ORDER BY already applied).
+
+        Keysets are spelled out column by column, e.g.
+        category > %s OR (category = %s AND title > %s), so MySQL and SQLite
+        seek into the matching index instead of re-reading the skipped rows.
+        MySQL does not use a row-value comparison such as
+        (category, title) > (%s, %s) for an index range, so don't write them
+        that way.
+
+        One row past the page is fetched to tell whether another page
+        follows; the returned next key is the sort key of the page's last row,
+        or None on the last page.
+        """
+        with self.db.session() as cursor:
+            cursor.execute(query + " LIMIT %s", params + (page_size + 1,))
+            rows = cursor.fetchall()
+        if len(rows) > page_size:
+            return rows[:page_size], sort_key(rows[page_size - 1])
+        return rows, None
+
+    def get_available_books_page(self, page_size=PAGE_SIZE, after=None):
+        """
+        One page of displayAvailableBooks, ordered by category and title.
+
+        Pass the previous page's 'next' as after (None for the first page);
+        'next' is None on the last page.
+        """
+        if self.catalog_cache is not None:
+            books, next_key = self.catalog_cache.page(self._query_available_books, page_size, after)
+            return {'books': books, 'next': next_key}
+        
+        query = """
+        SELECT title, author, category, available_copies, total_copies
+        FROM books WHERE available_copies > 0
+        """
+        params = ()
+        if after is not None:
+            query += " AND (category > %s OR (category = %s AND title > %s))"
+            params = (after[0], after[0], after[1])
+        query += " ORDER BY category, title"
+        try:
+            rows, next_key = self._page(query, params, page_size, lambda row: (row[2], row[0]))
+            return {'books': [self._book_dict(row) for row in rows], 'next': next_key}
+            
+        except Error as e:
+            raise Exception(f"Error displaying books: {e}")
+
+    def search_books_page(self, search_term, mode='like', page_size=PAGE_SIZE, after=None):
+        """
+        One page of searchBooks results, with the same modes and fallbacks.
+
+        'like' pages follow searchBooks' order (available copies, then title);
+        the FULLTEXT modes order by relevance, then book id. Pass the previous
+        page's 'next' as after; 'next' is None on the last page.
+        """
+        mode = self._search_mode(search_term, mode)
+        if mode == 'like' and self.catalog is not None:
+            books = self.catalog.search(search_term, page_size + 1, after)
+            if len(books) > page_size:
+                last = books[page_size - 1]
+                return {'books': books[:page_size], 'next': (last['available'], last['title'])}
+            return {'books': books, 'next': None}
+        
+        if mode == 'like':
+            query = """
+            SELECT title, author, category, available_copies, total_copies
+            FROM books
+            WHERE (title LIKE %s ESCAPE '!' OR author LIKE %s ESCAPE '!'
+                   OR category LIKE %s ESCAPE '!')
+            """
+            search_pattern = _substring_pattern(search_term)
+            params = (search_pattern, search_pattern, search_pattern)
+            if after is not None:
+                query += " AND (available_copies < %s OR (available_copies = %s AND title > %s))"
+                params += (after[0], after[0], after[1])
+            query += " ORDER BY available_copies DESC, title"
+            sort_key = lambda row: (row[3], row[0])
+        else:
+            against = "IN BOOLEAN MODE" if mode == 'boolean' else "IN NATURAL LANGUAGE MODE"
+            score = f"MATCH(title, author) AGAINST (%s {against})"
+            query = f"""
+            SELECT title, author, category, available_copies, total_copies, {score} AS score, id
+            FROM books
+            WHERE {score}
+            """
+            params = (search_term, search_term)
+            if after is not None:
+                query += f" AND ({score} < %s OR ({score} = %s AND id > %s))"
+                params += (search_term, after[0], search_term, after[0], after[1])
+            query += " ORDER BY score DESC, id"
+            sort_key = lambda row: (row[5], row[6])
+        try:
+            rows, next_key = self._page(query, params, page_size, sort_key)
+            return {'books': [self._book_dict(row) for row in rows], 'next': next_key}
+            
+        except Error as e:
+            raise Exception(f"Error searching books: {e}")
+
     def registerUser(self, username, full_name, class_name=None, section=None):
         """Register a new user in the system"""
         try:
             if not username or not full_name:
                 return False, "Username and full name are required!"
 
-            # Check if username already exists
-            check_query = "SELECT COUNT(*) FROM users WHERE username = %s"
-            self.db.cursor.execute(check_query, (username,))
-            
-            if self.db.cursor.fetchone()[0] > 0:
-                return False, f"Username '{username}' already exists. Please choose a different username."
+            with self.db.transaction() as cursor:
+                # Check if username already exists
+                check_query = "SELECT COUNT(*) FROM users WHERE username = %s"
+                cursor.execute(check_query, (username,))
+                
+                if cursor.fetchone()[0] > 0:
+                    return False, f"Username '{username}' already exists. Please choose a different username."
+                
+                # Insert new user
+                insert_query = """
+                INSERT INTO users (username, full_name, class, section) 
+                VALUES (%s, %s, %s, %s)
+                """
+                cursor.execute(insert_query, (username, full_name, class_name, section))
             
-            # Insert new user
-            insert_query = """
-            INSERT INTO users (username, full_name, class, section) 
-            VALUES (%s, %s, %s, %s)
-            """
-            self.db.cursor.execute(insert_query, (username, full_name, class_name, section))
-            self.db.connection.commit()
+            if self.usernames is not None:
+                self.usernames.add(username)
+            if self.change_listeners:
+                self._publish_changes([{'table': 'users', 'action': 'insert', 'key': username, 'row': {
+                    'username': username,
+                    'full_name': full_name,
+                    'class': class_name or "N/A",
+                    'section': section or "N/A",
+                    'status': 'active',
+                    'active_books': 0
+                }}])
             
             return True, {
                 'username': username,
@@ -280,11 +1608,19 @@ class Library:
             return False, f"Error registering user: {e}"
 
     def checkUserExists(self, username):
-        """Check if a user exists in the system"""
+        """Check if a user exists in the system (answered from the user cache when enabled)"""
         try:
-            check_query = "SELECT username, full_name, status FROM users WHERE username = %s"
-            self.db.cursor.execute(check_query, (username,))
-            result = self.db.cursor.fetchone()
+            cached = False
+            if self.user_cache is not None:
+                cached, result = self.user_cache.get(username)
+            if not cached:
+                generation = self.user_cache.generation if self.user_cache is not None else None
+                check_query = "SELECT username, full_name, status FROM users WHERE username = %s"
+                with self.db.session() as cursor:
+                    cursor.execute(check_query, (username,))
+                    result = cursor.fetchone()
+                if self.user_cache is not None:
+                    self.user_cache.put(username, result and tuple(result), generation)
             
             if not result:
                 return False, None
@@ -305,8 +1641,7 @@ class Library:
         """Search users by username, full name, class, or section"""
         try:
             query = """
-            SELECT username, full_name, class, section, registration_date, status,
-                   (SELECT COUNT(*) FROM borrowed_books WHERE student_name = users.username AND returned = FALSE) as active_books
+            SELECT username, full_name, class, section, registration_date, status, active_loans
             FROM users 
             WHERE username LIKE %s 
                OR full_name LIKE %s
@@ -315,8 +1650,9 @@ class Library:
             ORDER BY registration_date DESC
             """
             search_pattern = f"%{search_term}%"
-            self.db.cursor.execute(query, (search_pattern, search_pattern, search_pattern, search_pattern))
-            users = self.db.cursor.fetchall()
+            with self.db.session() as cursor:
+                cursor.execute(query, (search_pattern, search_pattern, search_pattern, search_pattern))
+                users = cursor.fetchall()
             
             result = []
             for user in users:
@@ -338,13 +1674,13 @@ class Library:
         """List all registered users (Admin function)"""
         try:
             query = """
-            SELECT username, full_name, class, section, registration_date, status,
-                   (SELECT COUNT(*) FROM borrowed_books WHERE student_name = users.username AND returned = FALSE) as active_books
+            SELECT username, full_name, class, section, registration_date, status, active_loans
             FROM users 
             ORDER BY registration_date DESC
             """
-            self.db.cursor.execute(query)
-            users = self.db.cursor.fetchall()
+            with self.db.session() as cursor:
+                cursor.execute(query)
+                users = cursor.fetchall()
             
             result = []
             for user in users:
@@ -362,62 +1698,152 @@ class Library:
         except Error as e:
             raise Exception(f"Error listing users: {e}")
 
+    def _users_page(self, where, params, page_size, after):
+        """Keyset page of users, newest registration first (id breaks ties)"""
+        query = """
+        SELECT username, full_name, class, section, registration_date, status, active_loans, id
+        FROM users
+        """
+        conditions = [where] if where else []
+        if after is not None:
+            conditions.append("(registration_date < %s OR (registration_date = %s AND id < %s))")
+            params += (after[0], after[0], after[1])
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY registration_date DESC, id DESC"
+        
+        rows, next_key = self._page(query, params, page_size, lambda row: (row[4], row[7]))
+        users = []
+        for username, full_name, class_name, section, reg_date, status, active_books, user_id in rows:
+            users.append({
+                'username': username,
+                'full_name': full_name,
+                'class': class_name or "N/A",
+                'section': section or "N/A",
+                'status': status,
+                'active_books': active_books
+            })
+        return {'users': users, 'next': next_key}
+
+    def list_users_page(self, page_size=PAGE_SIZE, after=None):
+        """
+        One page of listAllUsers, newest registration first.
+
+        Pass the previous page's 'next' as after (None for the first page);
+        'next' is None on the last page.
+        """
+        try:
+            return self._users_page(None, (), page_size, after)
+        except Error as e:
+            raise Exception(f"Error listing users: {e}")
+
+    def search_users_page(self, search_term, page_size=PAGE_SIZE, after=None):
+        """One page of searchUsers results, in list_users_page order"""
+        where = "(username LIKE %s OR full_name LIKE %s OR class LIKE %s OR section LIKE %s)"
+        search_pattern = f"%{search_term}%"
+        try:
+            return self._users_page(where, (search_pattern,) * 4, page_size, after)
+        except Error as e:
+            raise Exception(f"Error searching users: {e}")
+
     def borrowBook(self, name, bookname):
-        """Borrow a book and update database with due date"""
+        """
+        Borrow a book and update database with due date
+
+        On MySQL the checkout is BEGIN, one locking read, one multi-table
+        UPDATE, the loan INSERT and COMMIT.
+        """
         try:
-            # First check if user exists and is active
-            user_exists, user_info = self.checkUserExists(name)
-            if not user_exists:
-                raise Exception(f"User '{name}' is not registered in the system.\n"
-                              "Please register first using the registration option.")
-            
-            # Check if book exists and is available
-            check_query = "SELECT title, available_copies FROM books WHERE title = %s"
-            self.db.cursor.execute(check_query, (bookname,))
-            result = self.db.cursor.fetchone()
-            
-            if not result:
-                raise Exception(f"Book '{bookname}' does not exist in the library.")
-            
-            if result[1] <= 0:
-                raise Exception(f"Book '{bookname}' is currently not available. All copies are borrowed.")
-            
-            # Check if user already has this book
-            user_has_book_query = """
-            SELECT COUNT(*) FROM borrowed_books 
-            WHERE student_name = %s AND book_title = %s AND returned = FALSE
-            """
-            self.db.cursor.execute(user_has_book_query, (name, bookname))
-            if self.db.cursor.fetchone()[0] > 0:
-                raise Exception(f"You already have '{bookname}' borrowed. Please return it first.")
-            
-            # Check if user has reached borrowing limit (max 3 books)
-            user_books_query = """
-            SELECT COUNT(*) FROM borrowed_books 
-            WHERE student_name = %s AND returned = FALSE
-            """
-            self.db.cursor.execute(user_books_query, (name,))
-            current_books = self.db.cursor.fetchone()[0]
-            
-            if current_books >= 3:
-                raise Exception("You have reached the maximum borrowing limit (3 books).\n"
-                              "Please return some books first.")
-            
             # Calculate due date (7 days from now)
             due_date = (datetime.now() + timedelta(days=7)).date()
             
-            # Update book availability
-            update_query = "UPDATE books SET available_copies = available_copies - 1 WHERE title = %s"
-            self.db.cursor.execute(update_query, (bookname,))
-            
-            # Record the borrowing
-            borrow_query = """
-            INSERT INTO borrowed_books (student_name, book_title, due_date) 
-            VALUES (%s, %s, %s)
-            """
-            self.db.cursor.execute(borrow_query, (name, bookname, due_date))
+            with self.db.transaction() as cursor:
+                # One locking read fetches the user, the book and the user's open loans
+                # (users.active_loans counts them). FOR UPDATE holds the user and book
+                # rows until commit, so concurrent checkouts of the same copy or by the
+                # same user are serialized. It also returns the book's listing columns,
+                # so the change set needs no extra read.
+                snapshot_query = """
+                SELECT u.status, u.id, b.id, b.available_copies,
+                       (SELECT COUNT(*) FROM borrowed_books
+                        WHERE user_id = u.id AND book_id = b.id AND returned = FALSE) as has_book,
+                       u.active_loans, b.title, b.author, b.category, b.total_copies
+                FROM users u
+                LEFT JOIN books b ON b.title = %s
+                WHERE u.username = %s
+                FOR UPDATE
+                """
+                cursor.execute(snapshot_query, (bookname, name))
+                snapshot = cursor.fetchone()
+                
+                # Check if user exists and is active
+                status = snapshot[0] if snapshot else None
+                if status != 'active':
+                    if status:
+                        print(f"❌ User account '{name}' is {status}. Please contact the librarian.\n")
+                    raise Exception(f"User '{name}' is not registered in the system.\n"
+                                  "Please register first using the registration option.")
+                
+                status, user_id, book_id, available_copies, has_book, current_books = snapshot[:6]
+                title, author, category, total_copies = snapshot[6:]
+                
+                # Check if book exists and is available
+                if book_id is None:
+                    raise Exception(f"Book '{bookname}' does not exist in the library.")
+                
+                if available_copies <= 0:
+                    raise Exception(f"Book '{bookname}' is currently not available. All copies are borrowed.")
+                
+                # Check if user already has this book
+                if has_book > 0:
+                    raise Exception(f"You already have '{bookname}' borrowed. Please return it first.")
+                
+                # Check if user has reached borrowing limit (max 3 books)
+                if current_books >= 3:
+                    raise Exception("You have reached the maximum borrowing limit (3 books).\n"
+                                  "Please return some books first.")
+                
+                # Conditional decrement: never takes available_copies below zero
+                if self.db.backend.supports_multi_table_update:
+                    # MySQL: the book, the user and the counter slot change in one statement
+                    update_query = """
+                    UPDATE books b
+                    JOIN users u ON u.id = %s
+                    JOIN library_counters c ON c.name = 'available_copies' AND c.slot = %s
+                    SET b.available_copies = b.available_copies - 1, b.borrow_count = b.borrow_count + 1,
+                        u.active_loans = u.active_loans + 1, u.total_borrowed = u.total_borrowed + 1,
+                        c.value = c.value - 1
+                    WHERE b.id = %s AND b.available_copies > 0
+                    """
+                    cursor.execute(update_query, (user_id, book_id % COUNTER_SLOTS, book_id))
+                    if cursor.rowcount == 0:
+                        raise Exception(f"Book '{bookname}' is currently not available. All copies are borrowed.")
+                else:
+                    # SQLite runs in-process, so separate statements cost no round trips
+                    update_query = """
+                    UPDATE books SET available_copies = available_copies - 1, borrow_count = borrow_count + 1
+                    WHERE id = %s AND available_copies > 0
+                    """
+                    cursor.execute(update_query, (book_id,))
+                    if cursor.rowcount == 0:
+                        raise Exception(f"Book '{bookname}' is currently not available. All copies are borrowed.")
+                    cursor.execute("UPDATE users SET active_loans = active_loans + 1, "
+                                   "total_borrowed = total_borrowed + 1 WHERE id = %s", (user_id,))
+                    _bump_counters(cursor, book_id, available_copies=-1)
+                
+                # Record the borrowing
+                borrow_query = """
+                INSERT INTO borrowed_books (user_id, book_id, due_date) 
+                VALUES (%s, %s, %s)
+                """
+                cursor.execute(borrow_query, (user_id, book_id, due_date))
             
-            self.db.connection.commit()
+            # The locked snapshot plus the guarded decrement give the committed row
+            row = self._book_dict((title, author, category, available_copies - 1, total_copies))
+            changes = [{'table': 'books', 'action': 'update', 'key': title, 'row': row}]
+            if self.catalog is not None:
+                self.catalog.adjust_copies(book_id, -1)
+            self._publish_changes(changes)
             
             # Return success information
             return {
@@ -428,62 +1854,74 @@ class Library:
             }
             
         except Error as e:
-            self.db.connection.rollback()
             raise Exception(f"Error borrowing book: {e}")
-        except Exception as e:
-            self.db.connection.rollback()
-            raise e
 
     def returnBook(self, name, bookname):
         """Return a book and update database with fine calculation"""
         try:
-            # First check if user exists and is active
-            user_exists, user_info = self.checkUserExists(name)
-            if not user_exists:
-                raise Exception(f"User '{name}' is not registered in the system.")
-            
-            # Check if the book exists in the library
-            book_check_query = "SELECT COUNT(*) FROM books WHERE title = %s"
-            self.db.cursor.execute(book_check_query, (bookname,))
-            if self.db.cursor.fetchone()[0] == 0:
-                raise Exception(f"Book '{bookname}' does not exist in the library.")
-            
-            # Check if the book was borrowed by this person
-            check_query = """
-            SELECT id, due_date, borrowed_date FROM borrowed_books 
-            WHERE student_name = %s AND book_title = %s AND returned = FALSE
-            """
-            self.db.cursor.execute(check_query, (name, bookname))
-            borrow_record = self.db.cursor.fetchone()
-            
-            if not borrow_record:
-                raise Exception(f"No record found for {name} borrowing {bookname}.\n"
-                              "Please check if the book title is correct and you have borrowed it.")
-            
-            borrow_id, due_date, borrowed_date = borrow_record
-            return_date = datetime.now()
-            
-            # Calculate fine if overdue
-            fine_amount = 0.0
-            days_overdue = 0
-            
-            if return_date.date() > due_date:
-                days_overdue = (return_date.date() - due_date).days
-                fine_amount = days_overdue * 5.0  # ₹5 per day fine
-            
-            # Mark book as returned with return date and fine
-            return_query = """
-            UPDATE borrowed_books 
-            SET returned = TRUE, return_date = %s, fine_amount = %s 
-            WHERE id = %s
-            """
-            self.db.cursor.execute(return_query, (return_date, fine_amount, borrow_id))
-            
-            # Update book availability
-            update_query = "UPDATE books SET available_copies = available_copies + 1 WHERE title = %s"
-            self.db.cursor.execute(update_query, (bookname,))
+            with self.db.transaction() as cursor:
+                # First check if user exists and is active
+                user_exists, user_info = self.checkUserExists(name)
+                if not user_exists:
+                    raise Exception(f"User '{name}' is not registered in the system.")
+                
+                # Check if the book exists in the library
+                book_check_query = "SELECT id FROM books WHERE title = %s"
+                cursor.execute(book_check_query, (bookname,))
+                book = cursor.fetchone()
+                if not book:
+                    raise Exception(f"Book '{bookname}' does not exist in the library.")
+                book_id = book[0]
+                
+                # Check if the book was borrowed by this person
+                check_query = """
+                SELECT id, user_id, due_date, borrowed_date FROM borrowed_books 
+                WHERE user_id = (SELECT id FROM users WHERE username = %s)
+                  AND book_id = %s AND returned = FALSE
+                FOR UPDATE
+                """
+                cursor.execute(check_query, (name, book_id))
+                borrow_record = cursor.fetchone()
+                
+                if not borrow_record:
+                    raise Exception(f"No record found for {name} borrowing {bookname}.\n"
+                                  "Please check if the book title is correct and you have borrowed it.")
+                
+                borrow_id, user_id, due_date, borrowed_date = borrow_record
+                return_date = datetime.now()
+                
+                # Calculate fine if overdue
+                fine_amount = 0.0
+                days_overdue = 0
+                
+                if return_date.date() > due_date:
+                    days_overdue = (return_date.date() - due_date).days
+                    fine_amount = days_overdue * 5.0  # ₹5 per day fine
+                
+                # Mark book as returned with return date and fine
+                return_query = """
+                UPDATE borrowed_books 
+                SET returned = TRUE, return_date = %s, fine_amount = %s 
+                WHERE id = %s
+                """
+                cursor.execute(return_query, (return_date, fine_amount, borrow_id))
+                cursor.execute("""
+                UPDATE users
+                SET active_loans = CASE WHEN active_loans > 0 THEN active_loans - 1 ELSE 0 END,
+                    returned_on_time = returned_on_time + %s,
+                    total_fines = total_fines + %s
+                WHERE id = %s
+                """, (1 if days_overdue == 0 else 0, fine_amount, user_id))
+                
+                # Update book availability
+                update_query = "UPDATE books SET available_copies = available_copies + 1 WHERE id = %s"
+                cursor.execute(update_query, (book_id,))
+                _bump_counters(cursor, book_id, available_copies=1)
+                changes = [self._book_change(cursor, book_id)] if self.change_listeners else []
             
-            self.db.connection.commit()
+            if self.catalog is not None:
+                self.catalog.adjust_copies(book_id, 1)
+            self._publish_changes(changes)
             
             # Return success information
             return {
@@ -496,47 +1934,45 @@ class Library:
             }
             
         except Error as e:
-            self.db.connection.rollback()
             raise Exception(f"Error returning book: {e}")
-        except Exception as e:
-            self.db.connection.rollback()
-            raise e
 
     def renewBook(self, name, bookname):
         """Renew a borrowed book (extend due date by 7 days)"""
         try:
-            # First check if user exists and is active
-            user_exists, user_info = self.checkUserExists(name)
-            if not user_exists:
-                print(f"❌ User '{name}' is not registered in the system.\n")
-                return
-            
-            # Check if the book is borrowed by this person and not overdue
-            check_query = """
-            SELECT id, due_date FROM borrowed_books 
-            WHERE student_name = %s AND book_title = %s AND returned = FALSE
-            """
-            self.db.cursor.execute(check_query, (name, bookname))
-            borrow_record = self.db.cursor.fetchone()
-            
-            if not borrow_record:
-                print(f"❌ No active borrowing record found for {name} and {bookname}\n")
-                return
-            
-            borrow_id, current_due_date = borrow_record
-            
-            # Check if book is overdue
-            if datetime.now().date() > current_due_date:
-                print(f"❌ Cannot renew overdue book. Please return {bookname} and pay the fine first.\n")
-                return
-            
-            # Extend due date by 7 days
-            new_due_date = current_due_date + timedelta(days=7)
-            
-            update_query = "UPDATE borrowed_books SET due_date = %s WHERE id = %s"
-            self.db.cursor.execute(update_query, (new_due_date, borrow_id))
-            
-            self.db.connection.commit()
+            with self.db.transaction() as cursor:
+                # First check if user exists and is active
+                user_exists, user_info = self.checkUserExists(name)
+                if not user_exists:
+                    print(f"❌ User '{name}' is not registered in the system.\n")
+                    return
+                
+                # Check if the book is borrowed by this person and not overdue
+                check_query = """
+                SELECT bb.id, bb.due_date FROM borrowed_books bb
+                JOIN users u ON u.id = bb.user_id
+                JOIN books b ON b.id = bb.book_id
+                WHERE u.username = %s AND b.title = %s AND bb.returned = FALSE
+                FOR UPDATE
+                """
+                cursor.execute(check_query, (name, bookname))
+                borrow_record = cursor.fetchone()
+                
+                if not borrow_record:
+                    print(f"❌ No active borrowing record found for {name} and {bookname}\n")
+                    return
+                
+                borrow_id, current_due_date = borrow_record
+                
+                # Check if book is overdue
+                if datetime.now().date() > current_due_date:
+                    print(f"❌ Cannot renew overdue book. Please return {bookname} and pay the fine first.\n")
+                    return
+                
+                # Extend due date by 7 days
+                new_due_date = current_due_date + timedelta(days=7)
+                
+                update_query = "UPDATE borrowed_books SET due_date = %s WHERE id = %s"
+                cursor.execute(update_query, (new_due_date, borrow_id))
             
             print("✅ BOOK RENEWED SUCCESSFULLY!")
             print(f"📚 Book: {bookname}")
@@ -549,83 +1985,185 @@ class Library:
     def donateBook(self, bookname):
         """Donate a new book to the library"""
         try:
-            # Check if book already exists
-            check_query = "SELECT COUNT(*) FROM books WHERE title = %s"
-            self.db.cursor.execute(check_query, (bookname,))
-            count = self.db.cursor.fetchone()[0]
-            
-            if count > 0:
-                print(f"{bookname} already exists in the library!\n")
-                return
+            with self.db.transaction() as cursor:
+                # Check if book already exists
+                check_query = "SELECT COUNT(*) FROM books WHERE title = %s"
+                cursor.execute(check_query, (bookname,))
+                count = cursor.fetchone()[0]
+                
+                if count > 0:
+                    print(f"{bookname} already exists in the library!\n")
+                    return
+                
+                # Add new book
+                insert_query = "INSERT INTO books (title, available) VALUES (%s, %s)"
+                cursor.execute(insert_query, (bookname, True))
+                book_id = cursor.lastrowid
+                _bump_counters(cursor, book_id, unique_books=1, total_copies=1, available_copies=1)
+                changes = [self._book_change(cursor, book_id, action='insert')] if self.change_listeners else []
             
-            # Add new book
-            insert_query = "INSERT INTO books (title, available) VALUES (%s, %s)"
-            self.db.cursor.execute(insert_query, (bookname, True))
+            if self.catalog is not None:
+                self.catalog.add(book_id, bookname, None, 'General', 1, 1)
+            self._publish_changes(changes)
             
-            self.db.connection.commit()
             print("BOOK DONATED : THANK YOU VERY MUCH, HAVE A GREAT DAY AHEAD.\n")
             
         except Error as e:
             print(f"Error donating book: {e}")
 
-    def getBorrowLogs(self):
-        """Get complete history of all book borrowings"""
+    # Columns of a borrow history record, see _borrow_record
+    BORROW_HISTORY_COLUMNS = """
+        SELECT u.username, b.title, bb.borrowed_date, bb.due_date, bb.returned,
+               bb.return_date, bb.fine_amount, bb.id
+        FROM borrowed_books bb
+        JOIN users u ON u.id = bb.user_id
+        JOIN books b ON b.id = bb.book_id
+    """
+
+    @staticmethod
+    def _borrow_history_filter(start=None, end=None, student=None, title=None):
+        """
+        WHERE conditions and params for the borrow history filters
+
+        start and end are dates, both inclusive; student and title match a
+        username and a book title exactly.
+        """
+        conditions, params = [], []
+        if start is not None:
+            conditions.append("bb.borrowed_date >= %s")
+            params.append(start)
+        if end is not None:
+            conditions.append("bb.borrowed_date < %s")
+            params.append(end + timedelta(days=1))
+        if student:
+            conditions.append("u.username = %s")
+            params.append(student)
+        if title:
+            conditions.append("b.title = %s")
+            params.append(title)
+        return conditions, tuple(params)
+
+    @staticmethod
+    def _borrow_record(row, today):
+        student_name, book_title, borrowed_date, due_date, returned, return_date, fine_amount = row[:7]
+        if returned:
+            status = "Returned"
+        elif due_date < today:
+            status = f"Overdue ({(today - due_date).days}d)"
+        else:
+            status = "Active"
+        return {
+            'student': student_name,
+            'book': book_title,
+            'borrowed_date': borrowed_date,
+            'due_date': due_date,
+            'status': status,
+            'return_date': return_date if returned else None,
+            'fine': fine_amount or 0
+        }
+
+    def iter_borrow_history(self, start=None, end=None, student=None, title=None,
+                            batch_size=STREAM_BATCH_SIZE):
+        """
+        Yield borrow records newest first, streamed from the database.
+
+        Memory holds one batch of rows whatever the size of the history.
+        Close the generator (or exhaust it) to release its connection.
+        """
+        conditions, params = self._borrow_history_filter(start, end, student, title)
+        query = self.BORROW_HISTORY_COLUMNS
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY bb.borrowed_date DESC, bb.id DESC"
+        
+        today = date.today()
         try:
-            query = """
-            SELECT student_name, book_title, borrowed_date, due_date, returned, return_date, fine_amount,
-                   DATEDIFF(CURDATE(), due_date) as days_overdue
-            FROM borrowed_books 
-            ORDER BY borrowed_date DESC
-            """
-            self.db.cursor.execute(query)
-            logs = self.db.cursor.fetchall()
-            
-            result = []
-            total_fines = 0
-            
-            for record in logs:
-                student_name, book_title, borrowed_date, due_date, returned, return_date, fine_amount, days_overdue = record
-                
-                # Calculate status
-                if returned:
-                    status = "Returned"
-                    return_str = return_date.strftime('%Y-%m-%d %H:%M') if return_date else "N/A"
-                else:
-                    if days_overdue and days_overdue > 0:
-                        status = f"Overdue ({days_overdue}d)"
-                    else:
-                        status = "Active"
-                    return_str = "N/A"
-                
-                total_fines += fine_amount or 0
-                
-                result.append({
-                    'student': student_name,
-                    'book': book_title,
-                    'borrowed_date': borrowed_date.strftime('%Y-%m-%d %H:%M'),
-                    'due_date': due_date.strftime('%Y-%m-%d'),
-                    'status': status,
-                    'return_date': return_str,
-                    'fine': fine_amount or 0
-                })
-            
-            return {'logs': result, 'total_fines': total_fines}
-                
+            for row in self.db.stream(query, params, batch_size):
+                yield self._borrow_record(row, today)
+        except Error as e:
+            raise Exception(f"Error getting borrow logs: {e}")
+
+    def get_borrow_history_page(self, page_size=PAGE_SIZE, after=None,
+                                start=None, end=None, student=None, title=None):
+        """
+        One page of the borrow history, newest first: {'logs': [...], 'next': key}
+
+        Pass the previous page's 'next' as after (None for the first page).
+        """
+        conditions, params = self._borrow_history_filter(start, end, student, title)
+        if after is not None:
+            conditions.append("(bb.borrowed_date < %s OR (bb.borrowed_date = %s AND bb.id < %s))")
+            params += (after[0], after[0], after[1])
+        query = self.BORROW_HISTORY_COLUMNS
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY bb.borrowed_date DESC, bb.id DESC"
+        
+        try:
+            rows, next_key = self._page(query, params, page_size, lambda row: (row[2], row[7]))
         except Error as e:
             raise Exception(f"Error getting borrow logs: {e}")
+        today = date.today()
+        return {'logs': [self._borrow_record(row, today) for row in rows], 'next': next_key}
+
+    def get_borrow_fines_total(self, start=None, end=None, student=None, title=None):
+        """Sum of the fines in the filtered borrow history"""
+        conditions, params = self._borrow_history_filter(start, end, student, title)
+        query = "SELECT COALESCE(SUM(bb.fine_amount), 0) FROM borrowed_books bb"
+        if student:
+            query += " JOIN users u ON u.id = bb.user_id"
+        if title:
+            query += " JOIN books b ON b.id = bb.book_id"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        try:
+            with self.db.session() as cursor:
+                cursor.execute(query, params)
+                return cursor.fetchone()[0]
+        except Error as e:
+            raise Exception(f"Error getting borrow logs: {e}")
+
+    def borrow_history(self, start=None, end=None, student=None, title=None):
+        """
+        Borrowing history, optionally filtered by borrow date range, student and title
+
+        Returns a BorrowHistory: nothing is read until it is iterated or paged.
+        """
+        return BorrowHistory(self, start=start, end=end, student=student, title=title)
+
+    def getBorrowLogs(self, start=None, end=None, student=None, title=None):
+        """
+        Get complete history of all book borrowings, with borrow_history's filters
+
+        Returns {'logs': [...], 'total_fines': ...} with dates formatted as
+        text. Every record is loaded; borrow_history() streams or pages them.
+        """
+        logs = []
+        total_fines = 0
+        for record in self.iter_borrow_history(start, end, student, title):
+            total_fines += record['fine']
+            logs.append(dict(record,
+                             borrowed_date=record['borrowed_date'].strftime('%Y-%m-%d %H:%M'),
+                             due_date=record['due_date'].strftime('%Y-%m-%d'),
+                             return_date=record['return_date'].strftime('%Y-%m-%d %H:%M')
+                             if record['return_date'] else "N/A"))
+        return {'logs': logs, 'total_fines': total_fines}
 
     def trackBooks(self):
         """Track all borrowed books from database"""
         try:
             query = """
-            SELECT student_name, book_title, borrowed_date, due_date,
-                   DATEDIFF(CURDATE(), due_date) as days_overdue
-            FROM borrowed_books 
-            WHERE returned = FALSE
-            ORDER BY due_date
+            SELECT u.username, b.title, bb.borrowed_date, bb.due_date,
+                   DATEDIFF(CURDATE(), bb.due_date) as days_overdue
+            FROM borrowed_books bb
+            JOIN users u ON u.id = bb.user_id
+            JOIN books b ON b.id = bb.book_id
+            WHERE bb.returned = FALSE
+            ORDER BY bb.due_date
             """
-            self.db.cursor.execute(query)
-            borrowed_books = self.db.cursor.fetchall()
+            with self.db.session() as cursor:
+                cursor.execute(query)
+                borrowed_books = cursor.fetchall()
             
             result = []
             for record in borrowed_books:
@@ -646,22 +2184,110 @@ class Library:
         except Error as e:
             raise Exception(f"Error tracking books: {e}")
 
-    def getUserLogs(self, username):
-        """Get complete borrowing history for a specific user"""
-        pass
+    def getUserLogs(self, username, page_size=PAGE_SIZE, after=None):
+        """
+        Borrowing history of one user: open loans first, then returned ones, newest first
+
+        Returns {'user': summary, 'logs': [...], 'next': key}; pass 'next' as
+        after for the following page (None on the last page). The summary
+        (total borrowed, fines, on-time rate) comes from the totals kept on
+        the user row, so no page needs to read the whole history.
+        """
+        try:
+            with self.db.session() as cursor:
+                cursor.execute("""
+                    SELECT id, username, full_name, status, active_loans,
+                           total_borrowed, returned_on_time, total_fines
+                    FROM users WHERE username = %s
+                """, (username,))
+                user = cursor.fetchone()
+            if not user:
+                raise Exception(f"User '{username}' is not registered in the system.")
+            user_id, stored_username, full_name, status, active_loans, total_borrowed, on_time, fines = user
+            returned_count = total_borrowed - active_loans
+            summary = {
+                'username': stored_username,
+                'full_name': full_name,
+                'status': status,
+                'active_books': active_loans,
+                'total_borrowed': total_borrowed,
+                'returned': returned_count,
+                'returned_on_time': on_time,
+                'on_time_rate': on_time / returned_count if returned_count > 0 else None,
+                'total_fines': fines or 0
+            }
+            
+            # Two index range reads: open loans (returned = FALSE), then returned ones
+            returned, position = (False, None) if after is None else (after[0], after[1:])
+            rows, next_key = [], None
+            for phase in (False, True):
+                if phase < returned:
+                    continue
+                remaining = page_size - len(rows)
+                if remaining == 0:
+                    # Page filled by the open loans: only point at the history if it has a row
+                    with self.db.session() as cursor:
+                        cursor.execute("SELECT 1 FROM borrowed_books WHERE user_id = %s AND returned = %s "
+                                       "LIMIT 1", (user_id, phase))
+                        if cursor.fetchone():
+                            next_key = (phase, None, None)
+                    break
+                query = self.BORROW_HISTORY_COLUMNS + " WHERE bb.user_id = %s AND bb.returned = %s"
+                params = (user_id, phase)
+                if phase == returned and position and position[0] is not None:
+                    query += " AND (bb.borrowed_date < %s OR (bb.borrowed_date = %s AND bb.id < %s))"
+                    params += (position[0], position[0], position[1])
+                query += " ORDER BY bb.borrowed_date DESC, bb.id DESC"
+                page, next_key = self._page(query, params, remaining,
+                                            lambda row: (bool(row[4]), row[2], row[7]))
+                rows += page
+                if next_key is not None:
+                    break
+            
+            today = date.today()
+            return {
+                'user': summary,
+                'logs': [self._borrow_record(row, today) for row in rows],
+                'next': next_key
+            }
+            
+        except Error as e:
+            raise Exception(f"Error getting user logs: {e}")
 
     def add_book_review(self, username, book_title, rating, review_text=None):
         """Add a review and rating for a book"""
         try:
             if not 1 <= rating <= 5:
                 return "Rating must be between 1 and 5!"
-            
-            insert_query = """
-                INSERT INTO book_reviews (book_title, username, rating, review_text)
-                VALUES (%s, %s, %s, %s)
-            """
-            self.db.cursor.execute(insert_query, (book_title, username, rating, review_text))
-            self.db.connection.commit()
+            rating = int(rating)
+            
+            with self.db.transaction() as cursor:
+                cursor.execute("""
+                    SELECT b.id, u.id FROM books b JOIN users u ON u.username = %s
+                    WHERE b.title = %s
+                """, (username, book_title))
+                ids = cursor.fetchone()
+                if not ids:
+                    return f"Error adding review: unknown book '{book_title}' or user '{username}'"
+                book_id, user_id = ids
+                
+                insert_query = """
+                    INSERT INTO book_reviews (book_id, user_id, rating, review_text)
+                    VALUES (%s, %s, %s, %s)
+                """
+                cursor.execute(insert_query, (book_id, user_id, rating, review_text))
+                
+                # Same transaction: the stats row can't miss or double-count a review.
+                # avg_rating is assigned first because MySQL applies SET left to right.
+                cursor.execute("INSERT IGNORE INTO book_rating_stats (book_id) VALUES (%s)", (book_id,))
+                cursor.execute(f"""
+                    UPDATE book_rating_stats
+                    SET avg_rating = (rating_sum + %s) * 1.0 / (review_count + 1),
+                        review_count = review_count + 1,
+                        rating_sum = rating_sum + %s,
+                        rating_{rating} = rating_{rating} + 1
+                    WHERE book_id = %s
+                """, (rating, rating, book_id))
             return True
         except Error as e:
             return f"Error adding review: {str(e)}"
@@ -670,49 +2296,83 @@ class Library:
         """Get all reviews for a specific book"""
         try:
             query = """
-                SELECT username, rating, review_text, review_date
-                FROM book_reviews
-                WHERE book_title = %s
-                ORDER BY review_date DESC
+                SELECT u.username, r.rating, r.review_text, r.review_date
+                FROM book_reviews r
+                JOIN books b ON b.id = r.book_id
+                JOIN users u ON u.id = r.user_id
+                WHERE b.title = %s
+                ORDER BY r.review_date DESC
             """
-            self.db.cursor.execute(query, (book_title,))
-            reviews = self.db.cursor.fetchall()
+            with self.db.session() as cursor:
+                cursor.execute(query, (book_title,))
+                reviews = cursor.fetchall()
             return reviews
         except Error as e:
             return []
 
     def get_top_rated_books(self, limit=5):
-        """Get top rated books with their average ratings"""
+        """Get top rated books with their average ratings (read from book_rating_stats)"""
         try:
             query = """
-                SELECT b.title, b.author, b.category,
-                    AVG(r.rating) as avg_rating,
-                    COUNT(r.id) as num_reviews
-                FROM books b
-                LEFT JOIN book_reviews r ON b.title = r.book_title
-                GROUP BY b.title, b.author, b.category
-                HAVING num_reviews > 0
-                ORDER BY avg_rating DESC, num_reviews DESC
+                SELECT b.title, b.author, b.category, s.avg_rating, s.review_count
+                FROM book_rating_stats s
+                JOIN books b ON b.id = s.book_id
+                WHERE s.review_count > 0
+                ORDER BY s.avg_rating DESC, s.review_count DESC
                 LIMIT %s
             """
-            self.db.cursor.execute(query, (limit,))
-            return self.db.cursor.fetchall()
+            with self.db.session() as cursor:
+                cursor.execute(query, (limit,))
+                return cursor.fetchall()
         except Error as e:
             return []
 
+    def get_rating_stats(self, book_title):
+        """Review count, average rating and star histogram of a book (None if it has no reviews)"""
+        try:
+            query = """
+                SELECT s.review_count, s.avg_rating,
+                       s.rating_1, s.rating_2, s.rating_3, s.rating_4, s.rating_5
+                FROM book_rating_stats s JOIN books b ON b.id = s.book_id
+                WHERE b.title = %s
+            """
+            with self.db.session() as cursor:
+                cursor.execute(query, (book_title,))
+                row = cursor.fetchone()
+            if not row or not row[0]:
+                return None
+            return {
+                'reviews': row[0],
+                'average': float(row[1]),
+                'histogram': dict(zip(range(1, 6), row[2:]))
+            }
+        except Error as e:
+            raise Exception(f"Error fetching rating statistics: {e}")
+
+    def rebuild_rating_stats(self):
+        """Recompute book_rating_stats from book_reviews (after reviews changed outside Library)"""
+        try:
+            with self.db.transaction() as cursor:
+                return _rebuild_rating_stats(cursor)
+        except Error as e:
+            raise Exception(f"Error rebuilding rating statistics: {e}")
+
     def getOverdueBooks(self):
         """Get all overdue books"""
         try:
             query = """
-            SELECT student_name, book_title, borrowed_date, due_date,
-                   DATEDIFF(CURDATE(), due_date) as days_overdue,
-                   (DATEDIFF(CURDATE(), due_date) * 5) as fine_amount
-            FROM borrowed_books 
-            WHERE returned = FALSE AND due_date < CURDATE()
+            SELECT u.username, b.title, bb.borrowed_date, bb.due_date,
+                   DATEDIFF(CURDATE(), bb.due_date) as days_overdue,
+                   (DATEDIFF(CURDATE(), bb.due_date) * 5) as fine_amount
+            FROM borrowed_books bb
+            JOIN users u ON u.id = bb.user_id
+            JOIN books b ON b.id = bb.book_id
+            WHERE bb.returned = FALSE AND bb.due_date < CURDATE()
             ORDER BY days_overdue DESC
             """
-            self.db.cursor.execute(query)
-            overdue_books = self.db.cursor.fetchall()
+            with self.db.session() as cursor:
+                cursor.execute(query)
+                overdue_books = cursor.fetchall()
             
             result = []
             total_fine = 0
@@ -738,109 +2398,101 @@ class Library:
     def removeBook(self, title):
         """Remove a book from the library"""
         try:
-            # First check if book exists
-            check_query = "SELECT * FROM books WHERE title = %s"
-            self.db.cursor.execute(check_query, (title,))
-            book = self.db.cursor.fetchone()
-            
-            if not book:
-                return False, "Book not found"
+            with self.db.transaction() as cursor:
+                # First check if book exists
+                check_query = ("SELECT id, title, total_copies, available_copies "
+                               "FROM books WHERE title = %s FOR UPDATE")
+                cursor.execute(check_query, (title,))
+                book = cursor.fetchone()
                 
-            # Check if any copies are borrowed
-            check_borrowed = "SELECT COUNT(*) FROM borrowed_books WHERE book_title = %s AND returned = FALSE"
-            self.db.cursor.execute(check_borrowed, (title,))
-            borrowed_count = self.db.cursor.fetchone()[0]
-            
-            if borrowed_count > 0:
-                return False, "Cannot remove book - some copies are currently borrowed"
-            
-            try:
-                # Explicitly disable autocommit and handle transaction manually
-                self.db.connection.autocommit = False
-                
-                # First delete any existing reviews
-                self.db.cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
-                self.db.cursor.execute("DELETE FROM book_reviews WHERE book_title = %s", (title,))
-                
-                # Then delete borrow history
-                self.db.cursor.execute("DELETE FROM borrowed_books WHERE book_title = %s", (title,))
-                
-                # Finally delete the book
-                self.db.cursor.execute("DELETE FROM books WHERE title = %s", (title,))
-                self.db.cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
-                
-                # Commit all changes
-                self.db.connection.commit()
-                
-                # Re-enable autocommit
-                self.db.connection.autocommit = True
+                if not book:
+                    return False, "Book not found"
+                book_id, stored_title, total_copies, available_copies = book
+                    
+                # Check if any copies are borrowed
+                check_borrowed = "SELECT COUNT(*) FROM borrowed_books WHERE book_id = %s AND returned = FALSE"
+                cursor.execute(check_borrowed, (book_id,))
+                borrowed_count = cursor.fetchone()[0]
                 
-                return True, "Book successfully removed"
+                if borrowed_count > 0:
+                    return False, "Cannot remove book - some copies are currently borrowed"
                 
-            except Error as e:
-                print(f"Error during book removal: {str(e)}")  # Debug log
-                # Ensure rollback
-                try:
-                    self.db.connection.rollback()
-                except Error as rollback_error:
-                    print(f"Rollback error: {str(rollback_error)}")  # Debug log
+                # The book's loan history goes too: take it out of the borrowers' totals
+                cursor.execute("""
+                    SELECT user_id, COUNT(*),
+                           SUM(CASE WHEN returned = TRUE AND DATE(return_date) <= due_date
+                                    THEN 1 ELSE 0 END),
+                           COALESCE(SUM(fine_amount), 0)
+                    FROM borrowed_books WHERE book_id = %s GROUP BY user_id
+                """, (book_id,))
+                history = cursor.fetchall()
+                if history:
+                    cursor.executemany("""
+                        UPDATE users SET total_borrowed = total_borrowed - %s,
+                                         returned_on_time = returned_on_time - %s,
+                                         total_fines = total_fines - %s
+                        WHERE id = %s
+                    """, [(count, on_time, fines, user_id) for user_id, count, on_time, fines in history])
                 
-                # Re-enable foreign key checks and autocommit in case of error
-                try:
-                    self.db.cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
-                    self.db.connection.autocommit = True
-                except Error as cleanup_error:
-                    print(f"Cleanup error: {str(cleanup_error)}")  # Debug log
-                
-                return False, f"Database error: {str(e)}"
+                # Children first, so no foreign key is ever violated
+                cursor.execute("DELETE FROM book_rating_stats WHERE book_id = %s", (book_id,))
+                cursor.execute("DELETE FROM book_reviews WHERE book_id = %s", (book_id,))
+                cursor.execute("DELETE FROM borrowed_books WHERE book_id = %s", (book_id,))
+                cursor.execute("DELETE FROM books WHERE id = %s", (book_id,))
+                _bump_counters(cursor, book_id, unique_books=-1, total_copies=-total_copies,
+                               available_copies=-available_copies)
+            
+            if self.catalog is not None:
+                self.catalog.remove(book_id)
+            self._publish_changes([{'table': 'books', 'action': 'delete', 'key': stored_title, 'row': None}])
+            
+            return True, "Book successfully removed"
                 
         except Error as e:
-            print(f"Outer error during book removal: {str(e)}")  # Debug log
-            # Final safety cleanup
-            try:
-                self.db.cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
-                self.db.connection.autocommit = True
-            except:
-                pass
+            print(f"Error during book removal: {str(e)}")  # Debug log
             return False, f"Failed to remove book: {str(e)}"
 
     def editBook(self, old_title, new_title, new_author, new_category, new_total_copies):
         """Edit book details"""
         try:
-            # Check if book exists
-            check_query = "SELECT available_copies, total_copies FROM books WHERE title = %s"
-            self.db.cursor.execute(check_query, (old_title,))
-            book = self.db.cursor.fetchone()
-            
-            if not book:
-                return False, "Book not found"
-            
-            available_copies, total_copies = book
-            borrowed_copies = total_copies - available_copies
-            
-            if new_total_copies < borrowed_copies:
-                return False, f"Cannot reduce total copies below borrowed copies ({borrowed_copies})"
-            
-            # Calculate new available copies
-            new_available_copies = new_total_copies - borrowed_copies
-            
-            # Update the book details
-            update_query = """
-                UPDATE books 
-                SET title = %s, author = %s, category = %s, 
-                    total_copies = %s, available_copies = %s 
-                WHERE title = %s
-            """
-            self.db.cursor.execute(update_query, 
-                (new_title, new_author, new_category, 
-                 new_total_copies, new_available_copies, old_title))
-            
-            # Update borrowed_books table if title changed
-            if old_title != new_title:
-                update_borrowed = "UPDATE borrowed_books SET book_title = %s WHERE book_title = %s"
-                self.db.cursor.execute(update_borrowed, (new_title, old_title))
+            with self.db.transaction() as cursor:
+                # Check if book exists
+                check_query = "SELECT id, title, available_copies, total_copies FROM books WHERE title = %s FOR UPDATE"
+                cursor.execute(check_query, (old_title,))
+                book = cursor.fetchone()
+                
+                if not book:
+                    return False, "Book not found"
+                
+                book_id, stored_title, available_copies, total_copies = book
+                borrowed_copies = total_copies - available_copies
+                
+                if new_total_copies < borrowed_copies:
+                    return False, f"Cannot reduce total copies below borrowed copies ({borrowed_copies})"
+                
+                # Calculate new available copies
+                new_available_copies = new_total_copies - borrowed_copies
+                
+                # Update the book details; loans and reviews reference book_id,
+                # so a title change touches this row only
+                update_query = """
+                    UPDATE books 
+                    SET title = %s, author = %s, category = %s, 
+                        total_copies = %s, available_copies = %s 
+                    WHERE id = %s
+                """
+                cursor.execute(update_query, 
+                    (new_title, new_author, new_category, 
+                     new_total_copies, new_available_copies, book_id))
+                _bump_counters(cursor, book_id, total_copies=new_total_copies - total_copies,
+                               available_copies=new_available_copies - available_copies)
+                changes = [self._book_change(cursor, book_id, stored_title)] if self.change_listeners else []
+            
+            if self.catalog is not None:
+                self.catalog.add(book_id, new_title, new_author, new_category,
+                                 new_available_copies, new_total_copies)
+            self._publish_changes(changes)
             
-            self.db.connection.commit()
             return True, "Book details updated successfully"
             
         except Error as e:
@@ -849,29 +2501,45 @@ class Library:
     def addNewBook(self, title, author, category, copies=1):
         """Add a new book to the library"""
         try:
-            # Check if book already exists
-            check_query = "SELECT COUNT(*) FROM books WHERE title = %s"
-            self.db.cursor.execute(check_query, (title,))
-            
-            if self.db.cursor.fetchone()[0] > 0:
-                # Book exists, update copies
-                update_query = """
-                UPDATE books 
-                SET total_copies = total_copies + %s, available_copies = available_copies + %s
-                WHERE title = %s
-                """
-                self.db.cursor.execute(update_query, (copies, copies, title))
-                print(f"✅ Added {copies} more copies of '{title}' to the library!\n")
-            else:
-                # New book
-                insert_query = """
-                INSERT INTO books (title, author, category, total_copies, available_copies) 
-                VALUES (%s, %s, %s, %s, %s)
-                """
-                self.db.cursor.execute(insert_query, (title, author, category, copies, copies))
-                print(f"✅ New book '{title}' by {author} added to the library!\n")
+            with self.db.transaction() as cursor:
+                # Check if book already exists
+                check_query = "SELECT id FROM books WHERE title = %s"
+                cursor.execute(check_query, (title,))
+                book = cursor.fetchone()
+                
+                if book:
+                    # Book exists, update copies
+                    book_id = book[0]
+                    update_query = """
+                    UPDATE books 
+                    SET total_copies = total_copies + %s, available_copies = available_copies + %s
+                    WHERE id = %s
+                    """
+                    cursor.execute(update_query, (copies, copies, book_id))
+                    _bump_counters(cursor, book_id, total_copies=copies, available_copies=copies)
+                    print(f"✅ Added {copies} more copies of '{title}' to the library!\n")
+                else:
+                    # New book
+                    insert_query = """
+                    INSERT INTO books (title, author, category, total_copies, available_copies) 
+                    VALUES (%s, %s, %s, %s, %s)
+                    """
+                    cursor.execute(insert_query, (title, author, category, copies, copies))
+                    book_id = cursor.lastrowid
+                    _bump_counters(cursor, book_id, unique_books=1, total_copies=copies,
+                                   available_copies=copies)
+                    print(f"✅ New book '{title}' by {author} added to the library!\n")
+                if self.change_listeners:
+                    changes = [self._book_change(cursor, book_id, action='update' if book else 'insert')]
+                else:
+                    changes = []
             
-            self.db.connection.commit()
+            if self.catalog is not None:
+                if book:
+                    self.catalog.adjust_copies(book_id, copies, copies)
+                else:
+                    self.catalog.add(book_id, title, author, category, copies, copies)
+            self._publish_changes(changes)
             
         except Error as e:
             print(f"Error adding book: {e}")
@@ -879,132 +2547,156 @@ class Library:
     def removeUser(self, username):
         """Remove a user from the system"""
         try:
-            # Check if user exists
-            check_user = "SELECT COUNT(*) FROM users WHERE username = %s"
-            self.db.cursor.execute(check_user, (username,))
-            if self.db.cursor.fetchone()[0] == 0:
-                return False, f"User '{username}' not found in the system."
-
-            # Check if user has any borrowed books
-            check_borrowed = """
-            SELECT COUNT(*) FROM borrowed_books 
-            WHERE student_name = %s AND returned = FALSE
-            """
-            self.db.cursor.execute(check_borrowed, (username,))
-            active_books = self.db.cursor.fetchone()[0]
-            
-            if active_books > 0:
-                return False, f"Cannot remove user '{username}'. They have {active_books} borrowed books. Please ensure all books are returned first."
+            with self.db.transaction() as cursor:
+                # Check if user exists
+                check_user = "SELECT id, username FROM users WHERE username = %s FOR UPDATE"
+                cursor.execute(check_user, (username,))
+                user = cursor.fetchone()
+                if not user:
+                    return False, f"User '{username}' not found in the system."
+                user_id, stored_username = user
+
+                # Check if user has any borrowed books
+                check_borrowed = """
+                SELECT COUNT(*) FROM borrowed_books 
+                WHERE user_id = %s AND returned = FALSE
+                """
+                cursor.execute(check_borrowed, (user_id,))
+                active_books = cursor.fetchone()[0]
+                
+                if active_books > 0:
+                    return False, f"Cannot remove user '{username}'. They have {active_books} borrowed books. Please ensure all books are returned first."
+                
+                # Delete user from the users table
+                delete_query = "DELETE FROM users WHERE id = %s"
+                cursor.execute(delete_query, (user_id,))
             
-            # Delete user from the users table
-            delete_query = "DELETE FROM users WHERE username = %s"
-            self.db.cursor.execute(delete_query, (username,))
-            self.db.connection.commit()
+            if self.usernames is not None:
+                self.usernames.remove(username)
+            self._publish_changes([{'table': 'users', 'action': 'delete', 'key': stored_username, 'row': None}])
             
             return True, f"User '{username}' has been successfully removed from the system."
             
         except Error as e:
             return False, f"Error removing user: {e}"
 
-    def generateReports(self):
-        """Generate library statistics and reports"""
+    def set_user_status(self, username, status):
+        """Activate, suspend or deactivate a user account"""
+        if status not in USER_STATUSES:
+            return False, f"Invalid status '{status}' (choose from {', '.join(USER_STATUSES)})"
         try:
-            report_data = {}
-            
-            # Total books
-            self.db.cursor.execute("SELECT COUNT(*), SUM(total_copies) FROM books")
-            unique_books, total_copies = self.db.cursor.fetchone()
-            total_copies = total_copies or 0
-            
-            # Available books
-            self.db.cursor.execute("SELECT SUM(available_copies) FROM books")
-            available_copies = self.db.cursor.fetchone()[0] or 0
-            
-            report_data['summary'] = {
-                'unique_books': unique_books,
-                'total_copies': total_copies,
-                'available_copies': available_copies,
-                'borrowed_copies': total_copies - available_copies
-            }
+            with self.db.transaction() as cursor:
+                cursor.execute("""
+                SELECT id, username, full_name, class, section, active_loans
+                FROM users WHERE username = %s FOR UPDATE
+                """, (username,))
+                user = cursor.fetchone()
+                if not user:
+                    return False, f"User '{username}' not found in the system."
+                user_id, stored_username, full_name, class_name, section, active_loans = user
+                
+                cursor.execute("UPDATE users SET status = %s WHERE id = %s", (status, user_id))
             
-            # Most popular books
-            popular_query = """
-            SELECT book_title, COUNT(*) as borrow_count
-            FROM borrowed_books
-            GROUP BY book_title
-            ORDER BY borrow_count DESC
-            LIMIT 5
-            """
-            self.db.cursor.execute(popular_query)
-            popular_books = self.db.cursor.fetchall()
-            report_data['popular_books'] = [
-                {'title': title, 'count': count}
-                for title, count in popular_books
-            ]
-            
-            # Active borrowers
-            active_query = """
-            SELECT student_name, COUNT(*) as active_books
-            FROM borrowed_books
-            WHERE returned = FALSE
-            GROUP BY student_name
-            ORDER BY active_books DESC
+            self._publish_changes([{'table': 'users', 'action': 'update', 'key': stored_username, 'row': {
+                'username': stored_username,
+                'full_name': full_name,
+                'class': class_name or "N/A",
+                'section': section or "N/A",
+                'status': status,
+                'active_books': active_loans
+            }}])
+            return True, f"User '{username}' is now {status}."
+            
+        except Error as e:
+            return False, f"Error updating user status: {e}"
+
+    def reconcile_active_loans(self):
+        """
+        Recount every user's active_loans from the open loans and fix any drift
+
+        borrowBook and returnBook keep the counter in step; run this after
+        loans were changed outside Library (e.g. an Excel import). Returns
+        the usernames that were corrected.
+        """
+        try:
+            with self.db.transaction() as cursor:
+                corrected = _reconcile_active_loans(cursor)
+            return corrected
+            
+        except Error as e:
+            raise Exception(f"Error reconciling active loans: {e}")
+
+    def generateReports(self):
+        """
+        Generate library statistics and reports
+
+        Reads the materialized counters (library_counters, books.borrow_count,
+        users.active_loans) in one round trip instead of scanning books and the
+        whole loan history.
+        """
+        try:
+            report_query = """
+            SELECT 'summary', name, SUM(value) FROM library_counters GROUP BY name
+            UNION ALL
+            SELECT 'popular', title, borrow_count FROM (
+                SELECT title, borrow_count FROM books
+                WHERE borrow_count > 0 ORDER BY borrow_count DESC LIMIT 5
+            ) popular
+            UNION ALL
+            SELECT 'active', username, active_loans FROM users WHERE active_loans > 0
             """
-            self.db.cursor.execute(active_query)
-            active_borrowers = self.db.cursor.fetchall()
-            report_data['active_borrowers'] = [
-                {'name': name, 'books': count}
-                for name, count in active_borrowers
-            ]
+            with self.db.session() as cursor:
+                cursor.execute(report_query)
+                rows = cursor.fetchall()
+            
+            sections = {'summary': [], 'popular': [], 'active': []}
+            for section, name, value in rows:
+                sections[section].append((name, int(value)))
+            
+            summary = dict.fromkeys(REPORT_COUNTERS, 0)
+            summary.update(sections['summary'])
+            report_data = {
+                'summary': {
+                    'unique_books': summary['unique_books'],
+                    'total_copies': summary['total_copies'],
+                    'available_copies': summary['available_copies'],
+                    'borrowed_copies': summary['total_copies'] - summary['available_copies']
+                },
+                # UNION ALL doesn't keep the inner ORDER BY, so rank here
+                'popular_books': [
+                    {'title': title, 'count': count}
+                    for title, count in sorted(sections['popular'], key=lambda row: -row[1])
+                ],
+                'active_borrowers': [
+                    {'name': name, 'books': count}
+                    for name, count in sorted(sections['active'], key=lambda row: -row[1])
+                ]
+            }
             
             return report_data
             
         except Error as e:
             raise Exception(f"Error generating reports: {e}")
 
+    def rebuild_report_counters(self):
+        """
+        Recompute the report counters and per-user loan totals from books and borrowed_books
 
-
-def editBook(self, old_title, new_title, new_author, new_category, new_total_copies):
-    """Edit book details"""
-    try:
-        # Check if book exists
-        check_query = "SELECT available_copies, total_copies FROM books WHERE title = %s"
-        self.db.cursor.execute(check_query, (old_title,))
-        book = self.db.cursor.fetchone()
-        
-        if not book:
-            return False, "Book not found"
-        
-        available_copies, total_copies = book
-        borrowed_copies = total_copies - available_copies
-        
-        if new_total_copies < borrowed_copies:
-            return False, f"Cannot reduce total copies below borrowed copies ({borrowed_copies})"
-        
-        # Calculate new available copies
-        new_available_copies = new_total_copies - borrowed_copies
-        
-        # Update the book details
-        update_query = """
-            UPDATE books 
-            SET title = %s, author = %s, category = %s, 
-                total_copies = %s, available_copies = %s 
-            WHERE title = %s
+        Use after data was changed outside Library (Excel import, manual SQL).
+        Returns the recomputed totals plus the usernames whose active_loans
+        had drifted.
         """
-        self.db.cursor.execute(update_query, 
-            (new_title, new_author, new_category, 
-             new_total_copies, new_available_copies, old_title))
-        
-        # Update borrowed_books table if title changed
-        if old_title != new_title:
-            update_borrowed = "UPDATE borrowed_books SET book_title = %s WHERE book_title = %s"
-            self.db.cursor.execute(update_borrowed, (new_title, old_title))
-        
-        self.db.connection.commit()
-        return True, "Book details updated successfully"
-        
-    except Error as e:
-        return False, f"Failed to update book details: {str(e)}"
+        try:
+            with self.db.transaction() as cursor:
+                totals = _rebuild_report_counters(cursor)
+                totals['corrected_users'] = _reconcile_active_loans(cursor)
+                _rebuild_user_loan_stats(cursor)
+            return totals
+            
+        except Error as e:
+            raise Exception(f"Error rebuilding report counters: {e}")
+
+
 class Student():
     def registerUser(self):
         """Register a new user"""
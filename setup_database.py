@@ -5,6 +5,7 @@ Run this script to create the database and test the connection
 
 import mysql.connector
 from mysql.connector import Error
+from lib import DatabaseConnection, LATEST_SCHEMA_VERSION
 
 def create_database():
     """Create the library_management database"""
@@ -44,131 +45,24 @@ def create_database():
 
 def test_connection_and_create_tables():
     """Test connection and create all necessary tables"""
+    db = DatabaseConnection()
     try:
-        connection = mysql.connector.connect(
-            host='localhost',
-            database='library_management',
-            user='root',
-            password=''  # Change this if your MySQL has a password
-        )
+        # Creates the baseline tables and applies every schema migration
+        # (indexes, id-based foreign keys, default categories). Safe to re-run:
+        # nothing is dropped and an up-to-date database is left untouched.
+        print("\n📋 Creating database tables...")
+        if not db.connect(host='localhost', database='library_management',
+                          user='root', password=''):  # Change this if your MySQL has a password
+            raise Error(msg="Could not connect to 'library_management'")
         
-        if connection.is_connected():
-            print("✅ Successfully connected to library_management database!")
-            
-            cursor = connection.cursor()
+        print("✅ Successfully connected to library_management database!")
+        print(f"   ✅ Schema version {db.schema_version()} (latest {LATEST_SCHEMA_VERSION})")
+        
+        with db.session() as cursor:
             cursor.execute("SELECT VERSION()")
             version = cursor.fetchone()
             print(f"🔌 MySQL version: {version[0]}")
             
-            # Create all tables
-            print("\n📋 Creating database tables...")
-            
-            # Books table with enhanced fields
-            books_table = """
-            CREATE TABLE IF NOT EXISTS books (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                title VARCHAR(255) NOT NULL UNIQUE,
-                available BOOLEAN DEFAULT TRUE,
-                total_copies INT DEFAULT 1,
-                available_copies INT DEFAULT 1,
-                category VARCHAR(100) DEFAULT 'General',
-                author VARCHAR(255),
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            """
-            
-            # Borrowed books table with due dates and fines
-            borrowed_table = """
-            CREATE TABLE IF NOT EXISTS borrowed_books (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                student_name VARCHAR(255) NOT NULL,
-                book_title VARCHAR(255) NOT NULL,
-                borrowed_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                due_date DATE NOT NULL,
-                returned BOOLEAN DEFAULT FALSE,
-                return_date TIMESTAMP NULL,
-                fine_amount DECIMAL(10,2) DEFAULT 0.00,
-                FOREIGN KEY (book_title) REFERENCES books(title)
-            )
-            """
-            
-            # Users table for user management
-            users_table = """
-            CREATE TABLE IF NOT EXISTS users (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                username VARCHAR(255) NOT NULL UNIQUE,
-                full_name VARCHAR(255) NOT NULL,
-                email VARCHAR(255),
-                phone VARCHAR(15),
-                class VARCHAR(50),
-                section VARCHAR(10),
-                registration_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                status ENUM('active', 'suspended', 'inactive') DEFAULT 'active'
-            )
-            """
-            
-            # Book categories table
-            categories_table = """
-            CREATE TABLE IF NOT EXISTS book_categories (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                category_name VARCHAR(100) NOT NULL UNIQUE,
-                description TEXT
-            )
-            """
-
-            # Book reviews table
-            reviews_table = """
-            CREATE TABLE IF NOT EXISTS book_reviews (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                book_title VARCHAR(255) NOT NULL,
-                username VARCHAR(255) NOT NULL,
-                rating INT NOT NULL CHECK (rating BETWEEN 1 AND 5),
-                review_text TEXT,
-                review_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (book_title) REFERENCES books(title),
-                FOREIGN KEY (username) REFERENCES users(username)
-            )
-            """
-            
-            # Execute table creation
-            cursor.execute(books_table)
-            print("   ✅ Books table created")
-            
-            cursor.execute(borrowed_table)
-            print("   ✅ Borrowed books table created")
-            
-            cursor.execute(users_table)
-            print("   ✅ Users table created")
-            
-            cursor.execute(categories_table)
-            print("   ✅ Book categories table created")
-
-            cursor.execute(reviews_table)
-            print("   ✅ Book reviews table created")
-            
-            # Insert default categories
-            categories = [
-                ('Fiction', 'Novels, short stories, and fictional works'),
-                ('Non-Fiction', 'Biographies, history, science, etc.'),
-                ('Science', 'Scientific books and research'),
-                ('Technology', 'Computer science, engineering, etc.'),
-                ('Literature', 'Classic literature and poetry'),
-                ('Economics', 'Economic theories and business'),
-                ('Education', 'Educational and academic books'),
-                ('General', 'General purpose books')
-            ]
-            
-            print("\n📚 Inserting default book categories...")
-            for category, description in categories:
-                check_query = "SELECT COUNT(*) FROM book_categories WHERE category_name = %s"
-                cursor.execute(check_query, (category,))
-                if cursor.fetchone()[0] == 0:
-                    insert_query = "INSERT INTO book_categories (category_name, description) VALUES (%s, %s)"
-                    cursor.execute(insert_query, (category, description))
-                    print(f"   ✅ Added category: {category}")
-            
-            connection.commit()
-            
             # Show table status
             print("\n📊 Database Tables Status:")
             cursor.execute("SHOW TABLES")
@@ -178,15 +72,14 @@ def test_connection_and_create_tables():
                 count = cursor.fetchone()[0]
                 print(f"   📁 {table[0]}: {count} records")
             
-            cursor.close()
-            connection.close()
-            
     except Error as e:
         print(f"❌ Connection failed: {e}")
         print("\n🔧 Please check:")
         print("1. MySQL service is running")
         print("2. Database 'library_management' exists")
         print("3. Username and password are correct")
+    finally:
+        db.close_connection()
 
 def verify_setup():
     """Verify the complete setup"""
@@ -204,7 +97,7 @@ def verify_setup():
             print("\n🔍 Verifying setup...")
             
             # Check required tables exist
-            required_tables = ['books', 'borrowed_books', 'users', 'book_categories']
+            required_tables = ['books', 'borrowed_books', 'users', 'book_categories', 'book_reviews', 'schema_version']
             cursor.execute("SHOW TABLES")
             existing_tables = [table[0] for table in cursor.fetchall()]
             
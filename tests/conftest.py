@@ -0,0 +1,27 @@
+"""
+Shared fixtures: a Library on a throwaway SQLite database file
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib import DatabaseConnection, Library
+
+
+@pytest.fixture
+def make_library(tmp_path):
+    """make_library(pool_size=None, **library_options) -> (db, library); closed after the test"""
+    opened = []
+
+    def make(pool_size=None, **library_options):
+        db = DatabaseConnection(pool_size=pool_size, backend='sqlite')
+        assert db.connect(database=str(tmp_path / 'library'))
+        opened.append(db)
+        return db, Library(db, **library_options)
+
+    yield make
+    for db in opened:
+        db.close_connection()
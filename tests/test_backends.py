@@ -0,0 +1,80 @@
+"""
+SQLite backend: SQL translation, upserts, EXPLAIN parsing and date columns
+"""
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from backends import MySQLBackend, SQLiteBackend, _SQLiteCursor
+
+
+@pytest.fixture
+def sqlite():
+    backend = SQLiteBackend(database=':memory:')
+    conn = backend.connect()
+    yield backend, conn, backend.cursor(conn)
+    conn.close()
+
+
+def test_translate():
+    translate = _SQLiteCursor.translate
+    assert translate("SELECT id FROM books WHERE title = %s AND author = %s") == \
+        "SELECT id FROM books WHERE title = ? AND author = ?"
+    assert translate("SELECT id FROM users WHERE id = %s FOR UPDATE").rstrip() == \
+        "SELECT id FROM users WHERE id = ?"
+    assert translate("INSERT IGNORE INTO book_categories (category_name) VALUES (%s)") == \
+        "INSERT OR IGNORE INTO book_categories (category_name) VALUES (?)"
+    # Only whole keywords are rewritten
+    assert translate("SELECT FOR_UPDATE_count FROM t") == "SELECT FOR_UPDATE_count FROM t"
+
+
+def test_upsert_sql(sqlite):
+    backend, conn, cursor = sqlite
+    query = backend.upsert_sql('books', ['id', 'title', 'author'], ['title', 'author'])
+    assert query == ('INSERT INTO "books" ("id","title","author") VALUES (%s,%s,%s) '
+                     'ON CONFLICT DO UPDATE SET "title"=excluded."title","author"=excluded."author"')
+    assert backend.upsert_sql('books', ['id'], []) == 'INSERT INTO "books" ("id") VALUES (%s)'
+
+    cursor.execute("CREATE TABLE books (id INTEGER PRIMARY KEY, title TEXT, author TEXT)")
+    cursor.executemany(query, [(1, 'Dune', 'Herbert'), (2, 'Emma', 'Austen')])
+    cursor.execute(query, (1, 'Dune Messiah', 'F. Herbert'))
+    cursor.execute("SELECT id, title, author FROM books ORDER BY id")
+    assert cursor.fetchall() == [(1, 'Dune Messiah', 'F. Herbert'), (2, 'Emma', 'Austen')]
+
+    # The MySQL dialect needs no server to build its SQL
+    mysql = MySQLBackend.__new__(MySQLBackend)
+    assert mysql.upsert_sql('books', ['id', 'title'], ['title']) == \
+        "INSERT INTO `books` (`id`,`title`) VALUES (%s,%s) ON DUPLICATE KEY UPDATE `title`=VALUES(`title`)"
+
+
+def test_explain(sqlite):
+    backend, conn, cursor = sqlite
+    cursor.execute("CREATE TABLE books (id INTEGER PRIMARY KEY, title TEXT, category TEXT)")
+    cursor.execute("CREATE TABLE loans (id INTEGER PRIMARY KEY, book_id INT, returned INT)")
+    cursor.execute("CREATE INDEX idx_books_category_title ON books (category, title)")
+
+    plans = backend.explain(cursor, "SELECT title FROM books WHERE category = %s", ('Fiction',))
+    assert plans == [{'table': 'books', 'type': 'SEARCH',
+                      'key': 'idx_books_category_title', 'full_scan': False}]
+
+    plans = backend.explain(cursor, "SELECT * FROM loans l WHERE l.returned = %s", (0,))
+    assert plans == [{'table': 'loans', 'type': 'SCAN', 'key': None, 'full_scan': True}]
+
+    plans = backend.explain(cursor, """
+        SELECT b.title FROM loans l JOIN books b ON b.id = l.book_id WHERE l.returned = %s
+    """, (0,))
+    assert {plan['table']: plan['full_scan'] for plan in plans} == {'loans': True, 'books': False}
+
+
+def test_dates_round_trip(sqlite):
+    backend, conn, cursor = sqlite
+    cursor.execute("CREATE TABLE loans (id INTEGER PRIMARY KEY, due_date DATE, borrowed_date TIMESTAMP)")
+    due = date(2024, 2, 29)
+    borrowed = datetime(2024, 2, 22, 9, 30, 15)
+    cursor.execute("INSERT INTO loans (due_date, borrowed_date) VALUES (%s, %s)", (due, borrowed))
+    cursor.execute("SELECT due_date, borrowed_date, DATEDIFF(due_date, borrowed_date) FROM loans")
+    assert cursor.fetchone() == (due, borrowed, 7)
+
+    cursor.execute("SELECT DATEDIFF(CURDATE(), %s), DATEDIFF(NULL, %s)",
+                   (date.today() - timedelta(days=3), due))
+    assert cursor.fetchone() == (3, None)
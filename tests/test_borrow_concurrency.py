@@ -0,0 +1,59 @@
+"""
+borrowBook under concurrent checkouts of the last copies
+"""
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+COPIES = 5
+BORROWERS = 40
+
+
+def test_concurrent_borrows_never_oversell(make_library):
+    db, library = make_library(pool_size=8)
+    library.addNewBook("Dune", "Herbert", "Fiction", COPIES)
+    for i in range(BORROWERS):
+        library.registerUser(f"student{i}", f"Student {i}")
+
+    start = threading.Barrier(BORROWERS)
+
+    def borrow(i):
+        start.wait()
+        try:
+            library.borrowBook(f"student{i}", "Dune")
+            return True
+        except Exception:
+            return False
+
+    with ThreadPoolExecutor(max_workers=BORROWERS) as pool:
+        results = list(pool.map(borrow, range(BORROWERS)))
+
+    assert results.count(True) == COPIES
+
+    with db.session() as cursor:
+        cursor.execute("SELECT available_copies, borrow_count FROM books WHERE title = %s", ("Dune",))
+        assert cursor.fetchone() == (0, COPIES)
+
+        cursor.execute("SELECT COUNT(*) FROM borrowed_books WHERE returned = FALSE")
+        open_loans = cursor.fetchone()[0]
+        assert open_loans == COPIES
+
+        # active_loans matches the open loans of every user
+        cursor.execute("""
+            SELECT COUNT(*) FROM users u
+            WHERE u.active_loans <> (SELECT COUNT(*) FROM borrowed_books b
+                                     WHERE b.user_id = u.id AND b.returned = FALSE)
+        """)
+        assert cursor.fetchone()[0] == 0
+        cursor.execute("SELECT SUM(active_loans) FROM users")
+        assert cursor.fetchone()[0] == open_loans
+
+        # The sharded counters agree with the books table
+        cursor.execute("SELECT name, SUM(value) FROM library_counters GROUP BY name")
+        counters = dict(cursor.fetchall())
+        cursor.execute("SELECT COUNT(*), SUM(total_copies), SUM(available_copies) FROM books")
+        assert (counters['unique_books'], counters['total_copies'],
+                counters['available_copies']) == cursor.fetchone()
+
+    summary = library.generateReports()['summary']
+    assert summary['available_copies'] == 0
+    assert summary['borrowed_copies'] == COPIES
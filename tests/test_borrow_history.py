@@ -0,0 +1,61 @@
+"""
+Borrow history: keyset pages, streaming and the getBorrowLogs dict agree
+"""
+from decimal import Decimal
+
+import pytest
+
+
+@pytest.fixture
+def history_library(make_library):
+    db, library = make_library()
+    for title in ('Dune', 'Emma', 'Ulysses'):
+        library.addNewBook(title, 'Author', 'Fiction', 3)
+    for name in ('asha', 'ravi'):
+        library.registerUser(name, name.title(), '10', 'A')
+        for title in ('Dune', 'Emma', 'Ulysses'):
+            library.borrowBook(name, title)
+    library.returnBook('asha', 'Emma')
+    # Most loans share a borrow second, so paging relies on the id tie-breaker
+    with db.transaction() as cursor:
+        cursor.execute("UPDATE borrowed_books SET borrowed_date = '2024-01-05 10:00:00' WHERE id IN (2, 5)")
+        cursor.execute("UPDATE borrowed_books SET fine_amount = 12.5 WHERE id = 2")
+    return library
+
+
+@pytest.mark.parametrize('page_size', [1, 2, 4])
+def test_pages_match_stream(history_library, page_size):
+    history = history_library.borrow_history()
+    streamed = list(history)
+    assert len(streamed) == 6
+    dates = [record['borrowed_date'] for record in streamed]
+    assert dates == sorted(dates, reverse=True)
+
+    paged, after = [], None
+    while True:
+        page = history.page(page_size, after)
+        paged += page['logs']
+        if page['next'] is None:
+            break
+        after = page['next']
+    assert paged == streamed
+
+    asha = history_library.borrow_history(student='asha')
+    assert [r['student'] for r in asha] == ['asha'] * 3
+    assert asha.page(2)['logs'] == list(asha)[:2]
+
+
+def test_get_borrow_logs_keeps_its_shape(history_library):
+    result = history_library.getBorrowLogs()
+    assert set(result) == {'logs', 'total_fines'}
+    assert result['total_fines'] == Decimal('12.5') == history_library.borrow_history().total_fines
+    assert [log['student'] for log in result['logs']] == \
+        [record['student'] for record in history_library.borrow_history()]
+    returned = [log for log in result['logs'] if log['status'] == 'Returned']
+    assert len(returned) == 1 and returned[0]['book'] == 'Emma'
+    for log in result['logs']:
+        assert isinstance(log['borrowed_date'], str) and len(log['borrowed_date']) == 16
+        assert isinstance(log['due_date'], str) and len(log['due_date']) == 10
+        assert log['return_date'] == "N/A" or log is returned[0]
+    assert returned[0]['return_date'] != "N/A"
+    assert len(history_library.getBorrowLogs(title='Dune')['logs']) == 2
@@ -0,0 +1,45 @@
+"""
+The cached available-books listing must page exactly like the SQL listing
+"""
+import pytest
+
+
+BOOKS = [
+    ('apple', 'A. Author', 'science'),
+    ('Banana', 'B. Author', 'Science'),
+    ('cherry', 'C. Author', 'Science'),
+    ('Zebra', 'Z. Author', 'fiction'),
+    ('aardvark', 'A. Author', 'Fiction'),
+    ('Éclair', 'E. Author', 'Fiction'),
+    ('eclair', 'E. Author', 'Fiction'),
+    ('_under', 'U. Author', 'Fiction'),
+    ('Über', 'U. Author', 'Économie'),
+    ('mango', 'M. Author', 'General'),
+]
+
+
+def listing(library, page_size):
+    pages, after = [], None
+    while True:
+        page = library.get_available_books_page(page_size, after)
+        pages.append((page['books'], page['next']))
+        if page['next'] is None:
+            return pages
+        after = page['next']
+
+
+@pytest.mark.parametrize('page_size', [1, 2, 3, 100])
+def test_cached_pages_match_sql(make_library, page_size):
+    db, library = make_library()
+    for title, author, category in BOOKS:
+        library.addNewBook(title, author, category)
+    _, cached = make_library(catalog_cache=True, cache_ttl=None)
+
+    expected = listing(library, page_size)
+    assert listing(cached, page_size) == expected
+    assert sum(len(books) for books, _ in expected) == len(BOOKS)
+
+    # Writes patched into the cache keep the same order as a fresh query
+    cached.addNewBook('BANANA split', 'B. Author', 'science')
+    cached.addNewBook('aaa', 'A. Author', 'Économie')
+    assert listing(cached, page_size) == listing(library, page_size)
@@ -0,0 +1,46 @@
+"""
+The in-memory catalog index and the SQL search agree on literal % and _
+"""
+
+BOOKS = [
+    ('100% Cotton', 'A. Author', 'Fiction'),
+    ('1000 Cotton Fields', 'B. Author', 'Fiction'),
+    ('snake_case', 'C. Author', 'Technology'),
+    ('snakescase', 'D. Author', 'Technology'),
+    ('Wow!', 'E. Author', 'General'),
+]
+TERMS = ['%', '_', '!', '0%', 'e_c', '%c', 'w!', '']
+
+
+def test_like_search_is_literal(make_library):
+    _, library = make_library(catalog_index=True)
+    for title, author, category in BOOKS:
+        library.addNewBook(title, author, category)
+
+    report = library.verify_catalog_index(TERMS)
+    assert report['consistent'], report
+    titles = lambda books: sorted(book['title'] for book in books)
+    assert titles(library._query_books('0%', 'like', None)) == ['100% Cotton']
+    assert titles(library._query_books('e_c', 'like', None)) == ['snake_case']
+    assert library._query_books('!', 'like', None)[0]['title'] == 'Wow!'
+
+
+def test_like_pages_are_literal(make_library):
+    _, indexed = make_library(catalog_index=True)
+    for title, author, category in BOOKS:
+        indexed.addNewBook(title, author, category)
+    _, library = make_library()
+
+    for term in TERMS:
+        for page_size in (1, 2, 100):
+            pages = []
+            for source in (indexed, library):
+                after, books = None, []
+                while True:
+                    page = source.search_books_page(term, page_size=page_size, after=after)
+                    books += page['books']
+                    if page['next'] is None:
+                        break
+                    after = page['next']
+                pages.append(books)
+            assert pages[0] == pages[1], term
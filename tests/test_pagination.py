@@ -0,0 +1,43 @@
+"""
+Keyset pages cover every row exactly once, in the listing order
+"""
+import pytest
+
+
+def pages(fetch, page_size, field):
+    rows, after = [], None
+    while True:
+        page = fetch(page_size=page_size, after=after)
+        rows += page[field]
+        if page['next'] is None:
+            return rows
+        after = page['next']
+
+
+@pytest.mark.parametrize('page_size', [1, 2, 3])
+def test_users_pages(make_library, page_size):
+    db, library = make_library()
+    for i in range(7):
+        library.registerUser(f'user{i}', f'User {i}', '10', 'A')
+    # Most users share a registration second, so paging relies on the id tie-breaker
+    with db.transaction() as cursor:
+        cursor.execute("UPDATE users SET registration_date = '2024-01-01 08:00:00' "
+                       "WHERE username IN ('user1', 'user4')")
+        cursor.execute("SELECT username FROM users ORDER BY registration_date DESC, id DESC")
+        expected = [row[0] for row in cursor.fetchall()]
+
+    users = pages(library.list_users_page, page_size, 'users')
+    assert [user['username'] for user in users] == expected
+    found = pages(lambda **page: library.search_users_page('User', **page), page_size, 'users')
+    assert found == users
+
+
+@pytest.mark.parametrize('page_size', [1, 2, 4])
+def test_available_books_pages(make_library, page_size):
+    _, library = make_library()
+    for title, category in [('Dune', 'Fiction'), ('Emma', 'Fiction'), ('Ulysses', 'Fiction'),
+                            ('Cosmos', 'Science'), ('Brief History', 'Science'), ('SQL', 'Technology')]:
+        library.addNewBook(title, 'Author', category)
+
+    books = pages(library.get_available_books_page, page_size, 'books')
+    assert books == library.displayAvailableBooks()
@@ -0,0 +1,29 @@
+"""
+connect() reports a schema it could not bring up to date
+"""
+import sqlite3
+
+from lib import DatabaseConnection, LATEST_SCHEMA_VERSION
+
+
+def test_connect_migrates_a_new_database(tmp_path):
+    db = DatabaseConnection(backend='sqlite')
+    assert db.connect(database=str(tmp_path / 'library'))
+    assert db.schema_version() == LATEST_SCHEMA_VERSION
+    db.close_connection()
+
+
+def test_failed_migration_fails_connect(tmp_path):
+    # A foreign library_counters table makes migration 10 fail half way
+    conn = sqlite3.connect(tmp_path / 'library.db')
+    conn.execute("CREATE TABLE library_counters (label TEXT)")
+    conn.close()
+
+    db = DatabaseConnection(backend='sqlite')
+    assert not db.connect(database=str(tmp_path / 'library'))
+    assert db.connection is None
+
+    # Migrations before the failing one stay applied
+    conn = sqlite3.connect(tmp_path / 'library.db')
+    assert conn.execute("SELECT MAX(version) FROM schema_version").fetchone()[0] == 9
+    conn.close()
@@ -0,0 +1,42 @@
+"""
+Nested transactions: savepoints undo the inner step, errors keep their cause
+"""
+import sqlite3
+
+import pytest
+
+
+def names(db):
+    with db.session() as cursor:
+        cursor.execute("SELECT name FROM tags ORDER BY name")
+        return [row[0] for row in cursor.fetchall()]
+
+
+def test_savepoint_undoes_only_the_inner_step(make_library):
+    db, _ = make_library()
+    with db.session() as cursor:
+        cursor.execute("CREATE TABLE tags (name TEXT UNIQUE)")
+
+    with db.transaction() as cursor:
+        cursor.execute("INSERT INTO tags VALUES ('a')")
+        with pytest.raises(sqlite3.IntegrityError):
+            with db.transaction():
+                cursor.execute("INSERT INTO tags VALUES ('b')")
+                cursor.execute("INSERT INTO tags VALUES ('a')")
+        cursor.execute("INSERT INTO tags VALUES ('c')")
+    assert names(db) == ['a', 'c']
+
+
+def test_error_survives_a_rolled_back_transaction(make_library):
+    # ON CONFLICT ROLLBACK makes SQLite end the whole transaction, as a MySQL
+    # deadlock does, so the savepoint no longer exists
+    db, _ = make_library()
+    with db.session() as cursor:
+        cursor.execute("CREATE TABLE tags (name TEXT UNIQUE ON CONFLICT ROLLBACK)")
+
+    with pytest.raises(sqlite3.IntegrityError):
+        with db.transaction() as cursor:
+            cursor.execute("INSERT INTO tags VALUES ('a')")
+            with db.transaction():
+                cursor.execute("INSERT INTO tags VALUES ('a')")
+    assert names(db) == []
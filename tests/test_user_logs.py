@@ -0,0 +1,54 @@
+"""
+Library.getUserLogs paging: open loans first, then returned ones
+"""
+
+
+def borrow_all(library, username, titles):
+    for title in titles:
+        library.borrowBook(username, title)
+
+
+def collect(library, username, page_size):
+    pages, after = [], None
+    while True:
+        result = library.getUserLogs(username, page_size=page_size, after=after)
+        pages.append(result['logs'])
+        after = result['next']
+        if after is None:
+            return pages
+
+
+def test_open_loans_filling_the_page_without_history(make_library):
+    db, library = make_library()
+    for i in range(3):
+        library.addNewBook(f"Book {i}", "Author", "Fiction", 2)
+    library.registerUser("amy", "Amy")
+    borrow_all(library, "amy", ["Book 0", "Book 1", "Book 2"])
+
+    result = library.getUserLogs("amy", page_size=3)
+    assert [log['status'] for log in result['logs']] == ["Active"] * 3
+    assert result['next'] is None
+
+
+def test_open_loans_then_history_across_pages(make_library):
+    db, library = make_library()
+    for i in range(6):
+        library.addNewBook(f"Book {i}", "Author", "Fiction", 2)
+    library.registerUser("amy", "Amy")
+    borrow_all(library, "amy", ["Book 0", "Book 1", "Book 2"])
+    for title in ("Book 0", "Book 1", "Book 2"):
+        library.returnBook("amy", title)
+    borrow_all(library, "amy", ["Book 3", "Book 4"])
+
+    pages = collect(library, "amy", page_size=2)
+    logs = [log for page in pages for log in page]
+    assert all(pages)
+    assert [log['status'] for log in logs] == ["Active"] * 2 + ["Returned"] * 3
+    assert sorted(log['book'] for log in logs) == [f"Book {i}" for i in range(5)]
+
+    # Exactly full first phase, history follows on the next page
+    pages = collect(library, "amy", page_size=1)
+    assert [len(page) for page in pages] == [1] * 5
+
+    user = library.getUserLogs("amy")['user']
+    assert (user['total_borrowed'], user['active_books'], user['returned']) == (5, 2, 3)
@@ -0,0 +1,92 @@
+"""
+User status cache for the Library Management System.
+
+Circulation checks (Library.checkUserExists) look up the same few dozen
+usernames over and over during a checkout rush. UserStatusCache keeps the
+latest answers in a bounded LRU map with a TTL, including "no such user"
+answers (a negative cache with its own, shorter TTL), so repeated checks
+cost no database round trip.
+
+Library invalidates an entry whenever it registers, removes or changes the
+status of that user; the TTL bounds how long changes made by other
+processes go unnoticed.
+"""
+from collections import OrderedDict
+import threading
+import time
+
+
+class UserStatusCache:
+    """Bounded LRU of username -> (username, full_name, status), or None for unknown users"""
+
+    def __init__(self, max_size=1024, ttl=300, negative_ttl=30):
+        self.max_size = max_size
+        self.ttl = ttl                      # seconds a found user is trusted
+        self.negative_ttl = negative_ttl    # seconds an unknown username is trusted
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.generation = 0                 # bumped by invalidate(); see put()
+        self._entries = OrderedDict()       # casefolded username -> (value, expires_at)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(username):
+        # Usernames compare case-insensitively in both backends
+        return username.casefold()
+
+    def get(self, username):
+        """(True, value) for a cached answer (value None: no such user), (False, None) on a miss"""
+        key = self._key(username)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if time.monotonic() < expires_at:
+                    self._entries.move_to_end(key)
+                    if value is None:
+                        self.negative_hits += 1
+                    else:
+                        self.hits += 1
+                    return True, value
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, username, value, generation):
+        """
+        Cache the answer of a lookup started when self.generation was generation
+
+        The answer is dropped if an invalidation happened meanwhile, since
+        it may predate the change.
+        """
+        ttl = self.negative_ttl if value is None else self.ttl
+        key = self._key(username)
+        with self._lock:
+            if generation != self.generation or not ttl:
+                return
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, username=None):
+        """Forget one user (or everyone when username is None)"""
+        with self._lock:
+            self.generation += 1
+            if username is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(self._key(username), None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'negative_hits': self.negative_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries)
+            }